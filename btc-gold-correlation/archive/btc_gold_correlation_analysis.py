@@ -11,9 +11,15 @@ from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
+from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+# Chart rendering is shared with scripts/
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'scripts'))
+from rendering import MAX_POINTS, render_correlation_analysis
+
 class BTCGoldCorrelationAnalyzer:
     """Analyze the correlation between Bitcoin and Gold prices."""
 
@@ -176,55 +182,26 @@ class BTCGoldCorrelationAnalyzer:
 
         return pd.DataFrame(stats_results).T
 
-    def plot_analysis(self):
-        """Create comprehensive visualization of the analysis."""
-        fig, axes = plt.subplots(4, 1, figsize=(15, 12), sharex=True)
-
-        # Plot 1: BTC Price
-        axes[0].plot(self.correlation_data.index, self.correlation_data['BTC_Close'],
-                     color='orange', linewidth=1)
-        axes[0].set_ylabel('BTC Price (USD)', fontsize=10)
-        axes[0].set_title('BTC-Gold Correlation Analysis', fontsize=14, fontweight='bold')
-        axes[0].grid(True, alpha=0.3)
-        axes[0].set_yscale('log')
-
-        # Mark negative correlation periods
-        negative_turns = self.correlation_data[self.correlation_data['turns_negative']]
-        for date in negative_turns.index:
-            axes[0].axvline(x=date, color='red', linestyle='--', alpha=0.5)
-            axes[0].annotate('Neg Corr', xy=(date, self.correlation_data.loc[date, 'BTC_Close']),
-                           xytext=(10, 20), textcoords='offset points',
-                           fontsize=8, color='red', alpha=0.7)
-
-        # Plot 2: Gold Price
-        axes[1].plot(self.correlation_data.index, self.correlation_data['Gold_Close'],
-                     color='gold', linewidth=1)
-        axes[1].set_ylabel('Gold Price (USD)', fontsize=10)
-        axes[1].grid(True, alpha=0.3)
-
-        # Plot 3: 40-day Correlation
-        axes[2].plot(self.correlation_data.index, self.correlation_data['40d_correlation'],
-                     color='blue', linewidth=1)
-        axes[2].axhline(y=0, color='black', linestyle='-', linewidth=0.5)
-        axes[2].fill_between(self.correlation_data.index,
-                            self.correlation_data['40d_correlation'],
-                            0, where=(self.correlation_data['40d_correlation'] < 0),
-                            color='red', alpha=0.3)
-        axes[2].set_ylabel('40-day Correlation', fontsize=10)
-        axes[2].set_ylim(-1, 1)
-        axes[2].grid(True, alpha=0.3)
-
-        # Plot 4: BTC Returns
-        axes[3].plot(self.correlation_data.index,
-                     self.correlation_data['BTC_Return'].rolling(30).mean() * 100,
-                     color='green', linewidth=1, label='30d MA Return')
-        axes[3].set_ylabel('BTC Return (%)', fontsize=10)
-        axes[3].set_xlabel('Date', fontsize=10)
-        axes[3].grid(True, alpha=0.3)
-        axes[3].legend()
-
-        plt.tight_layout()
-        plt.savefig('btc_gold_correlation_analysis.png', dpi=300, bbox_inches='tight')
+    def plot_analysis(self, renderer=None, path='btc_gold_correlation_analysis.png',
+                      max_points=MAX_POINTS):
+        """
+        Create comprehensive visualization of the analysis.
+
+        The figure layout lives in rendering.render_correlation_analysis,
+        which decimates long series to about max_points points per line.
+
+        Parameters:
+        - renderer: optional BackgroundRenderer; the chart is then drawn
+          headlessly (Agg) in its process pool and a future is returned
+          instead of the figure
+        - path: output PNG
+        """
+        columns = ['BTC_Close', 'Gold_Close', '40d_correlation', 'BTC_Return', 'turns_negative']
+        if renderer is not None:
+            return renderer.submit(render_correlation_analysis, self.correlation_data[columns],
+                                   path=path, max_points=max_points)
+        fig = render_correlation_analysis(self.correlation_data[columns], path=path,
+                                          max_points=max_points)
         plt.show()
 
         return fig
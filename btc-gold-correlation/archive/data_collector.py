@@ -14,9 +14,15 @@ import numpy as np
 import yfinance as yf
 from datetime import datetime, timedelta
 from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+# 存储模块在 scripts/ 下
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'scripts'))
+from column_cache import ColumnCache
+from price_store import PriceStore
+
 
 class DataCollector:
     """数据收集器 - 遵循Gemini建议的统计严谨性原则"""
@@ -27,6 +33,7 @@ class DataCollector:
         self.data_dir = Path(data_dir)
         self.raw_dir = self.data_dir / 'raw'
         self.processed_dir = self.data_dir / 'processed'
+        self.store = PriceStore(self.data_dir / 'store')
 
         # 创建目录
         self.raw_dir.mkdir(parents=True, exist_ok=True)
@@ -47,6 +54,9 @@ class DataCollector:
         """
         下载原始数据
 
+        每个资产的Close价格缓存在 raw/{name}/ 下的二进制列文件中（见 column_cache），
+        读取时直接内存映射，增量下载只追加最新日期之后的数据。
+
         参数:
             force_refresh: 是否强制重新下载（否则只增量更新）
         """
@@ -56,67 +66,41 @@ class DataCollector:
 
         for name, ticker in self.tickers.items():
             try:
-                cache_file = self.raw_dir / f'{name}_raw.csv'
+                cache = ColumnCache(self.raw_dir / name)
+                if force_refresh:
+                    cache.clear()
+                elif cache.rows() == 0:
+                    self._import_csv_cache(name, ticker, cache)
 
                 # 检查是否需要增量更新
-                if not force_refresh and cache_file.exists():
-                    existing = pd.read_csv(cache_file, index_col=0, parse_dates=True)
-                    # 确保是单列数据（只取Close价格）
-                    if isinstance(existing.columns, pd.MultiIndex):
-                        existing = existing.iloc[:, 0]  # 取第一列
-                    elif 'Close' in existing.columns:
-                        existing = existing['Close']
-                    else:
-                        existing = existing.iloc[:, 0]
-
-                    existing.name = name
-                    last_date = pd.Timestamp(existing.index[-1])
-
+                last_date = cache.watermark()
+                if last_date is not None:
                     # 如果最后日期是今天或昨天，无需更新
                     days_diff = (pd.Timestamp.now() - last_date).days
                     if days_diff <= 1:
                         print(f"✓ {name:4s} - 使用缓存数据（最新: {last_date.date()}）")
-                        all_data[name] = existing
+                        all_data[name] = cache.load_series(name=name)
                         continue
 
                     # 增量下载
                     start = (last_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
                     print(f"⟳ {name:4s} - 增量更新（从 {start}）")
-                    new_data = yf.download(ticker, start=start, end=self.end_date,
-                                          progress=False, auto_adjust=True)
-
-                    if not new_data.empty:
-                        # 只取Close价格
-                        if 'Close' in new_data.columns:
-                            new_data = new_data['Close']
-                        elif isinstance(new_data, pd.DataFrame):
-                            new_data = new_data.iloc[:, 0]
-
-                        combined = pd.concat([existing, new_data])
-                        combined = combined[~combined.index.duplicated(keep='last')]
-                        all_data[name] = combined
-                    else:
-                        all_data[name] = existing
                 else:
                     # 全量下载
+                    start = self.start_date
                     print(f"⬇ {name:4s} - 全量下载")
-                    data = yf.download(ticker, start=self.start_date, end=self.end_date,
-                                      progress=False, auto_adjust=True)
 
-                    # 只取Close价格
-                    if 'Close' in data.columns:
-                        data = data['Close']
-                    elif isinstance(data, pd.DataFrame) and not data.empty:
-                        data = data.iloc[:, 0]
+                new_data = yf.download(ticker, start=start, end=self.end_date,
+                                       progress=False, auto_adjust=True)
+                close = self._close_series(new_data)
 
-                    data.name = name
-                    all_data[name] = data
+                # 保存原始数据（只追加新日期的Close价格）
+                if close is not None and not close.empty:
+                    written = cache.append(close.to_frame('close'), ticker=ticker)
+                    print(f"  └─ 追加 {written} 行到: {cache.path}")
 
-                # 保存原始数据（只保存Close价格）
-                if all_data[name] is not None and not all_data[name].empty:
-                    all_data[name].to_csv(cache_file, header=True)
-                    print(f"  └─ 保存到: {cache_file}")
-                    print(f"  └─ 数据点数: {len(all_data[name])}")
+                all_data[name] = cache.load_series(name=name)
+                print(f"  └─ 数据点数: {len(all_data[name])}")
 
             except Exception as e:
                 print(f"✗ {name:4s} - 下载失败: {e}")
@@ -125,6 +109,27 @@ class DataCollector:
         print("\n=== 原始数据下载完成 ===\n")
         return all_data
 
+    @staticmethod
+    def _close_series(data):
+        """从yfinance结果中取Close价格（单列Series）"""
+        if data is None or data.empty:
+            return None
+        close = data['Close'] if 'Close' in data.columns else data.iloc[:, 0]
+        # 新版yfinance返回MultiIndex列，取第一列
+        if isinstance(close, pd.DataFrame):
+            close = close.iloc[:, 0]
+        return close.astype('float64')
+
+    def _import_csv_cache(self, name, ticker, cache):
+        """把旧版 {name}_raw.csv 缓存一次性导入二进制列缓存"""
+        csv_file = self.raw_dir / f'{name}_raw.csv'
+        if not csv_file.exists():
+            return
+        close = self._close_series(pd.read_csv(csv_file, index_col=0, parse_dates=True))
+        if close is not None:
+            cache.append(close.to_frame('close'), ticker=ticker)
+            print(f"  └─ 已导入旧CSV缓存: {csv_file}")
+
     def align_and_process_data(self, raw_data):
         """
         数据对齐和预处理 - 遵循Gemini的统计严谨性原则
@@ -186,15 +191,11 @@ class DataCollector:
         print("\n--- 收益率基础统计 ---")
         print(returns.describe())
 
-        # 6. 保存处理后的数据
-        prices_file = self.processed_dir / 'aligned_prices.parquet'
-        returns_file = self.processed_dir / 'log_returns.parquet'
-
-        prices.to_parquet(prices_file)
-        returns.to_parquet(returns_file)
-
-        print(f"\n✓ 价格数据已保存: {prices_file}")
-        print(f"✓ 收益率数据已保存: {returns_file}")
+        # 6. 保存处理后的数据（只追加上次保存之后的新日期）
+        written = self.store.append('aligned_prices', prices)
+        print(f"\n✓ 价格数据已追加 {written} 个数据点: {self.store.root / 'aligned_prices'}")
+        written = self.store.append('log_returns', returns)
+        print(f"✓ 收益率数据已追加 {written} 个数据点: {self.store.root / 'log_returns'}")
 
         print("\n=== 数据预处理完成 ===\n")
 
@@ -292,9 +293,10 @@ class DataCollector:
         print(f"  最强负相关: {valid_corr.min():.4f} ({valid_corr.idxmin().date()})")
 
         # 保存相关性数据（包含所有日期，非交易日为NaN）
-        corr_file = self.processed_dir / f'btc_gold_correlation_{window}d.parquet'
-        full_correlation.to_frame('correlation').to_parquet(corr_file)
-        print(f"\n✓ 相关性数据已保存: {corr_file}")
+        dataset = f'btc_gold_correlation_{window}d'
+        written = self.store.append(dataset, full_correlation.to_frame('correlation'))
+        self.store.compact_in_background()
+        print(f"\n✓ 相关性数据已追加 {written} 个数据点: {self.store.root / dataset}")
 
         return full_correlation
 
@@ -19,11 +19,17 @@ import pandas as pd
 import numpy as np
 from alpha_vantage.foreignexchange import ForeignExchange
 from pandas_datareader import data as pdr
-import time
 from datetime import datetime, timedelta
+from pathlib import Path
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+# 分区存储模块在 scripts/ 下
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'scripts'))
+from ohlcv_backfill import backfill_ohlcv
+from price_store import PriceStore
+
 # Alpha Vantage API密钥
 ALPHA_VANTAGE_KEY = '11A6UEZO56SX8FC9'
 
@@ -40,51 +46,19 @@ def fetch_btc_data(start_date='2015-01-01', end_date=None):
     print("📈 正在从Binance获取BTC数据...")
 
     try:
+        # 限速由backfill_ohlcv的令牌桶统一控制，按时间窗口并发回填
         exchange = ccxt.binance({
-            'enableRateLimit': True,
+            'enableRateLimit': False,
             'options': {'defaultType': 'spot'}
         })
 
-        # 将日期转换为毫秒时间戳
-        since = int(datetime.strptime(start_date, '%Y-%m-%d').timestamp() * 1000)
-
-        # 获取所有历史数据
-        all_ohlcv = []
-        limit = 1000  # Binance一次最多返回1000条
-
-        while True:
-            ohlcv = exchange.fetch_ohlcv('BTC/USDT', '1d', since=since, limit=limit)
-
-            if not ohlcv:
-                break
-
-            all_ohlcv.extend(ohlcv)
-
-            # 更新since为最后一条数据的时间戳+1天
-            since = ohlcv[-1][0] + 86400000
-
-            # 如果指定了结束日期
-            if end_date:
-                end_timestamp = int(datetime.strptime(end_date, '%Y-%m-%d').timestamp() * 1000)
-                if since >= end_timestamp:
-                    break
-
-            # 如果获取的数据少于limit，说明已经到最新数据
-            if len(ohlcv) < limit:
-                break
-
-            time.sleep(exchange.rateLimit / 1000)  # 遵守速率限制
-
-            # 进度提示
-            last_date = datetime.fromtimestamp(ohlcv[-1][0] / 1000).strftime('%Y-%m-%d')
-            print(f"  已获取到: {last_date}", end='\r')
-
-        # 转换为DataFrame
-        df = pd.DataFrame(all_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df.set_index('date', inplace=True)
+        # Binance 2017-08 才上线 BTC/USDT，更早的窗口只会返回空页
+        start = max(pd.Timestamp(start_date), pd.Timestamp('2017-08-01'))
+        df = backfill_ohlcv(exchange, 'BTC/USDT', '1d', since=start, until=end_date)
+        if len(df) == 0:
+            raise ValueError("Binance 无数据")
 
-        print(f"\n✅ BTC数据获取完成: {len(df)} 条记录 ({df.index[0].date()} 至 {df.index[-1].date()})")
+        print(f"✅ BTC数据获取完成: {len(df)} 条记录 ({df.index[0].date()} 至 {df.index[-1].date()})")
 
         return df[['close']].rename(columns={'close': 'BTC'})
 
@@ -385,21 +359,20 @@ def validate_data_quality(df, returns):
     print("\n" + "="*60)
 
 
-def save_data(df, returns, correlation, valid_pairs, filename_base='improved_data'):
+def save_data(df, returns, correlation, valid_pairs, filename_base='improved_data', store=None):
     """
-    保存数据到Parquet格式
+    追加数据到分区Parquet存储（只写入上次保存之后的新日期）
     """
     print(f"\n💾 保存数据到Parquet...")
+    store = store or PriceStore()
 
     # 保存原始价格
-    price_file = f'{filename_base}_prices.parquet'
-    df.to_parquet(price_file)
-    print(f"  ✅ 价格数据: {price_file}")
+    written = store.append(f'{filename_base}_prices', df)
+    print(f"  ✅ 价格数据: {filename_base}_prices (新增 {written} 个数据点)")
 
     # 保存收益率
-    returns_file = f'{filename_base}_returns.parquet'
-    returns.to_parquet(returns_file)
-    print(f"  ✅ 收益率数据: {returns_file}")
+    written = store.append(f'{filename_base}_returns', returns)
+    print(f"  ✅ 收益率数据: {filename_base}_returns (新增 {written} 个数据点)")
 
     # 保存相关性
     if correlation is not None:
@@ -407,11 +380,11 @@ def save_data(df, returns, correlation, valid_pairs, filename_base='improved_dat
             'correlation': correlation,
             'valid_pairs': valid_pairs
         })
-        corr_file = f'{filename_base}_correlation.parquet'
-        corr_df.to_parquet(corr_file)
-        print(f"  ✅ 相关性数据: {corr_file}")
+        written = store.append(f'{filename_base}_correlation', corr_df)
+        print(f"  ✅ 相关性数据: {filename_base}_correlation (新增 {written} 个数据点)")
 
-    print(f"\n✅ 所有数据已保存")
+    store.compact_in_background()
+    print(f"\n✅ 所有数据已保存到 {store.root}")
 
 
 def main():
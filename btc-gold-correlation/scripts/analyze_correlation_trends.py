@@ -10,13 +10,15 @@ import numpy as np
 import matplotlib.pyplot as plt
 from datetime import timedelta
 
+from data_access import load_frame
+
 
 def analyze_correlation_trend_and_btc_rallies():
     """分析相关性趋势与BTC涨幅的关系"""
 
-    prices = pd.read_parquet('data/processed/aligned_prices.parquet')
-    returns = pd.read_parquet('data/processed/log_returns.parquet')
-    correlation = pd.read_parquet('data/processed/btc_gold_correlation_40d.parquet')['correlation']
+    prices = load_frame('aligned_prices')
+    returns = load_frame('log_returns')
+    correlation = load_frame('btc_gold_correlation_40d')['correlation']
 
     print("="*90)
     print("分析：BTC大涨是否始于相关性最弱时刻")
@@ -7,14 +7,16 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+from data_access import load_frame
+
 print("="*60)
 print("📊 数据质量分析")
 print("="*60 + "\n")
 
 # 读取数据
-df = pd.read_parquet('improved_data_prices.parquet')
-returns = pd.read_parquet('improved_data_returns.parquet')
-corr_df = pd.read_parquet('improved_data_correlation.parquet')
+df = load_frame('improved_data_prices')
+returns = load_frame('improved_data_returns')
+corr_df = load_frame('improved_data_correlation')
 
 print("1️⃣  数据覆盖范围\n")
 print(f"总天数: {len(df)}")
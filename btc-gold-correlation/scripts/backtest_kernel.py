@@ -0,0 +1,838 @@
+"""
+Array-native backtest kernels for CorrelationTradingStrategy
+
+The kernels run the same entry/exit state machine as the pandas loops in
+trading_strategy.py, but over plain NumPy arrays. The caller builds the
+output DataFrame once from the returned arrays instead of writing every bar
+back with data.loc.
+"""
+
+import numpy as np
+from datetime import timedelta
+
+from position_sizing import entry_fraction, make_sizer
+
+
+NS_PER_DAY = 86_400 * 10**9
+
+# Cells (bars x combinations) per grid_simple_kernel call. The equity matrix
+# and the metric temporaries derived from it are a few float64 arrays of
+# this size, so 2**23 cells keeps one chunk to a few hundred MB.
+GRID_CELL_BUDGET = 2 ** 23
+
+
+def index_to_ns(index):
+    """Convert a DatetimeIndex into int64 epoch nanoseconds."""
+    return np.asarray(index, dtype='datetime64[ns]').view(np.int64)
+
+
+def days_to_ns(days):
+    """Convert a (possibly fractional) day count into nanoseconds, like timedelta(days=...)."""
+    # timedelta rejects NumPy integers (e.g. holding_days from an int64 array)
+    if isinstance(days, np.generic):
+        days = days.item()
+    return int(timedelta(days=days) // timedelta(microseconds=1)) * 1000
+
+
+def grid_chunk_size(n_bars, chunk_size=None, cell_budget=GRID_CELL_BUDGET):
+    """
+    Combinations per grid_simple_kernel call over n_bars rows.
+
+    chunk_size (default: no limit of its own) is capped so that chunk x
+    n_bars stays within cell_budget; at least one combination per call.
+    """
+    budget = max(1, cell_budget // max(int(n_bars), 1))
+    return budget if chunk_size is None else max(1, min(int(chunk_size), budget))
+
+
+def combo_columns(combos):
+    """
+    Split (entry_threshold, holding_days, stop_loss, take_profit) tuples into
+    the per-combination arguments of grid_simple_kernel (None stops -> NaN).
+    """
+    entry_thresholds, holding_days, stop_losses, take_profits = zip(*combos)
+    return (entry_thresholds, holding_days,
+            [np.nan if x is None else x for x in stop_losses],
+            [np.nan if x is None else x for x in take_profits])
+
+
+def sequential_sum(values, start=0.0):
+    """
+    start plus values, added left to right one float at a time.
+
+    Closing several lots on one bar must leave capital exactly where the
+    single-position loops leave it after closing them one trade at a time;
+    np.sum (pairwise) and the builtin sum (compensated since Python 3.12)
+    round differently.
+    """
+    total = start
+    for value in np.asarray(values, dtype=np.float64).tolist():
+        total += value
+    return total
+
+
+EXIT_REASONS = ("Time exit", "Stop loss", "Take profit",
+                "Correlation reversal", "Max holding period", "Trailing stop")
+EXIT_REASON_CODES = {reason: code for code, reason in enumerate(EXIT_REASONS)}
+
+TRADE_COLUMNS = (
+    ('combo', np.int32),
+    ('entry_idx', np.int64),
+    ('exit_idx', np.int64),
+    ('entry_ts', np.int64),
+    ('exit_ts', np.int64),
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('entry_correlation', np.float64),
+    ('exit_correlation', np.float64),
+    ('pnl', np.float64),
+    ('pnl_pct', np.float64),
+    ('exit_reason', np.int8)
+)
+
+
+class TradeBuffer:
+    """
+    Columnar trade log with typed NumPy columns.
+
+    Columns are preallocated and grow by doubling, so appending a trade is a
+    handful of scalar writes and millions of trades from a sweep stay compact
+    (one int8 exit-reason code instead of a string per trade). buffer[name]
+    returns a view of the filled part of a column; 'combo' identifies the
+    parameter combination in grid runs (the column in portfolio runs) and
+    is 0 otherwise.
+    """
+
+    FILL = {'combo': 0, 'exit_correlation': np.nan}
+
+    def __init__(self, capacity=64):
+        self._size = 0
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in TRADE_COLUMNS}
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, name):
+        return self._columns[name][:self._size]
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = len(self._columns['pnl'])
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def append(self, **values):
+        """Add one trade; exit_reason may be given as text or code."""
+        self._reserve(1)
+        values['exit_reason'] = EXIT_REASON_CODES.get(values['exit_reason'], values['exit_reason'])
+        for name, column in self._columns.items():
+            column[self._size] = values[name] if name in values else self.FILL[name]
+        self._size += 1
+
+    def extend(self, **columns):
+        """Add many trades from equal-length arrays (exit_reason as codes)."""
+        count = len(columns['pnl'])
+        self._reserve(count)
+        end = self._size + count
+        for name, column in self._columns.items():
+            column[self._size:end] = columns[name] if name in columns else self.FILL[name]
+        self._size = end
+
+    def columns(self):
+        """Dict of filled column views, e.g. to extend() another buffer."""
+        return {name: self[name] for name in self._columns}
+
+    def holding_days(self):
+        return (self['exit_ts'] - self['entry_ts']) // NS_PER_DAY
+
+    def exit_reasons(self):
+        """Exit reasons as text."""
+        return np.asarray(EXIT_REASONS, dtype=object)[self['exit_reason']]
+
+    def metrics(self):
+        """Trade statistics for the whole buffer, see trade_metrics."""
+        return trade_metrics(self['pnl'], self['pnl_pct'], self.holding_days())
+
+
+def trade_metrics(pnl, pnl_pct, holding_days):
+    """
+    Trade-level part of calculate_performance_metrics from NumPy columns.
+
+    Each statistic is one masked reduction over the columns instead of a
+    DataFrame filter; values match the pandas computation exactly.
+    """
+    total_trades = len(pnl)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    winning_trades = len(wins)
+    losing_trades = len(losses)
+
+    gross_profit = wins.sum() if winning_trades > 0 else 0
+    gross_loss = abs(losses.sum()) if losing_trades > 0 else 0
+
+    return {
+        'total_trades': total_trades,
+        'winning_trades': winning_trades,
+        'losing_trades': losing_trades,
+        'win_rate': winning_trades / total_trades * 100 if total_trades > 0 else 0,
+        'total_pnl': pnl.sum(),
+        'avg_pnl': pnl.sum() / total_trades if total_trades > 0 else np.nan,
+        'avg_win': wins.sum() / winning_trades if winning_trades > 0 else 0,
+        'avg_loss': losses.sum() / losing_trades if losing_trades > 0 else 0,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else np.inf,
+        'avg_return_per_trade': pnl_pct.sum() / total_trades if total_trades > 0 else np.nan,
+        'avg_holding_days': (holding_days.sum(dtype=np.float64) / total_trades
+                             if total_trades > 0 else np.nan)
+    }
+
+
+def crossing_indices(corr, threshold, prev_corr=float('nan')):
+    """
+    Sorted bar indices where correlation crosses below threshold.
+
+    Same condition as the backtest loops: current < threshold <= previous,
+    with NaN on either side never crossing. prev_corr is the correlation of
+    the bar before corr[0] (NaN for the first bar of a history).
+    """
+    corr = np.asarray(corr, dtype=np.float64)
+    previous = np.empty_like(corr)
+    if len(corr) > 0:
+        previous[0] = prev_corr
+        previous[1:] = corr[:-1]
+    return np.flatnonzero((corr < threshold) & (previous >= threshold))
+
+
+class CrossingCache:
+    """
+    Memoized entry crossings per (correlation column, threshold).
+
+    Entry bars depend only on the correlation column and the threshold, not
+    on holding period, stops or targets, so they are computed once and shared
+    by every backtest and grid combination run on the same DataFrame. The
+    cache keeps a reference to that DataFrame and starts over when a
+    different one is passed.
+    """
+
+    def __init__(self):
+        self._data = None
+        self._indices = {}
+
+    def indices(self, data, column, threshold):
+        """Sorted crossing bar indices for one threshold."""
+        if data is not self._data:
+            self._data = data
+            self._indices = {}
+
+        key = (column, float(threshold))
+        if key not in self._indices:
+            self._indices[key] = crossing_indices(data[column].to_numpy(dtype=np.float64), threshold)
+        return self._indices[key]
+
+    def matrix(self, data, column, thresholds):
+        """(n, T) crossing matrix, as entry_crossings, built from the memoized indices."""
+        crossings = np.zeros((len(data), len(thresholds)), dtype=bool)
+        for j, threshold in enumerate(thresholds):
+            crossings[self.indices(data, column, threshold), j] = True
+        return crossings
+
+
+def new_state(initial_capital):
+    """
+    Kernel state before the first bar.
+
+    The state is a plain dict of Python scalars, so it can be saved with json
+    and handed back to a kernel to continue from where the last run stopped.
+    last_correlation starts as NaN, which also blocks an entry on the first
+    bar (the pandas loops require i > 0).
+    """
+    return {
+        'bars': 0,
+        'capital': initial_capital,
+        'last_timestamp': None,
+        'last_correlation': float('nan'),
+        'position': None
+    }
+
+
+def _open_position(i, ts, price, corr, capital, position_size, fee_rate, deadline):
+    position_value = capital * position_size
+    return {
+        'entry_idx': i,
+        'entry_ts': ts,
+        'entry_price': price,
+        'entry_correlation': corr,
+        'btc_amount': (position_value * (1 - fee_rate)) / price,
+        'position_value': position_value,
+        'remaining_capital': capital - position_value,
+        'exit_deadline': ts + deadline,
+        'highest_value': position_value
+    }
+
+
+def _close_position(trades, position, i, ts, price, fee_rate, exit_reason,
+                    exit_correlation=np.nan):
+    """Append the trade to the TradeBuffer and return the exit value."""
+    exit_value = position['btc_amount'] * price * (1 - fee_rate)
+    trade_pnl = exit_value - position['position_value']
+
+    trades.append(
+        entry_idx=position['entry_idx'],
+        exit_idx=i,
+        entry_ts=position['entry_ts'],
+        exit_ts=ts,
+        entry_price=position['entry_price'],
+        exit_price=price,
+        entry_correlation=position['entry_correlation'],
+        exit_correlation=exit_correlation,
+        pnl=trade_pnl,
+        pnl_pct=trade_pnl / position['position_value'] * 100,
+        exit_reason=exit_reason
+    )
+    return exit_value
+
+
+def simple_strategy_kernel(timestamps, prices, corr, initial_capital, fee_rate,
+                           entry_threshold=-0.1, holding_days=60,
+                           position_size=1.0, stop_loss=None, take_profit=None,
+                           state=None, entry_indices=None, sizing=None):
+    """
+    Fixed holding period strategy over NumPy arrays.
+
+    Parameters:
+    - timestamps: int64 epoch nanoseconds, one per bar
+    - prices: BTC close prices
+    - corr: correlation values (NaN allowed)
+    - initial_capital, fee_rate: as on CorrelationTradingStrategy
+    - state: state returned by a previous call, to continue after its last bar
+    - entry_indices: precomputed crossing_indices for these bars (e.g. from a
+      CrossingCache); computed here when omitted
+    - sizing: optional sizing spec (see position_sizing.py) whose fraction
+      replaces position_size at each entry
+    - remaining parameters: as in backtest_simple_strategy
+
+    While flat, the loop jumps straight to the next entry crossing instead of
+    visiting idle bars.
+
+    Returns a dict with 'signal', 'position', 'portfolio_value' arrays, a
+    'trades' TradeBuffer (bar indices count from the first bar ever
+    processed) and the 'state' after the last bar.
+    """
+    n = len(prices)
+    signal = np.zeros(n, dtype=np.int64)
+    position_flag = np.zeros(n, dtype=np.int64)
+    portfolio_value = np.empty(n, dtype=np.float64)
+
+    state = dict(state) if state is not None else new_state(initial_capital)
+    offset = state['bars']
+    capital = state['capital']
+    position = dict(state['position']) if state['position'] is not None else None
+    sizer = None if sizing is None else make_sizer(sizing, state=state.get('sizing'))
+
+    # Python lists index much faster than NumPy scalars inside the loop;
+    # cr[i] is the previous bar's correlation, cr[i + 1] the current one
+    ts = np.asarray(timestamps, dtype=np.int64).tolist()
+    px = np.asarray(prices, dtype=np.float64).tolist()
+    cr = [state['last_correlation']] + np.asarray(corr, dtype=np.float64).tolist()
+    holding_ns = days_to_ns(holding_days)
+    trades = TradeBuffer()
+    if sizer is not None:
+        sizer.begin(prices)
+
+    if entry_indices is None:
+        entry_indices = crossing_indices(corr, entry_threshold, state['last_correlation'])
+    entries = np.asarray(entry_indices, dtype=np.int64).tolist()
+    next_entry = 0
+
+    i = 0
+    while i < n:
+        if position is None:
+            # Idle bars up to the next crossing just carry the capital
+            while next_entry < len(entries) and entries[next_entry] < i:
+                next_entry += 1
+            if next_entry == len(entries):
+                portfolio_value[i:] = capital
+                break
+            entry = entries[next_entry]
+            portfolio_value[i:entry] = capital
+            i = entry
+
+            size = position_size if sizer is None else float(entry_fraction(sizer, i, 0, position_size))
+            position = _open_position(offset + i, ts[i], px[i], cr[i + 1],
+                                      capital, size, fee_rate, holding_ns)
+            signal[i] = 1
+
+        current_price = px[i]
+        position_flag[i] = 1
+        current_value = position['btc_amount'] * current_price
+        pnl_pct = (current_value - position['position_value']) / position['position_value']
+
+        # Later checks override earlier ones, as in the pandas loop
+        exit_reason = None
+        if ts[i] >= position['exit_deadline']:
+            exit_reason = "Time exit"
+        if stop_loss and pnl_pct <= -stop_loss:
+            exit_reason = "Stop loss"
+        if take_profit and pnl_pct >= take_profit:
+            exit_reason = "Take profit"
+
+        if exit_reason is not None:
+            exit_value = _close_position(trades, position, offset + i, ts[i],
+                                         current_price, fee_rate, exit_reason)
+            capital = position['remaining_capital'] + exit_value
+            if sizer is not None:
+                sizer.record(0, exit_value / position['position_value'] - 1)
+            position = None
+            signal[i] = -1
+            portfolio_value[i] = capital
+        else:
+            portfolio_value[i] = position['remaining_capital'] + current_value
+
+        i += 1
+
+    if n > 0:
+        state.update({
+            'bars': offset + n,
+            'capital': capital,
+            'last_timestamp': ts[-1],
+            'last_correlation': cr[-1],
+            'position': position
+        })
+        if sizer is not None:
+            state['sizing'] = sizer.get_state()
+
+    return {
+        'signal': signal,
+        'position': position_flag,
+        'portfolio_value': portfolio_value,
+        'trades': trades,
+        'state': state
+    }
+
+
+def _find_dynamic_exit(position, start, timestamps, prices, corr, exit_correlation,
+                       use_trailing_stop, trailing_stop_pct, chunk=64, deadline_bar=None):
+    """
+    First exit bar at or after start for an open dynamic-strategy position.
+
+    Instead of stepping bar by bar, each window of bars is checked with array
+    primitives: the running maximum of the position value (trailing stop),
+    the first bar whose correlation reaches exit_correlation, and the first
+    bar at or past the max-holding cutoff. Windows double in size, so the work
+    per trade grows with how long it is held, not with the history length.
+
+    Returns (exit_bar, exit_reason, values): values is the position value on
+    every bar from start through exit_bar, or through the last bar with
+    exit_bar None if the position is still open. position['highest_value']
+    is updated as the bar loop would. deadline_bar, if given, replaces the
+    max-holding cutoff derived from position['exit_deadline'].
+    """
+    n = len(prices)
+    if deadline_bar is None:
+        deadline_bar = int(np.searchsorted(timestamps, position['exit_deadline'], side='left'))
+    deadline_bar = max(deadline_bar, start)
+    btc_amount = position['btc_amount']
+    values_seen = []
+
+    lo = start
+    while lo < n:
+        hi = min(lo + chunk, n, deadline_bar + 1)
+        # Windows are computed in float64 even for float32 price arrays
+        values = btc_amount * prices[lo:hi].astype(np.float64, copy=False)
+
+        # NaN correlation never triggers the reversal exit
+        hits = corr[lo:hi] >= exit_correlation
+        if deadline_bar < hi:
+            hits[deadline_bar - lo] = True
+        if use_trailing_stop:
+            highest = np.fmax(np.fmax.accumulate(values), position['highest_value'])
+            trailing = values < highest * (1 - trailing_stop_pct)
+            hits |= trailing
+
+        if hits.any():
+            k = int(hits.argmax())
+            values_seen.append(values[:k + 1])
+            if use_trailing_stop:
+                position['highest_value'] = float(highest[k])
+
+            # Same precedence as the bar loop: trailing stop, then max holding
+            if use_trailing_stop and trailing[k]:
+                exit_reason = "Trailing stop"
+            elif lo + k == deadline_bar:
+                exit_reason = "Max holding period"
+            else:
+                exit_reason = "Correlation reversal"
+            return lo + k, exit_reason, np.concatenate(values_seen)
+
+        values_seen.append(values)
+        if use_trailing_stop:
+            position['highest_value'] = float(highest[-1])
+        lo = hi
+        chunk *= 2
+
+    return None, None, np.concatenate(values_seen) if values_seen else np.empty(0)
+
+
+def dynamic_strategy_kernel(timestamps, prices, corr, initial_capital, fee_rate,
+                            entry_threshold=-0.1, exit_correlation=0.2,
+                            position_size=1.0, max_holding_days=120,
+                            use_trailing_stop=False, trailing_stop_pct=0.15,
+                            state=None, entry_indices=None, sizing=None):
+    """
+    Correlation-reversal strategy over NumPy arrays.
+
+    Same inputs and outputs as simple_strategy_kernel, with the parameters of
+    backtest_dynamic_strategy (plus state, entry_indices and sizing). Entries jump
+    between crossings and each exit is located by _find_dynamic_exit, so a
+    trade costs a few array operations rather than one iteration per held
+    bar. As in the pandas loop, the portfolio value on an exit bar is left
+    at initial_capital.
+    """
+    n = len(prices)
+    signal = np.zeros(n, dtype=np.int64)
+    position_flag = np.zeros(n, dtype=np.int64)
+    portfolio_value = np.full(n, initial_capital, dtype=np.float64)
+
+    state = dict(state) if state is not None else new_state(initial_capital)
+    offset = state['bars']
+    capital = state['capital']
+    position = dict(state['position']) if state['position'] is not None else None
+    sizer = None if sizing is None else make_sizer(sizing, state=state.get('sizing'))
+
+    ts = np.asarray(timestamps, dtype=np.int64)
+    px = np.asarray(prices, dtype=np.float64)
+    cr = np.asarray(corr, dtype=np.float64)
+    max_holding_ns = days_to_ns(max_holding_days)
+    trades = TradeBuffer()
+    if sizer is not None:
+        sizer.begin(px)
+
+    if entry_indices is None:
+        entry_indices = crossing_indices(cr, entry_threshold, state['last_correlation'])
+    entries = np.asarray(entry_indices, dtype=np.int64).tolist()
+    next_entry = 0
+
+    i = 0
+    while i < n:
+        if position is None:
+            # Idle bars up to the next crossing just carry the capital
+            while next_entry < len(entries) and entries[next_entry] < i:
+                next_entry += 1
+            if next_entry == len(entries):
+                portfolio_value[i:] = capital
+                break
+            entry = entries[next_entry]
+            portfolio_value[i:entry] = capital
+            i = entry
+
+            size = position_size if sizer is None else float(entry_fraction(sizer, i, 0, position_size))
+            position = _open_position(offset + i, int(ts[i]), float(px[i]), float(cr[i]),
+                                      capital, size, fee_rate, max_holding_ns)
+            signal[i] = 1
+
+        exit_bar, exit_reason, values = _find_dynamic_exit(
+            position, i, ts, px, cr, exit_correlation, use_trailing_stop, trailing_stop_pct
+        )
+
+        if exit_bar is None:
+            # Still open after the last bar
+            position_flag[i:] = 1
+            portfolio_value[i:] = position['remaining_capital'] + values
+            break
+
+        position_flag[i:exit_bar + 1] = 1
+        portfolio_value[i:exit_bar] = position['remaining_capital'] + values[:-1]
+
+        exit_value = _close_position(trades, position, offset + exit_bar, int(ts[exit_bar]),
+                                     float(px[exit_bar]), fee_rate, exit_reason,
+                                     exit_correlation=float(cr[exit_bar]))
+        capital = position['remaining_capital'] + exit_value
+        if sizer is not None:
+            sizer.record(0, exit_value / position['position_value'] - 1)
+        position = None
+        signal[exit_bar] = -1
+
+        i = exit_bar + 1
+
+    if n > 0:
+        state.update({
+            'bars': offset + n,
+            'capital': capital,
+            'last_timestamp': int(ts[-1]),
+            'last_correlation': float(cr[-1]),
+            'position': position
+        })
+        if sizer is not None:
+            state['sizing'] = sizer.get_state()
+
+    return {
+        'signal': signal,
+        'position': position_flag,
+        'portfolio_value': portfolio_value,
+        'trades': trades,
+        'state': state
+    }
+
+
+def entry_crossings(corr, thresholds):
+    """
+    Entry signal matrix: True where correlation crosses below each threshold.
+
+    Returns an (n, T) boolean array with the same condition as the backtest
+    loops (current < threshold <= previous, current not NaN, never on bar 0).
+    """
+    corr = np.asarray(corr, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    crossings = np.zeros((len(corr), len(thresholds)), dtype=bool)
+    if len(corr) > 1:
+        current = corr[1:, None]
+        previous = corr[:-1, None]
+        crossings[1:] = (current < thresholds) & (previous >= thresholds)
+    return crossings
+
+
+def grid_simple_kernel(timestamps, prices, corr, initial_capital, fee_rate,
+                       entry_thresholds, holding_days, stop_losses, take_profits,
+                       position_size=1.0, crossings=None, cost_models=None, cost_ids=None,
+                       volumes=None, sizing=None, bar_fractions=None):
+    """
+    Run the simple strategy for many parameter combinations in one pass.
+
+    Every per-combination parameter is a 1-D array of length K (stop_losses and
+    take_profits use NaN for "disabled"). The bar loop runs once; the position
+    state is a vector with one slot per combination, so K only widens the
+    array operations. While every combination is flat the loop jumps to the
+    next bar where any threshold is crossed.
+
+    crossings, if given, is a precomputed entry_crossings matrix for these
+    bars whose columns follow np.unique(entry_thresholds); callers that run
+    many windows over the same history compute it once and slice rows.
+
+    cost_models, if given, replaces the flat fee_rate: combination k is
+    costed with cost_models[cost_ids[k]] (see cost_model.py), and volumes
+    supplies bar volumes for slippage. All fills of one model on a bar are
+    costed in a single call.
+
+    sizing, if given, is a sizing spec (see position_sizing.py) applied to
+    every combination; Kelly sizing keeps a separate trade history per
+    combination. bar_fractions optionally passes the per-bar fractions of
+    a fresh sizer's begin() over these prices, so that callers running a
+    grid in chunks compute them once.
+
+    Returns (equity, trades) where equity is a (K, n) portfolio value matrix
+    and trades is a TradeBuffer ordered by exit bar, with 'combo' set.
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    corr = np.asarray(corr, dtype=np.float64)
+    px = prices.tolist()
+    n = len(px)
+
+    thresholds, threshold_ids = np.unique(np.asarray(entry_thresholds, dtype=np.float64),
+                                          return_inverse=True)
+    if crossings is None:
+        crossings = entry_crossings(corr, thresholds)
+    any_crossing = crossings.any(axis=1)
+    holding_ns = np.array([days_to_ns(d) for d in holding_days], dtype=np.int64)
+    stop_losses = np.asarray(stop_losses, dtype=np.float64)
+    take_profits = np.asarray(take_profits, dtype=np.float64)
+    # Mirror `if stop_loss and ...`: None and 0 both disable the check
+    has_stop = ~np.isnan(stop_losses) & (stop_losses != 0)
+    has_take = ~np.isnan(take_profits) & (take_profits != 0)
+    k = len(threshold_ids)
+
+    capital = np.full(k, float(initial_capital))
+    in_position = np.zeros(k, dtype=bool)
+    position_value = np.zeros(k)
+    btc_amount = np.zeros(k)
+    remaining_capital = np.zeros(k)
+    entry_idx = np.zeros(k, dtype=np.int64)
+    target_exit = np.zeros(k, dtype=np.int64)
+
+    if cost_models is not None:
+        cost_ids = np.asarray(cost_ids, dtype=np.int64)
+        volumes = None if volumes is None else np.asarray(volumes, dtype=np.float64)
+
+    def fill_costs(idx, notionals, i, side):
+        # (fill prices, fee rates) for the combinations in idx trading on bar i
+        price = px[i]
+        if cost_models is None:
+            return price, fee_rate
+        volume = None if volumes is None else volumes[i]
+        fill_prices = np.empty(len(idx))
+        fee_rates = np.empty(len(idx))
+        models = cost_ids[idx]
+        for m in np.unique(models).tolist():
+            sel = models == m
+            fill_prices[sel], fee_rates[sel] = cost_models[m].fills(price, notionals[sel], side, volume)
+        return fill_prices, fee_rates
+
+    sizer = None if sizing is None else make_sizer(sizing, n_slots=k)
+    if sizer is not None:
+        sizer.begin(prices, bar_fractions)
+
+    # Filled row by row, transposed once at the end
+    equity = np.empty((n, k), dtype=np.float64)
+    trades = TradeBuffer()
+
+    candidates = np.flatnonzero(any_crossing).tolist()
+    any_crossing = any_crossing.tolist()
+    next_candidate = 0
+
+    i = 0
+    while i < n:
+        if not in_position.any():
+            # Every combination is flat: skip to the next bar with a crossing
+            while next_candidate < len(candidates) and candidates[next_candidate] < i:
+                next_candidate += 1
+            if next_candidate == len(candidates):
+                equity[i:] = capital
+                break
+            entry = candidates[next_candidate]
+            equity[i:entry] = capital
+            i = entry
+
+        current_price = px[i]
+
+        # Entry: only bars where some threshold was crossed
+        if any_crossing[i]:
+            enter = ~in_position & crossings[i][threshold_ids]
+            if enter.any():
+                idx = np.flatnonzero(enter)
+                if sizer is None:
+                    value = capital[idx] * position_size
+                else:
+                    value = capital[idx] * entry_fraction(sizer, i, idx, position_size)
+                fill_price, fee = fill_costs(idx, value, i, 1)
+                position_value[idx] = value
+                btc_amount[idx] = (value * (1 - fee)) / fill_price
+                remaining_capital[idx] = capital[idx] - value
+                entry_idx[idx] = i
+                target_exit[idx] = ts[i] + holding_ns[idx]
+                in_position[idx] = True
+
+        if in_position.any():
+            idx = np.flatnonzero(in_position)
+            current_value = btc_amount[idx] * current_price
+            pnl_pct = (current_value - position_value[idx]) / position_value[idx]
+
+            time_exit = ts[i] >= target_exit[idx]
+            stop_exit = has_stop[idx] & (pnl_pct <= -stop_losses[idx])
+            take_exit = has_take[idx] & (pnl_pct >= take_profits[idx])
+            exit_trade = time_exit | stop_exit | take_exit
+
+            if exit_trade.any():
+                reasons = np.where(take_exit, EXIT_REASON_CODES["Take profit"],
+                                   np.where(stop_exit, EXIT_REASON_CODES["Stop loss"],
+                                            EXIT_REASON_CODES["Time exit"]))[exit_trade]
+                idx = idx[exit_trade]
+                entries = entry_idx[idx]
+                fill_price, fee = fill_costs(idx, btc_amount[idx] * current_price, i, -1)
+                exit_value = btc_amount[idx] * fill_price * (1 - fee)
+                trade_pnl = exit_value - position_value[idx]
+                trades.extend(
+                    combo=idx, entry_idx=entries, exit_idx=i,
+                    entry_ts=ts[entries], exit_ts=ts[i],
+                    entry_price=prices[entries], exit_price=current_price,
+                    entry_correlation=corr[entries],
+                    pnl=trade_pnl, pnl_pct=trade_pnl / position_value[idx] * 100,
+                    exit_reason=reasons
+                )
+                capital[idx] = remaining_capital[idx] + exit_value
+                in_position[idx] = False
+                if sizer is not None:
+                    sizer.record(idx, exit_value / position_value[idx] - 1)
+
+            equity[i] = np.where(in_position, remaining_capital + btc_amount * current_price, capital)
+        else:
+            equity[i] = capital
+
+        i += 1
+
+    return np.ascontiguousarray(equity.T), trades
+
+
+def equity_curve_metrics(equity, risk_free_rate=0.02):
+    """
+    Sharpe ratio and maximum drawdown for each row of a (K, n) equity matrix.
+
+    Follows _calculate_sharpe_ratio / _calculate_max_drawdown operation by
+    operation so the values match the pandas path.
+    """
+    returns = equity[:, 1:] / equity[:, :-1] - 1
+    excess = returns - risk_free_rate / 252
+    count = excess.shape[1]
+
+    sharpe = np.zeros(len(equity))
+    if count > 1:
+        mean = excess.sum(axis=1) / count
+        std = np.sqrt(((mean[:, None] - excess) ** 2).sum(axis=1) / (count - 1))
+        valid = std > 0
+        sharpe[valid] = np.sqrt(252) * mean[valid] / std[valid]
+
+    cummax = np.maximum.accumulate(equity, axis=1)
+    max_drawdown = ((equity - cummax) / cummax).min(axis=1)
+
+    return sharpe, max_drawdown
+
+
+def batch_metrics(equity, trades, initial_capital, risk_free_rate=0.02):
+    """
+    calculate_performance_metrics for every row of a (K, n) equity matrix.
+
+    trades is the TradeBuffer whose 'combo' column indexes the rows of
+    equity. Trade statistics are grouped with np.bincount, so a whole grid is
+    scored with a few array passes; they agree with the per-curve path up to
+    floating-point summation order. Rows without trades get zero counts and
+    NaN averages.
+
+    Returns a dict of length-K arrays keyed like calculate_performance_metrics.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    n_curves = len(equity)
+    sharpe, max_drawdown = equity_curve_metrics(equity, risk_free_rate)
+
+    combo = trades['combo']
+    pnl = trades['pnl']
+    wins = pnl > 0
+    losses = pnl < 0
+
+    def group_sum(weights):
+        return np.bincount(combo, weights=weights, minlength=n_curves)
+
+    total_trades = np.bincount(combo, minlength=n_curves)
+    winning_trades = np.bincount(combo[wins], minlength=n_curves)
+    losing_trades = np.bincount(combo[losses], minlength=n_curves)
+    gross_profit = group_sum(np.where(wins, pnl, 0.0))
+    gross_loss = -group_sum(np.where(losses, pnl, 0.0))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(total_trades > 0, winning_trades / total_trades * 100, 0.0)
+        avg_win = np.where(winning_trades > 0, gross_profit / winning_trades, 0.0)
+        avg_loss = np.where(losing_trades > 0, -gross_loss / losing_trades, 0.0)
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, np.inf)
+        total_pnl = group_sum(pnl)
+        avg_pnl = total_pnl / total_trades
+        avg_return_per_trade = group_sum(trades['pnl_pct']) / total_trades
+        avg_holding_days = group_sum(trades.holding_days().astype(np.float64)) / total_trades
+
+    return {
+        'total_trades': total_trades,
+        'winning_trades': winning_trades,
+        'losing_trades': losing_trades,
+        'win_rate': win_rate,
+        'total_pnl': total_pnl,
+        'avg_pnl': avg_pnl,
+        'avg_win': avg_win,
+        'avg_loss': avg_loss,
+        'profit_factor': profit_factor,
+        'total_return_pct': (equity[:, -1] / initial_capital - 1) * 100,
+        'avg_return_per_trade': avg_return_per_trade,
+        'sharpe_ratio': sharpe,
+        'max_drawdown_pct': max_drawdown * 100,
+        'avg_holding_days': avg_holding_days
+    }
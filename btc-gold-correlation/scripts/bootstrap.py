@@ -0,0 +1,150 @@
+"""
+Bootstrap confidence intervals for backtest metrics
+
+Daily strategy returns are resampled with the stationary bootstrap (random
+block lengths with mean mean_block) or the circular block bootstrap (fixed
+block length), which keep the serial dependence of returns; the trade list
+is resampled the same way, by default trade by trade. Resample indices for a
+whole chunk of samples are generated as one (samples, length) array and all
+metrics are reduced along its rows.
+
+Chunks run in a process pool. Each chunk draws from its own stream spawned
+from one SeedSequence, so results depend on the seed and chunk size but not
+on the number of workers.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+
+def resample_indices(n, n_samples, mean_block, rng, method='stationary'):
+    """
+    (n_samples, n) array of bootstrap indices into a series of length n.
+
+    'stationary' starts a new block at each position with probability
+    1 / mean_block; 'block' starts one every mean_block positions. Blocks
+    continue circularly from a uniformly drawn start.
+    """
+    positions = np.arange(n)
+    if method == 'stationary':
+        new_block = rng.random((n_samples, n)) < 1.0 / mean_block
+    elif method == 'block':
+        new_block = np.broadcast_to(positions % int(mean_block) == 0, (n_samples, n))
+    else:
+        raise ValueError(f"Unknown bootstrap method: {method}")
+
+    new_block = new_block.copy()
+    new_block[:, 0] = True
+    block_start = np.maximum.accumulate(np.where(new_block, positions, 0), axis=1)
+    starts = rng.integers(0, n, size=(n_samples, n))
+    first = np.take_along_axis(starts, block_start, axis=1)
+    return (first + positions - block_start) % n
+
+
+def return_metrics(returns, risk_free_rate=0.02):
+    """Sharpe ratio, total return (%) and max drawdown (%) for each row of returns."""
+    returns = np.atleast_2d(returns)
+    excess = returns - risk_free_rate / 252
+    mean = excess.mean(axis=1)
+    std = excess.std(axis=1, ddof=1) if returns.shape[1] > 1 else np.zeros(len(returns))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, np.sqrt(252) * mean / std, 0.0)
+
+    equity = np.cumprod(1 + returns, axis=1)
+    # The curve starts at 1 (initial capital) before the first return
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    return {
+        'sharpe_ratio': sharpe,
+        'total_return_pct': (equity[:, -1] - 1) * 100,
+        'max_drawdown_pct': np.minimum(((equity - peak) / peak).min(axis=1), 0.0) * 100
+    }
+
+
+def trade_list_metrics(pnl, pnl_pct):
+    """Win rate, profit factor, average P&L and average return per trade for each row."""
+    pnl = np.atleast_2d(pnl)
+    pnl_pct = np.atleast_2d(pnl_pct)
+    gross_profit = np.where(pnl > 0, pnl, 0.0).sum(axis=1)
+    gross_loss = -np.where(pnl < 0, pnl, 0.0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, np.inf)
+    return {
+        'win_rate': (pnl > 0).mean(axis=1) * 100,
+        'profit_factor': profit_factor,
+        'avg_pnl': pnl.mean(axis=1),
+        'avg_return_per_trade': pnl_pct.mean(axis=1)
+    }
+
+
+def _bootstrap_chunk(task):
+    """Metrics of one chunk of resamples, drawn from the chunk's own RNG stream."""
+    (returns, pnl, pnl_pct, n_samples, seed_sequence, method,
+     mean_block, trade_block, risk_free_rate) = task
+    rng = np.random.default_rng(seed_sequence)
+
+    idx = resample_indices(len(returns), n_samples, mean_block, rng, method)
+    metrics = return_metrics(returns[idx], risk_free_rate)
+
+    if len(pnl) > 0:
+        idx = resample_indices(len(pnl), n_samples, trade_block, rng, method)
+        metrics.update(trade_list_metrics(pnl[idx], pnl_pct[idx]))
+    return metrics
+
+
+def bootstrap_metrics(returns, pnl, pnl_pct, n_samples=10000, mean_block=20, trade_block=1,
+                      method='stationary', confidence=0.95, risk_free_rate=0.02,
+                      n_workers=None, chunk_size=250, seed=None):
+    """
+    Bootstrap confidence intervals for return and trade metrics.
+
+    Parameters:
+    - returns: daily strategy returns (portfolio_value.pct_change().dropna())
+    - pnl, pnl_pct: per-trade P&L and P&L % (may be empty)
+    - n_samples: number of resamples
+    - mean_block: mean (stationary) or fixed (block) block length for returns
+    - trade_block: block length for the trade list (1 = resample trades independently)
+    - method: 'stationary' or 'block'
+    - confidence: two-sided interval coverage
+    - n_workers: processes (default: os.cpu_count(); 1 = in-process)
+    - chunk_size: resamples per task
+    - seed: seed of the SeedSequence the per-chunk streams are spawned from
+
+    Returns a DataFrame indexed by metric with the point estimate, bootstrap
+    mean and std, and the lower/upper percentile bounds.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    pnl = np.asarray(pnl, dtype=np.float64)
+    pnl_pct = np.asarray(pnl_pct, dtype=np.float64)
+
+    sizes = [min(chunk_size, n_samples - start) for start in range(0, n_samples, chunk_size)]
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(returns, pnl, pnl_pct, size, stream, method, mean_block, trade_block, risk_free_rate)
+             for size, stream in zip(sizes, streams)]
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(tasks) <= 1:
+        chunks = [_bootstrap_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(tasks))) as executor:
+            chunks = list(executor.map(_bootstrap_chunk, tasks))
+
+    point = return_metrics(returns, risk_free_rate)
+    if len(pnl) > 0:
+        point.update(trade_list_metrics(pnl, pnl_pct))
+
+    alpha = (1 - confidence) / 2
+    rows = {}
+    for name in point:
+        samples = np.concatenate([chunk[name] for chunk in chunks])
+        finite = samples[np.isfinite(samples)]
+        rows[name] = {
+            'estimate': point[name][0],
+            'mean': finite.mean() if len(finite) else np.nan,
+            'std': finite.std(ddof=1) if len(finite) > 1 else np.nan,
+            # No interpolation, so infinite profit factors do not produce NaN
+            'lower': np.quantile(samples, alpha, method='inverted_cdf'),
+            'upper': np.quantile(samples, 1 - alpha, method='inverted_cdf')
+        }
+    return pd.DataFrame(rows).T
@@ -0,0 +1,135 @@
+"""
+Typed binary column files with an append-only watermark
+
+A ColumnCache is a directory holding one raw little-endian file per column
+(e.g. date.i8, close.f8) and a meta.json with the schema, the committed
+row count and the last-updated watermark:
+
+    data/raw/BTC/date.i8     int64 epoch nanoseconds
+    data/raw/BTC/close.f8    float64
+    data/raw/BTC/meta.json   {"schema": ..., "rows": 3950, "watermark": ...}
+
+Loading maps the files with np.memmap, so a cold start reads no more than
+the pages it touches and parses nothing. append() writes only rows after
+the watermark to the end of each file and then replaces meta.json; bytes
+past the committed row count (from an interrupted append) are ignored by
+readers and truncated by the next append.
+"""
+
+import json
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Column name -> numpy dtype string; 'date' holds epoch nanoseconds
+RAW_SCHEMA = {'date': '<i8', 'close': '<f8'}
+
+
+class ColumnCache:
+    """Append-only typed columns of one table, keyed by a sorted 'date' column."""
+
+    META_FILE = 'meta.json'
+
+    def __init__(self, path, schema=RAW_SCHEMA):
+        if 'date' not in schema:
+            raise ValueError("schema needs a 'date' column")
+        self.path = Path(path)
+        self.schema = {name: np.dtype(dtype).str for name, dtype in schema.items()}
+
+    def _column_file(self, name):
+        dtype = np.dtype(self.schema[name])
+        return self.path / f'{name}.{dtype.kind}{dtype.itemsize}'
+
+    def meta(self):
+        """Stored meta dict, or None if the cache is missing or has another schema."""
+        meta_path = self.path / self.META_FILE
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        if meta.get('schema') != self.schema:
+            return None
+        return meta
+
+    def rows(self):
+        meta = self.meta()
+        return 0 if meta is None else meta['rows']
+
+    def watermark(self):
+        """Last cached date (None for an empty cache)."""
+        meta = self.meta()
+        if meta is None or meta['watermark'] is None:
+            return None
+        return pd.Timestamp(meta['watermark'])
+
+    def load(self):
+        """Columns as read-only memory-mapped arrays ('date' as datetime64[ns])."""
+        n = self.rows()
+        columns = {}
+        for name, dtype in self.schema.items():
+            if n == 0:
+                column = np.empty(0, dtype=dtype)
+            else:
+                column = np.memmap(self._column_file(name), dtype=dtype, mode='r', shape=(n,))
+            columns[name] = column.view('datetime64[ns]') if name == 'date' else column
+        return columns
+
+    def load_series(self, column='close', name=None):
+        """One column as a Series on the cached dates (values stay memory-mapped)."""
+        columns = self.load()
+        return pd.Series(columns[column], index=pd.DatetimeIndex(columns['date']),
+                         name=name, copy=False)
+
+    def append(self, frame, **meta):
+        """
+        Append the rows of a DataFrame (DatetimeIndex, one column per non-date
+        schema column) dated after the watermark.
+
+        Extra keyword arguments are kept in meta.json. Returns the number of
+        rows written.
+        """
+        previous = self.meta() or {}
+        last = self.watermark()
+        if last is not None:
+            frame = frame[frame.index > last]
+        frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        n = self.rows()
+        for name, dtype in self.schema.items():
+            if name == 'date':
+                values = pd.DatetimeIndex(frame.index).as_unit('ns').asi8
+            else:
+                values = frame[name].to_numpy()
+            values = np.ascontiguousarray(values, dtype=dtype)
+            with open(self._column_file(name), 'ab') as f:
+                # Drop the tail of an append that never committed
+                f.truncate(n * values.itemsize)
+                f.write(values.tobytes())
+
+        rows = n + len(frame)
+        watermark = frame.index[-1] if len(frame) else last
+        self._write_meta({
+            **previous,
+            **meta,
+            'schema': self.schema,
+            'rows': rows,
+            'watermark': None if watermark is None else pd.Timestamp(watermark).isoformat(),
+            'updated_at': pd.Timestamp.now().isoformat()
+        })
+        return len(frame)
+
+    def clear(self):
+        """Forget every row (the files are truncated by the next append)."""
+        meta_path = self.path / self.META_FILE
+        if meta_path.exists():
+            meta_path.unlink()
+
+    def _write_meta(self, meta):
+        meta_path = self.path / self.META_FILE
+        tmp_path = meta_path.with_name(f'.{meta_path.name}.{uuid.uuid4().hex}')
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, meta_path)
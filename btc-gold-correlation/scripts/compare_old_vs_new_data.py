@@ -8,15 +8,17 @@ import numpy as np
 import yfinance as yf
 import matplotlib.pyplot as plt
 
+from data_access import load_frame
+
 print("="*70)
 print("🔬 新旧数据对比分析")
 print("="*70 + "\n")
 
 # 1. 加载新数据（正确处理）
 print("1️⃣  加载新数据（不使用forward fill）...")
-new_df = pd.read_parquet('improved_data_prices.parquet')
-new_returns = pd.read_parquet('improved_data_returns.parquet')
-new_corr_df = pd.read_parquet('improved_data_correlation.parquet')
+new_df = load_frame('improved_data_prices')
+new_returns = load_frame('improved_data_returns')
+new_corr_df = load_frame('improved_data_correlation')
 
 print(f"   数据范围: {new_df.index[0].date()} - {new_df.index[-1].date()}")
 print(f"   总天数: {len(new_df)}")
@@ -0,0 +1,84 @@
+"""
+Transaction-cost and slippage models
+
+A CostModel turns a batch of fills (prices, notionals, bar volumes) into
+effective fill prices and fee rates with array operations, so a kernel can
+cost every combination that trades on a bar in one call:
+
+- fees: maker or taker rate, optionally tiered by fill notional
+- spread: taker fills cross half the quoted spread
+- slippage: square-root style market impact,
+  impact * (notional / bar dollar volume) ** impact_exponent,
+  taken from OHLCV volume when it is available
+
+CostModel.flat(fee_rate) is the flat fee used by the original backtests and
+reproduces them exactly.
+"""
+
+import numpy as np
+
+
+class CostModel:
+    """Vectorized fees, spread and volume-dependent slippage."""
+
+    def __init__(self, taker_fee=0.001, maker_fee=None, tiers=None, spread=0.0,
+                 impact=0.0, impact_exponent=0.5, order_type='taker'):
+        """
+        Parameters:
+        - taker_fee, maker_fee: fee rates for the lowest tier (maker_fee defaults to taker_fee)
+        - tiers: optional list of (min_notional, maker_fee, taker_fee), applied by fill size
+        - spread: quoted bid/ask spread as a fraction of price
+        - impact, impact_exponent: slippage coefficient and exponent on the
+          fill's share of the bar's dollar volume
+        - order_type: 'taker' (cross the spread, pay impact) or 'maker' (fill at the quote)
+        """
+        if order_type not in ('taker', 'maker'):
+            raise ValueError(f"Unknown order type: {order_type}")
+
+        maker_fee = taker_fee if maker_fee is None else maker_fee
+        tiers = sorted(tiers or [])
+        self.tier_floors = np.array([0.0] + [t[0] for t in tiers], dtype=np.float64)
+        self.maker_fees = np.array([maker_fee] + [t[1] for t in tiers], dtype=np.float64)
+        self.taker_fees = np.array([taker_fee] + [t[2] for t in tiers], dtype=np.float64)
+        self.spread = spread
+        self.impact = impact
+        self.impact_exponent = impact_exponent
+        self.order_type = order_type
+
+    @classmethod
+    def flat(cls, fee_rate):
+        """Flat fee with no spread or slippage, as CorrelationTradingStrategy.fee_rate."""
+        return cls(taker_fee=fee_rate)
+
+    def fee_rates(self, notionals):
+        """Fee rate of each fill, from the tier its notional falls in."""
+        notionals = np.asarray(notionals, dtype=np.float64)
+        tier = np.searchsorted(self.tier_floors, notionals, side='right') - 1
+        fees = self.maker_fees if self.order_type == 'maker' else self.taker_fees
+        return fees[np.maximum(tier, 0)]
+
+    def slippage(self, notionals, prices, volumes=None):
+        """Price slippage of each fill as a fraction of price."""
+        notionals = np.asarray(notionals, dtype=np.float64)
+        if self.order_type == 'maker':
+            return np.zeros_like(notionals)
+
+        slip = np.full_like(notionals, self.spread / 2)
+        if self.impact and volumes is not None:
+            dollar_volume = np.asarray(volumes, dtype=np.float64) * prices
+            with np.errstate(divide='ignore', invalid='ignore'):
+                participation = np.where(dollar_volume > 0, notionals / dollar_volume, 0.0)
+            slip = slip + self.impact * participation ** self.impact_exponent
+        return slip
+
+    def fills(self, prices, notionals, side, volumes=None):
+        """
+        Effective fill prices and fee rates for a batch of fills.
+
+        side is +1 for buys (pay up) and -1 for sells (receive less).
+        Returns (fill_prices, fee_rates), each shaped like notionals.
+        """
+        notionals = np.asarray(notionals, dtype=np.float64)
+        prices = np.broadcast_to(np.asarray(prices, dtype=np.float64), notionals.shape)
+        fill_prices = prices * (1 + side * self.slippage(notionals, prices, volumes))
+        return fill_prices, self.fee_rates(notionals)
@@ -0,0 +1,147 @@
+"""
+Shared, memory-mapped access to the stored datasets
+
+The analysis and verification scripts all read the same PriceStore
+datasets (aligned_prices, log_returns, btc_gold_correlation_40d and the
+improved_data_* tables). load() serves each one as NumPy columns mapped
+from disk plus a datetime index shared by every column:
+
+    <store root>/_columns/<dataset>/v<version>/date.i8     int64 epoch ns
+    <store root>/_columns/<dataset>/v<version>/values.f8   float64, one
+                                                           contiguous column
+                                                           after another
+    <store root>/_columns/<dataset>/v<version>/meta.json   columns, rows
+
+The snapshot of a store version is written once, by the first process that
+asks for it, and is immutable afterwards; an append bumps the store version
+and the next load writes a new snapshot. Loads map the files read-only, so
+every script in a batch run shares the same pages, and an in-process LRU
+returns the already-mapped dataset on repeated loads. load_frame() wraps
+the mapped columns in a DataFrame without copying them.
+
+A dataset not in the store yet is imported once from the single-file
+table the collectors used to write (data/processed/<dataset>.parquet or
+./<dataset>.parquet, see LEGACY_DIRS), so existing data keeps working
+without re-running a collector.
+"""
+
+import json
+import os
+import shutil
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+
+
+SNAPSHOT_DIR = '_columns'
+# Where <dataset>.parquet files from before PriceStore are looked for, in order
+LEGACY_DIRS = ('data/processed', '.')
+
+
+class Dataset:
+    """Memory-mapped float64 columns of one dataset on a shared DatetimeIndex."""
+
+    def __init__(self, index, values, columns, index_name=None):
+        self.index = index
+        self.values = values
+        self.columns = list(columns)
+        self.index_name = index_name
+        self._positions = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, column):
+        """One column as a read-only memory-mapped array."""
+        return self.values[self._positions[column]]
+
+    def frame(self, columns=None):
+        """A new DataFrame over the mapped columns (selecting columns copies them)."""
+        if columns is None:
+            data = self.values.T
+            columns = self.columns
+        else:
+            data = self.values[[self._positions[c] for c in columns]].T
+        frame = pd.DataFrame(data, index=self.index, columns=columns, copy=False)
+        frame.index.name = self.index_name
+        return frame
+
+
+def load(dataset, root='data/store', legacy_dirs=LEGACY_DIRS):
+    """
+    The current version of a stored dataset, mapped from its column snapshot.
+
+    A dataset with no stored columns is first imported from
+    <dir>/<dataset>.parquet in the first of legacy_dirs that has it.
+    """
+    store = PriceStore(root)
+    if not store.columns(dataset)['columns']:
+        import_legacy(store, dataset, legacy_dirs)
+    return _open(str(store.root.resolve()), dataset, store.version(dataset))
+
+
+def load_frame(dataset, columns=None, root='data/store', legacy_dirs=LEGACY_DIRS):
+    """DataFrame of a stored dataset, as PriceStore.read_frame but memory-mapped."""
+    return load(dataset, root, legacy_dirs).frame(columns)
+
+
+def import_legacy(store, dataset, legacy_dirs=LEGACY_DIRS):
+    """Import <dir>/<dataset>.parquet into store; returns the file imported, or None."""
+    for directory in legacy_dirs:
+        path = Path(directory) / f'{dataset}.parquet'
+        if path.exists():
+            store.import_parquet(dataset, path)
+            return path
+    return None
+
+
+@lru_cache(maxsize=16)
+def _open(root, dataset, version):
+    snapshot = Path(root) / SNAPSHOT_DIR / dataset / f'v{version}'
+    if not (snapshot / 'meta.json').exists():
+        _write_snapshot(PriceStore(root), dataset, snapshot)
+
+    meta = json.loads((snapshot / 'meta.json').read_text())
+    rows, columns = meta['rows'], meta['columns']
+    if rows == 0:
+        dates = np.empty(0, dtype='<i8')
+        values = np.empty((len(columns), 0), dtype='<f8')
+    else:
+        dates = np.memmap(snapshot / 'date.i8', dtype='<i8', mode='r', shape=(rows,))
+        values = np.memmap(snapshot / 'values.f8', dtype='<f8', mode='r',
+                           shape=(len(columns), rows))
+    index = pd.DatetimeIndex(dates.view('datetime64[ns]'))
+    return Dataset(index, values, columns, meta['index_name'])
+
+
+def _write_snapshot(store, dataset, snapshot):
+    """Write the column files of one store version, then publish them by renaming."""
+    frame = store.read_frame(dataset)
+    tmp_dir = snapshot.with_name(f'.{snapshot.name}-{uuid.uuid4().hex}')
+    tmp_dir.mkdir(parents=True)
+
+    pd.DatetimeIndex(frame.index).as_unit('ns').asi8.astype('<i8').tofile(tmp_dir / 'date.i8')
+    # Column after column, so each column is one contiguous run of the file
+    np.ascontiguousarray(frame.to_numpy(dtype='<f8').T).tofile(tmp_dir / 'values.f8')
+    (tmp_dir / 'meta.json').write_text(json.dumps({
+        'columns': [str(c) for c in frame.columns],
+        'rows': len(frame),
+        'index_name': frame.index.name
+    }))
+
+    try:
+        os.rename(tmp_dir, snapshot)
+    except OSError:
+        # Another process published this version first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+
+    # Older versions are no longer loaded; open maps keep their files alive
+    for old in snapshot.parent.glob('v*'):
+        if old != snapshot:
+            shutil.rmtree(old, ignore_errors=True)
@@ -0,0 +1,103 @@
+"""
+Local stand-in for a ccxt exchange
+
+FakeExchange serves a synthetic random-walk kline history through the same
+fetch_ohlcv / parse_timeframe / rateLimit interface as ccxt, so the
+backfill (ohlcv_backfill.py) can be exercised offline with minute bars,
+network latency, injected failures and overlapping pages. Every request is
+timestamped so callers can check the rate the exchange actually saw.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class FakeNetworkError(Exception):
+    """Injected request failure, like ccxt.NetworkError."""
+
+
+class FakeExchange:
+    """Synthetic klines behind a ccxt-like fetch_ohlcv."""
+
+    UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+    def __init__(self, timeframe='1m', start='2024-01-01', end='2024-02-01', rateLimit=50,
+                 max_limit=1000, latency=0.0, failure_rate=0.0, overlap=0, seed=0):
+        """
+        Parameters:
+        - timeframe: the only timeframe served
+        - start, end: history range (UTC)
+        - rateLimit: advertised milliseconds between requests, as on ccxt exchanges
+        - max_limit: most rows returned per request
+        - latency: seconds each request takes
+        - failure_rate: probability that a request raises FakeNetworkError
+        - overlap: extra bars returned from before `since`, as some exchanges do
+        - seed: seed for prices and failures
+        """
+        self.timeframe = timeframe
+        self.rateLimit = rateLimit
+        self.max_limit = max_limit
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.overlap = overlap
+
+        step = self.parse_timeframe(timeframe) * 1000
+        start_ms = pd.Timestamp(start, tz='UTC').value // 10**6
+        end_ms = pd.Timestamp(end, tz='UTC').value // 10**6
+        timestamps = np.arange(start_ms, end_ms, step, dtype=np.int64)
+
+        rng = np.random.default_rng(seed)
+        close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, len(timestamps))))
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        spread = np.abs(rng.normal(0, 0.0005, len(timestamps))) * close
+        self.klines = np.column_stack([
+            timestamps.astype(np.float64), open_,
+            np.maximum(open_, close) + spread, np.minimum(open_, close) - spread,
+            close, rng.uniform(1, 100, len(timestamps))
+        ])
+
+        self.rng = np.random.default_rng(seed + 1)
+        self.lock = threading.Lock()
+        self.request_times = []
+
+    @classmethod
+    def parse_timeframe(cls, timeframe):
+        """Timeframe length in seconds, like ccxt.Exchange.parse_timeframe."""
+        return int(timeframe[:-1]) * cls.UNITS[timeframe[-1]]
+
+    def milliseconds(self):
+        return int(time.time() * 1000)
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None):
+        if timeframe != self.timeframe:
+            raise ValueError(f"FakeExchange serves {self.timeframe} bars, not {timeframe}")
+
+        with self.lock:
+            self.request_times.append(time.monotonic())
+            fail = self.rng.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise FakeNetworkError(f"injected failure for {symbol} since {since}")
+
+        limit = min(limit or self.max_limit, self.max_limit)
+        first = 0 if since is None else int(np.searchsorted(self.klines[:, 0], since))
+        first = max(first - self.overlap, 0)
+        rows = self.klines[first:first + limit].tolist()
+        for row in rows:
+            row[0] = int(row[0])
+        return rows
+
+    def request_count(self):
+        return len(self.request_times)
+
+    def peak_rate(self, window=1.0):
+        """Most requests seen in any `window` seconds, per second."""
+        times = np.sort(np.asarray(self.request_times))
+        if len(times) == 0:
+            return 0.0
+        counts = np.searchsorted(times, times + window) - np.arange(len(times))
+        return counts.max() / window
@@ -0,0 +1,171 @@
+"""
+Successive-halving and hyperband parameter search for CorrelationTradingStrategy
+
+Instead of backtesting every combination over the full history, candidates
+are first scored (Sharpe ratio) on a short prefix of the data; only the best
+1/eta move on to a prefix eta times longer, until the survivors are scored on
+the full history. Prefixes keep the time order, so a rung is exactly the
+backtest of the first `bars` rows. Hyperband runs several such brackets that
+trade off the number of candidates against the length of the first prefix.
+
+Parameter spaces accept discrete lists as in optimize_parameters, or
+(low, high) tuples for continuous ranges that are sampled at random.
+"""
+
+import math
+import numpy as np
+import pandas as pd
+
+from backtest_kernel import (combo_columns, equity_curve_metrics, grid_chunk_size,
+                             grid_simple_kernel)
+
+
+PARAM_DEFAULTS = (
+    ('entry_threshold', [-0.1]),
+    ('holding_days', [60]),
+    ('stop_loss', [None]),
+    ('take_profit', [None])
+)
+
+
+def sample_combinations(param_space, n_candidates, rng):
+    """
+    Draw n_candidates (entry_threshold, holding_days, stop_loss, take_profit) tuples.
+
+    A list is sampled uniformly from its values (None allowed for stops and
+    targets); a (low, high) tuple is sampled uniformly from the interval,
+    with holding_days rounded to whole days.
+    """
+    columns = []
+    for name, default in PARAM_DEFAULTS:
+        space = param_space.get(name, default)
+        if isinstance(space, tuple):
+            low, high = space
+            if name == 'holding_days':
+                values = rng.integers(int(low), int(high) + 1, size=n_candidates).tolist()
+            else:
+                values = rng.uniform(low, high, size=n_candidates).tolist()
+        else:
+            values = [space[i] for i in rng.integers(0, len(space), size=n_candidates)]
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def score_prefix(strategy, arrays, combos, bars, chunk_size=None):
+    """
+    Sharpe ratio of each combination backtested on the first `bars` rows.
+
+    Combinations that never trade in the prefix score -inf so they are the
+    first to be dropped.
+    """
+    timestamps = arrays['timestamps'][:bars]
+    prices = arrays['prices'][:bars]
+    corr = arrays['corr'][:bars]
+    chunk_size = grid_chunk_size(bars, chunk_size)
+
+    scores = np.empty(len(combos))
+    for start in range(0, len(combos), chunk_size):
+        chunk = combos[start:start + chunk_size]
+        equity, trades = grid_simple_kernel(
+            timestamps, prices, corr, strategy.initial_capital, strategy.fee_rate,
+            *combo_columns(chunk)
+        )
+        sharpe, _ = equity_curve_metrics(equity)
+        traded = np.bincount(trades['combo'], minlength=len(chunk)) > 0
+        scores[start:start + len(chunk)] = np.where(traded, sharpe, -np.inf)
+    return scores
+
+
+def successive_halving(strategy, arrays, combos, min_bars, eta=3, chunk_size=None):
+    """
+    Run one successive-halving bracket.
+
+    Parameters:
+    - strategy: CorrelationTradingStrategy providing capital, fees and metrics
+    - arrays: dict with 'timestamps', 'prices' and 'corr' for the full history
+    - combos: list of (entry_threshold, holding_days, stop_loss, take_profit)
+    - min_bars: prefix length of the first rung
+    - eta: keep the best 1/eta of the candidates and multiply the prefix by eta per rung
+
+    Returns the metric rows (as optimize_parameters) of the survivors scored
+    on the full history.
+    """
+    n_bars = len(arrays['prices'])
+    bars = max(2, min(int(min_bars), n_bars))
+
+    while bars < n_bars and len(combos) > 1:
+        scores = score_prefix(strategy, arrays, combos, bars, chunk_size)
+        keep = max(1, len(combos) // eta)
+        # Stable sort keeps the original order among equal scores
+        order = np.argsort(-scores, kind='stable')[:keep]
+        combos = [combos[i] for i in np.sort(order)]
+        bars = min(bars * eta, n_bars)
+
+    rows = []
+    chunk_size = grid_chunk_size(n_bars, chunk_size)
+    for start in range(0, len(combos), chunk_size):
+        chunk = combos[start:start + chunk_size]
+        equity, trades = grid_simple_kernel(
+            arrays['timestamps'], arrays['prices'], arrays['corr'],
+            strategy.initial_capital, strategy.fee_rate, *combo_columns(chunk)
+        )
+        rows.extend(strategy._grid_metrics_rows(chunk, equity, trades))
+    return rows
+
+
+def hyperband(strategy, arrays, param_space, min_bars, eta=3, seed=None, chunk_size=None):
+    """
+    Hyperband over a sampled parameter space.
+
+    Brackets range from many candidates starting on min_bars rows to a few
+    candidates scored on the full history only; each bracket samples its
+    own candidates from param_space and runs successive_halving.
+
+    Returns the metric rows of every bracket's survivors, with a 'bracket' column.
+    """
+    rng = np.random.default_rng(seed)
+    n_bars = len(arrays['prices'])
+    s_max = max(0, int(math.floor(math.log(n_bars / min_bars, eta) + 1e-9)))
+
+    rows = []
+    for s in range(s_max, -1, -1):
+        n_candidates = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        combos = sample_combinations(param_space, n_candidates, rng)
+        bracket_rows = successive_halving(strategy, arrays, combos,
+                                          n_bars / eta ** s, eta, chunk_size)
+        for row in bracket_rows:
+            row['bracket'] = s
+        rows.extend(bracket_rows)
+    return rows
+
+
+def run_halving_search(strategy, arrays, param_space, n_candidates=None, min_bars=None,
+                       eta=3, mode='halving', seed=None, chunk_size=None):
+    """
+    Successive-halving (mode='halving') or hyperband (mode='hyperband') search.
+
+    With mode='halving', param_space made only of lists and no n_candidates
+    runs the full grid through one bracket; otherwise n_candidates are
+    sampled. min_bars defaults to the history length divided by eta**3.
+
+    Returns the ranked metrics table, best Sharpe first.
+    """
+    n_bars = len(arrays['prices'])
+    if min_bars is None:
+        min_bars = max(2, n_bars // eta ** 3)
+
+    if mode == 'hyperband':
+        rows = hyperband(strategy, arrays, param_space, min_bars, eta, seed, chunk_size)
+    elif mode == 'halving':
+        if n_candidates is None and not any(isinstance(v, tuple) for v in param_space.values()):
+            combos = strategy._grid_combinations(param_space)
+        else:
+            combos = sample_combinations(param_space, n_candidates or 1000,
+                                         np.random.default_rng(seed))
+        rows = successive_halving(strategy, arrays, combos, min_bars, eta, chunk_size)
+    else:
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    if not rows:
+        return pd.DataFrame(rows)
+    return pd.DataFrame(rows).sort_values('sharpe_ratio', ascending=False)
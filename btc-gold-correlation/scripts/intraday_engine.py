@@ -0,0 +1,203 @@
+"""
+Intraday backtest engine for hourly and minute bars
+
+Runs the simple and dynamic correlation strategies over int64 epoch
+nanosecond timestamps and float32 or float64 price/correlation arrays
+without building DataFrames or Python lists per bar, so a decade of minute
+bars fits in a few hundred MB:
+
+- inputs are used as given (no float64 copies of whole columns); entry
+  crossings are found one block of bars at a time
+- each trade's exit is located with array operations over windows that
+  double in size, in float64, as in backtest_kernel._find_dynamic_exit
+- outputs are int8 signal/position flags, a float64 equity curve and a
+  TradeBuffer
+
+Holding periods are given either in bars (holding_bars) or as a duration
+(holding_period: pandas/NumPy timedelta or nanoseconds), instead of the
+day count used by the daily backtests.
+"""
+
+import numpy as np
+import pandas as pd
+
+from backtest_kernel import (TradeBuffer, _close_position, _find_dynamic_exit,
+                             _open_position, crossing_indices)
+
+
+def iter_crossings(corr, threshold, block_size=1 << 20):
+    """Yield entry crossing indices block by block, with the same rule as crossing_indices."""
+    last = float('nan')
+    for lo in range(0, len(corr), block_size):
+        block = corr[lo:lo + block_size]
+        yield from (crossing_indices(block, threshold, last) + lo).tolist()
+        last = float(block[-1])
+
+
+def _holding_ns(holding_period):
+    if holding_period is None:
+        return None
+    if isinstance(holding_period, (int, np.integer)):
+        return int(holding_period)
+    return int(pd.Timedelta(holding_period).value)
+
+
+def _deadline_bar(timestamps, entry, holding_bars, holding_ns):
+    """First bar at which the holding period has elapsed (len(timestamps) if never)."""
+    if holding_bars is not None:
+        return entry + int(holding_bars)
+    if holding_ns is None:
+        return len(timestamps)
+    return int(np.searchsorted(timestamps, timestamps[entry] + holding_ns, side='left'))
+
+
+def _find_simple_exit(position, start, prices, deadline_bar, stop_loss, take_profit, chunk=64):
+    """
+    First exit bar at or after start for an open simple-strategy position.
+
+    Same conditions and precedence as simple_strategy_kernel (take profit,
+    then stop loss, then time exit). Returns (exit_bar, exit_reason, values)
+    like _find_dynamic_exit.
+    """
+    n = len(prices)
+    deadline_bar = max(deadline_bar, start)
+    btc_amount = position['btc_amount']
+    position_value = position['position_value']
+    values_seen = []
+
+    lo = start
+    while lo < n:
+        hi = min(lo + chunk, n, deadline_bar + 1)
+        values = btc_amount * prices[lo:hi].astype(np.float64, copy=False)
+        pnl_pct = (values - position_value) / position_value
+
+        take = pnl_pct >= take_profit if take_profit else np.zeros(hi - lo, dtype=bool)
+        stop = pnl_pct <= -stop_loss if stop_loss else np.zeros(hi - lo, dtype=bool)
+        hits = take | stop
+        if deadline_bar < hi:
+            hits[deadline_bar - lo] = True
+
+        if hits.any():
+            k = int(hits.argmax())
+            values_seen.append(values[:k + 1])
+            if take[k]:
+                exit_reason = "Take profit"
+            elif stop[k]:
+                exit_reason = "Stop loss"
+            else:
+                exit_reason = "Time exit"
+            return lo + k, exit_reason, np.concatenate(values_seen)
+
+        values_seen.append(values)
+        lo = hi
+        chunk *= 2
+
+    return None, None, np.concatenate(values_seen) if values_seen else np.empty(0)
+
+
+def _run_events(timestamps, prices, corr, initial_capital, fee_rate, entry_threshold,
+                position_size, find_exit, block_size):
+    n = len(prices)
+    signal = np.zeros(n, dtype=np.int8)
+    position_flag = np.zeros(n, dtype=np.int8)
+    portfolio_value = np.empty(n, dtype=np.float64)
+    trades = TradeBuffer()
+    capital = initial_capital
+
+    i = 0
+    for entry in iter_crossings(corr, entry_threshold, block_size):
+        if entry < i:
+            continue
+        portfolio_value[i:entry] = capital
+
+        position = _open_position(entry, int(timestamps[entry]), float(prices[entry]),
+                                  float(corr[entry]), capital, position_size, fee_rate, 0)
+        signal[entry] = 1
+        exit_bar, exit_reason, values = find_exit(position, entry)
+
+        if exit_bar is None:
+            # Still open after the last bar
+            position_flag[entry:] = 1
+            portfolio_value[entry:] = position['remaining_capital'] + values
+            i = n
+            break
+
+        position_flag[entry:exit_bar + 1] = 1
+        portfolio_value[entry:exit_bar] = position['remaining_capital'] + values[:-1]
+        exit_value = _close_position(trades, position, exit_bar, int(timestamps[exit_bar]),
+                                     float(prices[exit_bar]), fee_rate, exit_reason,
+                                     exit_correlation=float(corr[exit_bar]))
+        capital = position['remaining_capital'] + exit_value
+        portfolio_value[exit_bar] = capital
+        signal[exit_bar] = -1
+        i = exit_bar + 1
+
+    portfolio_value[i:] = capital
+
+    return {
+        'signal': signal,
+        'position': position_flag,
+        'portfolio_value': portfolio_value,
+        'trades': trades
+    }
+
+
+def intraday_simple_backtest(timestamps, prices, corr, initial_capital=100000, fee_rate=0.001,
+                             entry_threshold=-0.1, holding_bars=None, holding_period=None,
+                             position_size=1.0, stop_loss=None, take_profit=None,
+                             block_size=1 << 20):
+    """
+    Fixed holding period strategy on intraday bars.
+
+    Parameters:
+    - timestamps: int64 epoch nanoseconds, increasing
+    - prices, corr: float32 or float64 arrays (NaN correlation never enters)
+    - holding_bars: holding period in bars, or
+    - holding_period: holding period as a duration (e.g. '36h', pd.Timedelta, ns)
+    - block_size: bars per block when scanning for entry crossings
+    - remaining parameters: as in backtest_simple_strategy
+
+    With holding_period it gives the same trades and equity curve as
+    simple_strategy_kernel with holding_days = holding_period in days.
+
+    Returns a dict with int8 'signal'/'position', float64 'portfolio_value'
+    and a 'trades' TradeBuffer.
+    """
+    if holding_bars is None and holding_period is None:
+        raise ValueError("Pass holding_bars or holding_period")
+
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    holding_ns = _holding_ns(holding_period)
+
+    def find_exit(position, entry):
+        deadline_bar = _deadline_bar(timestamps, entry, holding_bars, holding_ns)
+        return _find_simple_exit(position, entry, prices, deadline_bar, stop_loss, take_profit)
+
+    return _run_events(timestamps, prices, corr, initial_capital, fee_rate, entry_threshold,
+                       position_size, find_exit, block_size)
+
+
+def intraday_dynamic_backtest(timestamps, prices, corr, initial_capital=100000, fee_rate=0.001,
+                              entry_threshold=-0.1, exit_correlation=0.2, position_size=1.0,
+                              max_holding_bars=None, max_holding_period=None,
+                              use_trailing_stop=False, trailing_stop_pct=0.15,
+                              block_size=1 << 20):
+    """
+    Correlation-reversal strategy on intraday bars.
+
+    Parameters are those of intraday_simple_backtest and
+    backtest_dynamic_strategy; the maximum holding period is given in bars
+    (max_holding_bars) or as a duration (max_holding_period), and is
+    unlimited when neither is set. Unlike backtest_dynamic_strategy, the
+    portfolio value on an exit bar is the capital after the exit.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    holding_ns = _holding_ns(max_holding_period)
+
+    def find_exit(position, entry):
+        deadline_bar = _deadline_bar(timestamps, entry, max_holding_bars, holding_ns)
+        return _find_dynamic_exit(position, entry, timestamps, prices, corr, exit_correlation,
+                                  use_trailing_stop, trailing_stop_pct, deadline_bar=deadline_bar)
+
+    return _run_events(timestamps, prices, corr, initial_capital, fee_rate, entry_threshold,
+                       position_size, find_exit, block_size)
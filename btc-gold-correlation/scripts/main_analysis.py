@@ -4,6 +4,7 @@ Main execution script for BTC-Gold Correlation Analysis and Trading Strategy
 
 import sys
 import os
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -13,6 +14,8 @@ warnings.filterwarnings('ignore')
 # Import our modules
 from btc_gold_correlation_analysis import BTCGoldCorrelationAnalyzer
 from trading_strategy import CorrelationTradingStrategy, run_strategy_backtest
+from result_cache import ResultCache
+from rendering import BackgroundRenderer
 
 
 def print_summary_report(analyzer, strategy_simple, strategy_dynamic, metrics_simple, metrics_dynamic):
@@ -91,11 +94,21 @@ def print_summary_report(analyzer, strategy_simple, strategy_dynamic, metrics_si
     print("\n" + "=" * 70)
 
 
-def main():
-    """Main execution function."""
+def main(plots=True, cache_dir=None):
+    """
+    Main execution function.
+
+    Parameters:
+    - plots: render the PNG charts in a background process while the
+      backtests run (False skips plotting entirely)
+    - cache_dir: directory of a ResultCache reusing backtest results across
+      runs on unchanged data (None = no caching)
+    """
     print("\n🚀 Starting BTC-Gold Correlation Analysis and Trading Strategy Development")
     print("=" * 70)
 
+    renderer = BackgroundRenderer() if plots else None
+
     try:
         # Step 1: Run correlation analysis
         print("\n📊 Step 1: Running correlation analysis...")
@@ -124,16 +137,21 @@ def main():
         sig_test = analyzer.statistical_significance_test()
 
         # Create visualizations
-        print("\n📊 Creating correlation analysis visualizations...")
-        analyzer.plot_analysis()
+        if renderer is not None:
+            print("\n📊 Creating correlation analysis visualizations...")
+            analyzer.plot_analysis(renderer=renderer)
 
         # Step 2: Run trading strategy backtest
         print("\n💹 Step 2: Running trading strategy backtest...")
 
+        # Backtest results are reused across runs on unchanged data (opt-in)
+        result_cache = ResultCache(cache_dir) if cache_dir else None
+
         # Simple strategy
-        strategy_simple = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001)
+        strategy_simple = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001,
+                                                     result_cache=result_cache)
         data_simple = correlation_data.copy()
-        data_simple = strategy_simple.backtest_simple_strategy(
+        data_simple = strategy_simple.backtest_simple_strategy_fast(
             data_simple,
             entry_threshold=-0.1,
             holding_days=60,
@@ -144,9 +162,10 @@ def main():
         metrics_simple = strategy_simple.calculate_performance_metrics(data_simple)
 
         # Dynamic strategy
-        strategy_dynamic = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001)
+        strategy_dynamic = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001,
+                                                      result_cache=result_cache)
         data_dynamic = correlation_data.copy()
-        data_dynamic = strategy_dynamic.backtest_dynamic_strategy(
+        data_dynamic = strategy_dynamic.backtest_dynamic_strategy_fast(
             data_dynamic,
             entry_threshold=-0.15,
             exit_correlation=0.1,
@@ -158,8 +177,9 @@ def main():
         metrics_dynamic = strategy_dynamic.calculate_performance_metrics(data_dynamic)
 
         # Create backtest visualizations
-        print("\n📊 Creating backtest visualizations...")
-        strategy_simple.plot_backtest_results(data_simple)
+        if renderer is not None:
+            print("\n📊 Creating backtest visualizations...")
+            strategy_simple.plot_backtest_results(data_simple, renderer=renderer)
 
         # Step 3: Generate summary report
         print_summary_report(analyzer, strategy_simple, strategy_dynamic, metrics_simple, metrics_dynamic)
@@ -191,6 +211,10 @@ def main():
         metrics_summary.to_csv('strategy_performance_metrics.csv')
         print("✓ Saved: strategy_performance_metrics.csv")
 
+        if renderer is not None:
+            for path in renderer.wait():
+                print(f"✓ Saved: {path}")
+
         print("\n✅ Analysis complete! All results have been saved.")
         print("\n📁 Output files:")
         print("  • btc_gold_correlation_data.csv - Full correlation dataset")
@@ -198,8 +222,9 @@ def main():
         print("  • simple_strategy_trades.csv - Trade log for simple strategy")
         print("  • dynamic_strategy_trades.csv - Trade log for dynamic strategy")
         print("  • strategy_performance_metrics.csv - Performance metrics summary")
-        print("  • btc_gold_correlation_analysis.png - Correlation analysis chart")
-        print("  • backtest_results.png - Backtest performance chart")
+        if plots:
+            print("  • btc_gold_correlation_analysis.png - Correlation analysis chart")
+            print("  • backtest_results.png - Backtest performance chart")
 
         return analyzer, strategy_simple, strategy_dynamic
 
@@ -207,12 +232,22 @@ def main():
         print(f"\n❌ Error occurred: {str(e)}")
         import traceback
         traceback.print_exc()
+        if renderer is not None:
+            renderer.cancel()
         return None, None, None
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BTC-Gold correlation analysis and trading strategy")
+    parser.add_argument('--no-plots', action='store_true',
+                        help="skip rendering the PNG charts")
+    parser.add_argument('--cache-dir', default=None, metavar='DIR',
+                        help="reuse backtest results cached in DIR across runs (e.g. .backtest_cache); "
+                             "off by default")
+    args = parser.parse_args()
+
     # Run the complete analysis
-    analyzer, strategy_simple, strategy_dynamic = main()
+    analyzer, strategy_simple, strategy_dynamic = main(plots=not args.no_plots, cache_dir=args.cache_dir)
 
     # Additional prompt for user
     print("\n" + "=" * 70)
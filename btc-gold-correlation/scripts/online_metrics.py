@@ -0,0 +1,125 @@
+"""
+Streaming performance metrics for live equity tracking
+
+PerformanceAccumulator consumes one portfolio value per bar and one record
+per closed trade and keeps O(1) state: a running mean/variance of excess
+returns (Welford), the running peak and worst drawdown, and trade counters.
+metrics() returns the same keys as calculate_performance_metrics for the
+history seen so far, equal to the batch computation up to rounding.
+"""
+
+import numpy as np
+
+
+class PerformanceAccumulator:
+    """Online Sharpe, drawdown, P&L and win rate over a growing equity curve."""
+
+    STATE_KEYS = (
+        'bars', 'last_value', 'return_count', 'return_mean', 'return_m2',
+        'peak', 'max_drawdown', 'total_trades', 'winning_trades', 'losing_trades',
+        'gross_profit', 'gross_loss', 'total_pnl', 'total_pnl_pct', 'total_holding_days'
+    )
+
+    def __init__(self, initial_capital=100000, risk_free_rate=0.02):
+        self.initial_capital = initial_capital
+        self.risk_free_rate = risk_free_rate
+        self.bars = 0
+        self.last_value = None
+        self.return_count = 0
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        self.peak = None
+        self.max_drawdown = 0.0
+        self.total_trades = 0
+        self.winning_trades = 0
+        self.losing_trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.total_pnl = 0.0
+        self.total_pnl_pct = 0.0
+        self.total_holding_days = 0
+
+    def update(self, portfolio_value):
+        """Add the portfolio value of the next bar."""
+        portfolio_value = float(portfolio_value)
+
+        if self.last_value is not None:
+            excess = portfolio_value / self.last_value - 1 - self.risk_free_rate / 252
+            self.return_count += 1
+            delta = excess - self.return_mean
+            self.return_mean += delta / self.return_count
+            self.return_m2 += delta * (excess - self.return_mean)
+
+        if self.peak is None or portfolio_value > self.peak:
+            self.peak = portfolio_value
+        self.max_drawdown = min(self.max_drawdown, (portfolio_value - self.peak) / self.peak)
+
+        self.last_value = portfolio_value
+        self.bars += 1
+
+    def extend(self, portfolio_values):
+        """Add several bars in order."""
+        for value in portfolio_values:
+            self.update(value)
+
+    def record_trade(self, pnl, pnl_pct, holding_days):
+        """Add a closed trade."""
+        self.total_trades += 1
+        self.total_pnl += pnl
+        self.total_pnl_pct += pnl_pct
+        self.total_holding_days += int(holding_days)
+        if pnl > 0:
+            self.winning_trades += 1
+            self.gross_profit += pnl
+        elif pnl < 0:
+            self.losing_trades += 1
+            self.gross_loss -= pnl
+
+    def record_trades(self, trades):
+        """Add every trade of a TradeBuffer."""
+        for pnl, pnl_pct, holding_days in zip(trades['pnl'].tolist(), trades['pnl_pct'].tolist(),
+                                              trades.holding_days().tolist()):
+            self.record_trade(pnl, pnl_pct, holding_days)
+
+    def sharpe_ratio(self):
+        if self.return_count > 1 and self.return_m2 > 0:
+            std = np.sqrt(self.return_m2 / (self.return_count - 1))
+            return np.sqrt(252) * self.return_mean / std
+        return 0
+
+    def metrics(self):
+        """Current metrics, keyed like calculate_performance_metrics."""
+        if self.total_trades == 0:
+            return {"error": "No trades to analyze"}
+
+        return {
+            'total_trades': self.total_trades,
+            'winning_trades': self.winning_trades,
+            'losing_trades': self.losing_trades,
+            'win_rate': self.winning_trades / self.total_trades * 100,
+            'total_pnl': self.total_pnl,
+            'avg_pnl': self.total_pnl / self.total_trades,
+            'avg_win': self.gross_profit / self.winning_trades if self.winning_trades > 0 else 0,
+            'avg_loss': -self.gross_loss / self.losing_trades if self.losing_trades > 0 else 0,
+            'profit_factor': self.gross_profit / self.gross_loss if self.gross_loss > 0 else np.inf,
+            'total_return_pct': (self.last_value / self.initial_capital - 1) * 100,
+            'avg_return_per_trade': self.total_pnl_pct / self.total_trades,
+            'sharpe_ratio': self.sharpe_ratio(),
+            'max_drawdown_pct': self.max_drawdown * 100,
+            'avg_holding_days': self.total_holding_days / self.total_trades
+        }
+
+    def get_state(self):
+        """Snapshot as a json-compatible dict."""
+        state = {key: getattr(self, key) for key in self.STATE_KEYS}
+        state['initial_capital'] = self.initial_capital
+        state['risk_free_rate'] = self.risk_free_rate
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an accumulator from get_state()."""
+        accumulator = cls(state['initial_capital'], state['risk_free_rate'])
+        for key in cls.STATE_KEYS:
+            setattr(accumulator, key, state[key])
+        return accumulator
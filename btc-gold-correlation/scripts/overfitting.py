@@ -0,0 +1,167 @@
+"""
+Multiple-testing diagnostics for grid searches
+
+Ranking hundreds of combinations by raw Sharpe ratio selects for luck. This
+module scores a whole sweep from summary statistics of its equity curves:
+
+- deflated Sharpe ratio (Bailey & Lopez de Prado): the probability that a
+  combination's Sharpe ratio beats the maximum expected from N unskilled
+  trials, corrected for skewness, kurtosis and track-record length
+- probability of backtest overfitting via combinatorially symmetric
+  cross-validation (CSCV): the history is cut into blocks, every half/half
+  split of the blocks picks the in-sample best combination, and PBO is the
+  share of splits where it lands in the bottom half out of sample
+
+Only per-block sums of excess returns and their squares, plus higher
+moments, are kept per combination (return_moments), so equity chunks can be
+discarded as a sweep runs and every statistic is a matrix operation over
+all combinations at once.
+"""
+
+import itertools
+import numpy as np
+from scipy.stats import norm
+
+
+EULER_GAMMA = 0.5772156649015329
+
+
+def return_moments(equity, n_blocks=16, risk_free_rate=0.02):
+    """
+    Summary statistics of the daily excess returns of each row of a (K, n) equity matrix.
+
+    Returns a dict with 'count' (bars per block), 'block_sum' and
+    'block_sumsq' (K, n_blocks), and per-row 'skew' and 'kurtosis'.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    excess = equity[:, 1:] / equity[:, :-1] - 1 - risk_free_rate / 252
+    n_returns = excess.shape[1]
+    n_blocks = max(1, min(n_blocks, n_returns))
+    starts = np.linspace(0, n_returns, n_blocks + 1).astype(np.int64)[:-1]
+
+    squared = excess * excess
+    block_sum = np.add.reduceat(excess, starts, axis=1)
+    block_sumsq = np.add.reduceat(squared, starts, axis=1)
+
+    # Central moments, with products instead of float powers
+    centered = excess - block_sum.sum(axis=1, keepdims=True) / n_returns
+    np.multiply(centered, centered, out=squared)
+    m2 = squared.mean(axis=1)
+    m3 = np.einsum('ij,ij->i', squared, centered) / n_returns
+    m4 = np.einsum('ij,ij->i', squared, squared) / n_returns
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = np.where(m2 > 0, m3 / m2 ** 1.5, 0.0)
+        kurtosis = np.where(m2 > 0, m4 / m2 ** 2, 3.0)
+
+    return {
+        'count': np.diff(np.append(starts, n_returns)),
+        'block_sum': block_sum,
+        'block_sumsq': block_sumsq,
+        'skew': skew,
+        'kurtosis': kurtosis
+    }
+
+
+def concat_moments(chunks):
+    """Stack return_moments of consecutive chunks of combinations."""
+    return {
+        'count': chunks[0]['count'],
+        'block_sum': np.concatenate([c['block_sum'] for c in chunks]),
+        'block_sumsq': np.concatenate([c['block_sumsq'] for c in chunks]),
+        'skew': np.concatenate([c['skew'] for c in chunks]),
+        'kurtosis': np.concatenate([c['kurtosis'] for c in chunks])
+    }
+
+
+def _sharpe(total, total_sq, count):
+    """Per-period Sharpe ratio from sums of returns and squared returns (ddof=1)."""
+    # In place: this runs over (splits, combinations) matrices in the PBO loop
+    mean = total / count
+    std = total * mean
+    np.subtract(total_sq, std, out=std)
+    std /= count - 1
+    positive = std > 0
+    np.sqrt(std, out=std, where=positive)
+    sharpe = np.zeros_like(mean)
+    np.divide(mean, std, out=sharpe, where=positive)
+    return sharpe
+
+
+def deflated_sharpe_ratio(moments, n_trials=None):
+    """
+    Deflated Sharpe ratio of every combination.
+
+    n_trials defaults to the number of combinations in moments. Returns
+    (dsr, sharpe, sharpe_threshold): dsr is a probability per combination,
+    sharpe the per-period (not annualized) Sharpe ratio it is based on, and
+    sharpe_threshold the expected maximum per-period Sharpe of n_trials
+    unskilled trials.
+    """
+    count = moments['count'].sum()
+    sharpe = _sharpe(moments['block_sum'].sum(axis=1), moments['block_sumsq'].sum(axis=1), count)
+    n_trials = len(sharpe) if n_trials is None else n_trials
+
+    if n_trials > 1:
+        spread = np.sqrt(sharpe.var(ddof=1))
+        sharpe_threshold = spread * ((1 - EULER_GAMMA) * norm.ppf(1 - 1 / n_trials)
+                                     + EULER_GAMMA * norm.ppf(1 - 1 / (n_trials * np.e)))
+    else:
+        sharpe_threshold = 0.0
+
+    skew = moments['skew']
+    kurtosis = moments['kurtosis']
+    denominator = np.sqrt(np.maximum(1 - skew * sharpe + (kurtosis - 1) / 4 * sharpe ** 2, 1e-12))
+    dsr = norm.cdf((sharpe - sharpe_threshold) * np.sqrt(count - 1) / denominator)
+    return dsr, sharpe, sharpe_threshold
+
+
+def probability_of_overfitting(moments, max_cells=400_000):
+    """
+    PBO by combinatorially symmetric cross-validation.
+
+    Every way of choosing half of the blocks as in-sample is evaluated; in
+    each split the best in-sample Sharpe ratio is located among the
+    out-of-sample Sharpe ratios. Splits are processed in batches of about
+    max_cells (split, combination) cells.
+
+    Returns (pbo, logits): the share of splits whose in-sample winner ranks
+    at or below the out-of-sample median, and the logit of each winner's
+    relative out-of-sample rank.
+    """
+    block_sum = moments['block_sum']
+    block_sumsq = moments['block_sumsq']
+    count = moments['count'].astype(np.float64)
+    n_combos, n_blocks = block_sum.shape
+    if n_blocks < 2 or n_combos < 2:
+        return np.nan, np.empty(0)
+
+    half = n_blocks // 2
+    chosen = np.array(list(itertools.combinations(range(n_blocks), half)))
+    splits = np.zeros((len(chosen), n_blocks))
+    np.put_along_axis(splits, chosen, 1.0, axis=1)
+    batch = max(1, max_cells // n_combos)
+
+    # The out-of-sample half is the complement: totals minus in-sample sums
+    total_sum = block_sum.sum(axis=1)
+    total_sumsq = block_sumsq.sum(axis=1)
+    block_sum_t = np.ascontiguousarray(block_sum.T)
+    block_sumsq_t = np.ascontiguousarray(block_sumsq.T)
+
+    logits = []
+    for start in range(0, len(splits), batch):
+        in_sample = splits[start:start + batch]
+        is_sum = in_sample @ block_sum_t
+        is_sumsq = in_sample @ block_sumsq_t
+        is_count = (in_sample @ count)[:, None]
+        is_sharpe = _sharpe(is_sum, is_sumsq, is_count)
+        oos_sharpe = _sharpe(total_sum - is_sum, total_sumsq - is_sumsq, count.sum() - is_count)
+
+        best = is_sharpe.argmax(axis=1)
+        best_oos = oos_sharpe[np.arange(len(best)), best][:, None]
+        # Average rank of the winner among the out-of-sample Sharpe ratios
+        rank = (oos_sharpe < best_oos).sum(axis=1) + ((oos_sharpe == best_oos).sum(axis=1) + 1) / 2
+        relative = rank / (n_combos + 1)
+        logits.append(np.log(relative / (1 - relative)))
+
+    logits = np.concatenate(logits)
+    return float((logits <= 0).mean()), logits
@@ -0,0 +1,114 @@
+"""
+Process-pool grid search with shared-memory market data
+
+The price, correlation and timestamp arrays are copied once into shared
+memory; workers attach to them read-only and run grid_simple_kernel on
+chunks of parameter combinations. Metric rows are merged back in chunk
+order, so the result does not depend on the number of workers.
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from backtest_kernel import combo_columns, grid_chunk_size, grid_simple_kernel
+
+
+# Per-worker state, set by _init_worker
+_worker_arrays = {}
+_worker_segments = []
+_worker_strategy = None
+
+
+def publish_arrays(arrays):
+    """
+    Copy arrays into shared memory blocks.
+
+    Returns (segments, spec): the SharedMemory objects, which the caller must
+    close and unlink, and a picklable {name: (shm_name, shape, dtype)} spec
+    that workers use to attach.
+    """
+    segments = []
+    spec = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        segments.append(shm)
+        spec[name] = (shm.name, array.shape, array.dtype.str)
+    return segments, spec
+
+
+def attach_arrays(spec):
+    """Attach to blocks created by publish_arrays and return (segments, read-only views)."""
+    segments = []
+    arrays = {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        # Pool workers share the parent's resource tracker, so the parent's
+        # unlink() is the only cleanup needed
+        shm = shared_memory.SharedMemory(name=shm_name)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        view.flags.writeable = False
+        segments.append(shm)
+        arrays[name] = view
+    return segments, arrays
+
+
+def _init_worker(spec, strategy):
+    global _worker_segments, _worker_arrays, _worker_strategy
+    _worker_segments, _worker_arrays = attach_arrays(spec)
+    _worker_strategy = strategy
+
+
+def _evaluate_chunk(chunk):
+    """Backtest one chunk of (entry_threshold, holding_days, stop_loss, take_profit) tuples."""
+    strategy = _worker_strategy
+    equity, trades = grid_simple_kernel(
+        _worker_arrays['timestamps'], _worker_arrays['prices'], _worker_arrays['corr'],
+        strategy.initial_capital, strategy.fee_rate, *combo_columns(chunk)
+    )
+    return strategy._grid_metrics_rows(chunk, equity, trades)
+
+
+def run_grid_parallel(strategy, timestamps, prices, corr, combos,
+                      n_workers=None, chunk_size=None):
+    """
+    Evaluate parameter combinations across a process pool.
+
+    Parameters:
+    - strategy: CorrelationTradingStrategy providing capital, fees and metrics
+    - timestamps, prices, corr: market data arrays, published once
+    - combos: list of (entry_threshold, holding_days, stop_loss, take_profit)
+    - n_workers: pool size (default: os.cpu_count())
+    - chunk_size: combinations per task (default: about 4 tasks per worker),
+      capped by grid_chunk_size so each task's equity matrix stays bounded
+
+    Returns the list of metric rows in combination order.
+    """
+    if not combos:
+        return []
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(combos) // (n_workers * 4)))
+    chunk_size = grid_chunk_size(len(prices), chunk_size)
+    chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+
+    segments, spec = publish_arrays({
+        'timestamps': np.asarray(timestamps, dtype=np.int64),
+        'prices': np.asarray(prices, dtype=np.float64),
+        'corr': np.asarray(corr, dtype=np.float64)
+    })
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(spec, strategy)) as executor:
+            rows = []
+            for chunk_rows in executor.map(_evaluate_chunk, chunks):
+                rows.extend(chunk_rows)
+        return rows
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,285 @@
+"""
+Multi-asset portfolio backtest for the correlation signal
+
+Each column of an aligned (bars, assets) price matrix is traded with the
+simple strategy's state machine against the matching column of a signal
+(correlation) matrix: enter when the correlation crosses below the entry
+threshold, leave on take profit, stop loss, holding period or, optionally,
+correlation reversal. All columns share one cash balance. A column entering
+on a bar gets its target weight of current equity, scaled down pro rata when
+cash is short, and open positions can be rebalanced back to their target
+weights on a fixed calendar.
+
+The bar loop runs once; every asset's state is a slot in a vector (as in
+grid_simple_kernel), so entries, exit checks, marking to market and
+rebalancing are array operations across assets. While every asset is flat
+the loop jumps to the next bar with a crossing.
+
+A column is any tradable series with its own signal, so one asset traded
+against several references (BTC/Gold, BTC/DXY, ...) is several sleeves of
+the same portfolio; correlation_signals builds such matrices.
+"""
+
+import numpy as np
+import pandas as pd
+
+from backtest_kernel import EXIT_REASON_CODES, TradeBuffer, days_to_ns, sequential_sum
+
+
+def correlation_signals(prices, references, window=40):
+    """
+    Price and signal matrices for every (asset, reference) pair.
+
+    Parameters:
+    - prices: DataFrame of asset closes (e.g. BTC, ETH, SOL), one column per asset
+    - references: DataFrame of reference closes (e.g. Gold, DXY, SPX) on the same index
+    - window: rolling correlation window, in bars
+
+    The signal is the rolling correlation of log returns, as in
+    simple_data_collector.calculate_all. Returns (price_matrix, signal_matrix)
+    with one column per pair, named 'ASSET/REFERENCE'.
+    """
+    asset_returns = np.log(prices / prices.shift(1))
+    reference_returns = np.log(references / references.shift(1))
+
+    price_columns = {}
+    signal_columns = {}
+    for reference in references.columns:
+        # One rolling pass correlates every asset with this reference
+        corr = asset_returns.rolling(window).corr(reference_returns[reference])
+        for asset in prices.columns:
+            name = f'{asset}/{reference}'
+            price_columns[name] = prices[asset]
+            signal_columns[name] = corr[asset]
+    return pd.DataFrame(price_columns), pd.DataFrame(signal_columns)
+
+
+def portfolio_backtest(timestamps, prices, signals, initial_capital, fee_rate,
+                       entry_threshold=-0.1, holding_days=60, stop_loss=None, take_profit=None,
+                       exit_correlation=None, weights=None, position_size=1.0,
+                       rebalance_days=None):
+    """
+    Backtest every column of prices/signals with shared capital.
+
+    Parameters:
+    - timestamps: int64 epoch nanoseconds, one per bar
+    - prices, signals: (n, A) arrays; NaN prices (before listing, missing
+      bars) block entries and open positions keep their last known price
+    - initial_capital, fee_rate: as on CorrelationTradingStrategy
+    - entry_threshold, holding_days, stop_loss, take_profit: scalars or one
+      value per column (None/NaN/0 disables stop_loss and take_profit)
+    - exit_correlation: exit when the signal reaches it (None = never), as in
+      backtest_dynamic_strategy
+    - weights: target weight of each column (default: equal weights)
+    - position_size: fraction of equity spread over the targets
+    - rebalance_days: trade open positions back to target weight every so
+      many days (None = never); fees are paid on the traded notional
+
+    Exit checks follow the simple strategy (take profit over stop loss over
+    time exit), with correlation reversal lowest. Stops and targets compare
+    the position's value plus cash taken out by rebalancing with the cash
+    put in. With a single column and no rebalancing the result equals
+    simple_strategy_kernel.
+
+    Returns a dict with 'signal' (n, A; 1 entry, -1 exit), 'holdings'
+    (n, A market values), 'cash' and 'portfolio_value' (n,), and a 'trades'
+    TradeBuffer whose 'combo' column is the column index of each trade.
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    raw_prices = np.asarray(prices, dtype=np.float64)
+    corr = np.asarray(signals, dtype=np.float64)
+    n, n_assets = raw_prices.shape
+
+    # Last known price of every column, for marking and exiting during gaps
+    known = np.where(np.isnan(raw_prices), 0, np.arange(n)[:, None])
+    px = np.take_along_axis(raw_prices, np.maximum.accumulate(known, axis=0), axis=0)
+    tradable = ~np.isnan(raw_prices)
+
+    def per_asset(value, dtype=np.float64):
+        value = np.nan if value is None else value
+        return np.broadcast_to(np.asarray(value, dtype=dtype), (n_assets,)).copy()
+
+    thresholds = per_asset(entry_threshold)
+    holding_ns = np.array([days_to_ns(d) for d in per_asset(holding_days).tolist()], dtype=np.int64)
+    stop_losses = per_asset(stop_loss)
+    take_profits = per_asset(take_profit)
+    has_stop = ~np.isnan(stop_losses) & (stop_losses != 0)
+    has_take = ~np.isnan(take_profits) & (take_profits != 0)
+    targets = per_asset(1.0 / n_assets if weights is None else weights) * position_size
+
+    # Same crossing condition as entry_crossings, with one threshold per column
+    crossings = np.zeros((n, n_assets), dtype=bool)
+    if n > 1:
+        crossings[1:] = (corr[1:] < thresholds) & (corr[:-1] >= thresholds)
+    crossings &= tradable
+    exit_corr = np.zeros((n, n_assets), dtype=bool)
+    if exit_correlation is not None:
+        exit_corr = corr >= exit_correlation
+
+    cash = float(initial_capital)
+    in_position = np.zeros(n_assets, dtype=bool)
+    amount = np.zeros(n_assets)
+    invested = np.zeros(n_assets)
+    returned = np.zeros(n_assets)
+    entry_idx = np.zeros(n_assets, dtype=np.int64)
+    target_exit = np.zeros(n_assets, dtype=np.int64)
+    rebalance_ns = None if rebalance_days is None else days_to_ns(rebalance_days)
+    next_rebalance = None
+
+    signal = np.zeros((n, n_assets), dtype=np.int64)
+    holdings = np.zeros((n, n_assets))
+    cash_curve = np.empty(n)
+    trades = TradeBuffer()
+
+    any_crossing = crossings.any(axis=1)
+    candidates = np.flatnonzero(any_crossing).tolist()
+    any_crossing = any_crossing.tolist()
+    next_candidate = 0
+
+    i = 0
+    while i < n:
+        if not in_position.any():
+            # Every column is flat: skip to the next bar with a crossing
+            while next_candidate < len(candidates) and candidates[next_candidate] < i:
+                next_candidate += 1
+            if next_candidate == len(candidates):
+                cash_curve[i:] = cash
+                break
+            entry = candidates[next_candidate]
+            cash_curve[i:entry] = cash
+            i = entry
+            next_rebalance = None
+
+        price = px[i]
+
+        if any_crossing[i]:
+            enter = ~in_position & crossings[i]
+            if enter.any():
+                idx = np.flatnonzero(enter)
+                equity = cash + (amount[in_position] * price[in_position]).sum()
+                value = equity * targets[idx]
+                # Entries on the same bar share the free cash pro rata
+                wanted = value.sum()
+                if wanted > cash:
+                    value = value * (cash / wanted)
+                # Nothing is opened without free cash
+                idx = idx[value > 0]
+                value = value[value > 0]
+                amount[idx] = (value * (1 - fee_rate)) / price[idx]
+                invested[idx] = value
+                returned[idx] = 0.0
+                entry_idx[idx] = i
+                target_exit[idx] = ts[i] + holding_ns[idx]
+                in_position[idx] = True
+                signal[i, idx] = 1
+                cash -= value.sum()
+                if next_rebalance is None and rebalance_ns is not None:
+                    next_rebalance = ts[i] + rebalance_ns
+
+        if in_position.any():
+            idx = np.flatnonzero(in_position)
+            current_value = amount[idx] * price[idx]
+            pnl_pct = (current_value + returned[idx] - invested[idx]) / invested[idx]
+
+            time_exit = ts[i] >= target_exit[idx]
+            stop_exit = has_stop[idx] & (pnl_pct <= -stop_losses[idx])
+            take_exit = has_take[idx] & (pnl_pct >= take_profits[idx])
+            corr_exit = exit_corr[i, idx]
+            exit_trade = time_exit | stop_exit | take_exit | corr_exit
+
+            if exit_trade.any():
+                reasons = np.select(
+                    [take_exit, stop_exit, time_exit],
+                    [EXIT_REASON_CODES["Take profit"], EXIT_REASON_CODES["Stop loss"],
+                     EXIT_REASON_CODES["Time exit"]],
+                    EXIT_REASON_CODES["Correlation reversal"]
+                )[exit_trade]
+                idx = idx[exit_trade]
+                entries = entry_idx[idx]
+                exit_value = amount[idx] * price[idx] * (1 - fee_rate)
+                trade_pnl = exit_value + returned[idx] - invested[idx]
+                trades.extend(
+                    combo=idx, entry_idx=entries, exit_idx=i,
+                    entry_ts=ts[entries], exit_ts=ts[i],
+                    entry_price=px[entries, idx], exit_price=price[idx],
+                    entry_correlation=corr[entries, idx], exit_correlation=corr[i, idx],
+                    pnl=trade_pnl, pnl_pct=trade_pnl / invested[idx] * 100,
+                    exit_reason=reasons
+                )
+                cash = sequential_sum(exit_value, cash)
+                in_position[idx] = False
+                amount[idx] = 0.0
+                signal[i, idx] = -1
+
+            if next_rebalance is not None and ts[i] >= next_rebalance and in_position.any():
+                cash = _rebalance(i, price, tradable[i], in_position, amount, invested, returned,
+                                  targets, cash, fee_rate)
+                next_rebalance += rebalance_ns * ((ts[i] - next_rebalance) // rebalance_ns + 1)
+
+            holdings[i] = np.where(in_position, amount * price, 0.0)
+        cash_curve[i] = cash
+        i += 1
+
+    portfolio_value = cash_curve + holdings.sum(axis=1)
+    return {
+        'signal': signal,
+        'holdings': holdings,
+        'cash': cash_curve,
+        'portfolio_value': portfolio_value,
+        'trades': trades
+    }
+
+
+def _rebalance(i, price, tradable, in_position, amount, invested, returned, targets, cash, fee_rate):
+    """Trade open, tradable positions back to their target weights; returns the new cash."""
+    idx = np.flatnonzero(in_position & tradable)
+    if len(idx) == 0:
+        return cash
+
+    equity = cash + (amount[in_position] * price[in_position]).sum()
+    delta = equity * targets[idx] - amount[idx] * price[idx]
+
+    # Sells first, so their proceeds can fund the buys
+    sell = delta < 0
+    proceeds = -delta[sell] * (1 - fee_rate)
+    amount[idx[sell]] += delta[sell] / price[idx[sell]]
+    returned[idx[sell]] += proceeds
+    cash += proceeds.sum()
+
+    buy = delta > 0
+    spend = delta[buy]
+    if spend.sum() > cash:
+        spend = spend * (max(cash, 0.0) / spend.sum())
+    amount[idx[buy]] += spend * (1 - fee_rate) / price[idx[buy]]
+    invested[idx[buy]] += spend
+    return cash - spend.sum()
+
+
+if __name__ == "__main__":
+    # Correlation landing exactly on exit_correlation exits on that bar, as
+    # in the single-asset backtest_dynamic_strategy
+    from trading_strategy import CorrelationTradingStrategy
+
+    index = pd.date_range('2024-01-01', periods=12, freq='D')
+    data = pd.DataFrame({
+        'BTC_Close': 100.0 + np.arange(12.0),
+        '40d_correlation': [0.3, 0.2, -0.2, -0.1, 0.0, 0.1, 0.3, 0.2, -0.3, 0.05, 0.1, 0.2]
+    }, index=index)
+
+    strategy = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001)
+    strategy.backtest_dynamic_strategy(data.copy(), entry_threshold=-0.15, exit_correlation=0.1,
+                                       position_size=0.5, max_holding_days=90,
+                                       use_trailing_stop=False)
+    expected = strategy.trade_buffer
+
+    result = portfolio_backtest(index.asi8, data[['BTC_Close']].to_numpy(),
+                                data[['40d_correlation']].to_numpy(), 100000, 0.001,
+                                entry_threshold=-0.15, holding_days=90, exit_correlation=0.1,
+                                position_size=0.5)
+    trades = result['trades']
+
+    exits = trades['exit_idx'].tolist()
+    assert exits == [5, 10], exits
+    assert exits == expected['exit_idx'].tolist()
+    assert np.allclose(trades['pnl'], expected['pnl'])
+    print(f"Threshold exits on bars {exits}, matching backtest_dynamic_strategy")
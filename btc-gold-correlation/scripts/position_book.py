@@ -0,0 +1,186 @@
+"""
+Multi-lot position book for overlapping correlation signals
+
+The single-position backtests ignore a new crossing while a trade is open.
+PositionBook instead holds up to `capacity` concurrent lots in fixed-size
+NumPy columns with an active mask; marking to market and checking stop,
+target and time exits are single array operations over all slots, so the
+per-bar cost does not depend on how many lots are open.
+
+multi_lot_backtest runs the simple strategy on top of it: every entry
+crossing opens a new lot while there is a free slot and total exposure
+stays under max_exposure times equity. With capacity 1 it reproduces
+simple_strategy_kernel.
+"""
+
+import numpy as np
+
+from backtest_kernel import (EXIT_REASON_CODES, TradeBuffer, crossing_indices, days_to_ns,
+                             sequential_sum)
+
+
+class PositionBook:
+    """Fixed-capacity columns of open lots."""
+
+    COLUMNS = (
+        ('entry_idx', np.int64),
+        ('entry_ts', np.int64),
+        ('entry_price', np.float64),
+        ('entry_correlation', np.float64),
+        ('btc_amount', np.float64),
+        ('position_value', np.float64),
+        ('exit_deadline', np.int64),
+        ('stop_loss', np.float64),
+        ('take_profit', np.float64)
+    )
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.active = np.zeros(capacity, dtype=bool)
+        for name, dtype in self.COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def is_full(self):
+        return bool(self.active.all())
+
+    def open(self, entry_idx, entry_ts, entry_price, entry_correlation, position_value,
+             fee_rate, exit_deadline, stop_loss=np.nan, take_profit=np.nan):
+        """Put a new lot in the first free slot and return the slot."""
+        slot = int(self.active.argmin())
+        if self.active[slot]:
+            raise ValueError("Position book is full")
+        self.active[slot] = True
+        self.entry_idx[slot] = entry_idx
+        self.entry_ts[slot] = entry_ts
+        self.entry_price[slot] = entry_price
+        self.entry_correlation[slot] = entry_correlation
+        self.btc_amount[slot] = (position_value * (1 - fee_rate)) / entry_price
+        self.position_value[slot] = position_value
+        self.exit_deadline[slot] = exit_deadline
+        self.stop_loss[slot] = np.nan if stop_loss is None else stop_loss
+        self.take_profit[slot] = np.nan if take_profit is None else take_profit
+        return slot
+
+    def market_value(self, price):
+        """Value of every open lot at price."""
+        return np.where(self.active, self.btc_amount * price, 0.0)
+
+    def exit_codes(self, ts, price):
+        """
+        Exit reason code per slot for this bar, -1 where the lot stays open.
+
+        Same checks and precedence as the single-position loop: time exit,
+        then stop loss, then take profit (later checks win). NaN or 0 stops
+        and targets are disabled.
+        """
+        value = self.btc_amount * price
+        pnl_pct = (value - self.position_value) / np.where(self.active, self.position_value, 1.0)
+        codes = np.full(self.capacity, -1, dtype=np.int8)
+        codes[ts >= self.exit_deadline] = EXIT_REASON_CODES["Time exit"]
+        stop = (self.stop_loss != 0) & (pnl_pct <= -self.stop_loss)
+        codes[stop] = EXIT_REASON_CODES["Stop loss"]
+        take = (self.take_profit != 0) & (pnl_pct >= self.take_profit)
+        codes[take] = EXIT_REASON_CODES["Take profit"]
+        codes[~self.active] = -1
+        return codes
+
+    def close(self, trades, slots, i, ts, price, fee_rate, codes):
+        """Close the given slots at price, append them to trades and return the cash released."""
+        # Oldest lots first, so the trade log is ordered by exit then entry
+        slots = slots[np.argsort(self.entry_idx[slots], kind='stable')]
+        exit_value = self.btc_amount[slots] * price * (1 - fee_rate)
+        pnl = exit_value - self.position_value[slots]
+        count = len(slots)
+
+        trades.extend(
+            entry_idx=self.entry_idx[slots],
+            exit_idx=np.full(count, i, dtype=np.int64),
+            entry_ts=self.entry_ts[slots],
+            exit_ts=np.full(count, ts, dtype=np.int64),
+            entry_price=self.entry_price[slots],
+            exit_price=np.full(count, price),
+            entry_correlation=self.entry_correlation[slots],
+            pnl=pnl,
+            pnl_pct=pnl / self.position_value[slots] * 100,
+            exit_reason=codes[slots]
+        )
+        self.active[slots] = False
+        return sequential_sum(exit_value)
+
+
+def multi_lot_backtest(timestamps, prices, corr, initial_capital, fee_rate,
+                       entry_threshold=-0.1, holding_days=60, position_size=1.0,
+                       stop_loss=None, take_profit=None, max_lots=5, max_exposure=1.0):
+    """
+    Simple strategy with up to max_lots concurrent lots.
+
+    Each entry crossing opens a lot worth position_size of the free cash,
+    reduced so that the market value of all open lots stays within
+    max_exposure times equity; the crossing is skipped if the book is full
+    or nothing can be added. Every lot has its own holding deadline, stop
+    and target. Bars without open lots are skipped up to the next crossing.
+
+    Returns a dict with 'signal' (1 on entry bars, -1 on bars where a lot
+    closed), 'position' (number of open lots), 'portfolio_value' and a
+    'trades' TradeBuffer.
+    """
+    n = len(prices)
+    signal = np.zeros(n, dtype=np.int64)
+    open_lots = np.zeros(n, dtype=np.int64)
+    portfolio_value = np.empty(n, dtype=np.float64)
+
+    ts = np.asarray(timestamps, dtype=np.int64)
+    px = np.asarray(prices, dtype=np.float64)
+    cr = np.asarray(corr, dtype=np.float64)
+    holding_ns = days_to_ns(holding_days)
+    book = PositionBook(max_lots)
+    trades = TradeBuffer()
+    cash = initial_capital
+
+    is_entry = np.zeros(n, dtype=bool)
+    is_entry[crossing_indices(cr, entry_threshold)] = True
+    entries = np.flatnonzero(is_entry).tolist()
+    next_entry = 0
+
+    i = 0
+    while i < n:
+        if len(book) == 0:
+            while next_entry < len(entries) and entries[next_entry] < i:
+                next_entry += 1
+            if next_entry == len(entries):
+                portfolio_value[i:] = cash
+                break
+            entry = entries[next_entry]
+            portfolio_value[i:entry] = cash
+            i = entry
+
+        price = px[i]
+        if is_entry[i] and not book.is_full():
+            lots_value = book.market_value(price).sum()
+            headroom = max_exposure * (cash + lots_value) - lots_value
+            position_value = min(cash * position_size, headroom)
+            if position_value > 0:
+                book.open(i, ts[i], price, cr[i], position_value, fee_rate,
+                          ts[i] + holding_ns, stop_loss, take_profit)
+                cash -= position_value
+                signal[i] = 1
+
+        codes = book.exit_codes(ts[i], price)
+        closing = np.flatnonzero(codes >= 0)
+        if len(closing) > 0:
+            cash += book.close(trades, closing, i, ts[i], price, fee_rate, codes)
+            signal[i] = -1
+
+        open_lots[i] = len(book) + len(closing)
+        portfolio_value[i] = cash + book.market_value(price).sum()
+        i += 1
+
+    return {
+        'signal': signal,
+        'position': open_lots,
+        'portfolio_value': portfolio_value,
+        'trades': trades
+    }
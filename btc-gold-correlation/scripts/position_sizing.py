@@ -0,0 +1,270 @@
+"""
+Position sizing from rolling statistics
+
+The backtests put a constant position_size fraction of capital into each
+trade. A sizing spec replaces it with a fraction read at entry time:
+
+- {'method': 'volatility', 'target_vol': 0.5, 'window': 30}: target an
+  annualized volatility, fraction = target_vol / realized volatility of the
+  last `window` log returns
+- {'method': 'kelly', 'window': 20, 'scale': 0.5}: fractional Kelly bet
+  p - (1 - p) / b from the win rate p and win/loss ratio b of the last
+  `window` closed trades
+
+Specs are plain dicts so they fit in the kernel params, the json state and
+result cache keys. Both sizers keep running sums over a ring buffer, so
+each update is O(1) whatever the window: realized volatility adds each new
+bar return and drops the expired one, Kelly statistics do the same per
+closed trade. The volatility fractions of a whole run are computed before
+the bar loop, as a cumulative sum of those add/drop steps in NumPy. Until a
+sizer has a full window it returns NaN and the kernels fall back to
+position_size.
+
+The kernels carry a sizer's state between calls like the rest of their
+state, so advance() keeps the rolling windows of earlier bars and trades.
+"""
+
+import numpy as np
+
+
+class VolatilitySizer:
+    """Volatility targeting from a rolling window of log returns."""
+
+    def __init__(self, target_vol=0.5, window=30, periods_per_year=252,
+                 min_fraction=0.01, max_fraction=1.0):
+        """
+        Parameters:
+        - target_vol: annualized volatility to target
+        - window: number of bar returns in the rolling estimate
+        - periods_per_year: bars per year, to annualize (252 as in the Sharpe ratio)
+        - min_fraction, max_fraction: bounds on the fraction of capital
+        """
+        if min_fraction <= 0:
+            raise ValueError("min_fraction must be positive")
+        self.target_vol = target_vol
+        self.window = int(window)
+        self.periods_per_year = periods_per_year
+        self.min_fraction = min_fraction
+        self.max_fraction = max_fraction
+        self.last_price = None
+        self.reset()
+        self.bar_fractions = np.empty(0)
+
+    def reset(self):
+        """Forget every return."""
+        self.buffer = [0.0] * self.window
+        self.head = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, r):
+        """Add one log return, dropping the oldest once the window is full (O(1))."""
+        old = 0.0
+        if self.count == self.window:
+            old = self.buffer[self.head]
+        else:
+            self.count += 1
+        self.buffer[self.head] = r
+        self.head = (self.head + 1) % self.window
+        # One step of the cumulative sums in begin(), rounded the same way
+        self.total += r - old
+        self.total_sq += r * r - old * old
+
+    def current_fraction(self):
+        """Fraction from the returns in the window; NaN until it is full."""
+        if self.count < self.window:
+            return np.nan
+        return float(self._fractions(np.array([self.total]), np.array([self.total_sq]))[0])
+
+    def _fractions(self, total, total_sq):
+        mean = total / self.window
+        variance = np.maximum(total_sq / self.window - mean * mean, 0.0)
+        vol = np.sqrt(variance * self.periods_per_year)
+        with np.errstate(divide='ignore'):
+            fraction = np.where(vol > 0, self.target_vol / vol, np.inf)
+        return np.clip(fraction, self.min_fraction, self.max_fraction)
+
+    def begin(self, prices, bar_fractions=None):
+        """
+        Compute the fraction of every bar of prices, continuing after the last call.
+
+        bar_fractions, if given, is the result of begin() over the same
+        prices from the same state (e.g. for another chunk of a grid) and is
+        used as is. Returns the fractions.
+        """
+        if bar_fractions is not None:
+            self.bar_fractions = bar_fractions
+            return bar_fractions
+        prices = np.asarray(prices, dtype=np.float64)
+        self.bar_fractions = np.full(len(prices), np.nan)
+        if len(prices) == 0:
+            return self.bar_fractions
+
+        previous = prices[:-1] if self.last_price is None else np.append(self.last_price, prices[:-1])
+        new_returns = np.log(prices[len(prices) - len(previous):] / previous)
+
+        # Returns still in the window, oldest first, then the new ones; each
+        # new return drops the one `window` places before it
+        window = self.window
+        carried = np.asarray(self.get_state()['returns'], dtype=np.float64)
+        returns = np.concatenate([carried, new_returns])
+        positions = np.arange(len(carried), len(returns))
+        dropped = np.where(positions >= window, returns[np.maximum(positions - window, 0)], 0.0)
+
+        # The running sums as cumulative sums that start from the carried
+        # totals: np.cumsum adds left to right like update(), so splitting a
+        # run changes nothing
+        total = np.cumsum(np.concatenate([[self.total], new_returns - dropped]))[1:]
+        total_sq = np.cumsum(np.concatenate(
+            [[self.total_sq], new_returns * new_returns - dropped * dropped]))[1:]
+
+        offset = len(prices) - len(new_returns)
+        full = positions + 1 >= window
+        self.bar_fractions[offset:][full] = self._fractions(total[full], total_sq[full])
+
+        if len(new_returns):
+            tail = returns[-window:].tolist()
+            self.reset()
+            self.buffer[:len(tail)] = tail
+            self.count = len(tail)
+            self.head = self.count % window
+            self.total = float(total[-1])
+            self.total_sq = float(total_sq[-1])
+        self.last_price = float(prices[-1])
+        return self.bar_fractions
+
+    def fraction(self, i, slots):
+        """Fraction of capital for an entry on bar i (same for every slot); NaN while warming up."""
+        return self.bar_fractions[i]
+
+    def record(self, slots, returns):
+        """Trade outcomes do not affect volatility targeting."""
+
+    def get_state(self):
+        order = [(self.head - self.count + k) % self.window for k in range(self.count)]
+        return {'last_price': self.last_price, 'returns': [self.buffer[k] for k in order],
+                'total': self.total, 'total_sq': self.total_sq}
+
+    def set_state(self, state):
+        self.last_price = state['last_price']
+        self.reset()
+        returns = list(state['returns'])[-self.window:]
+        self.buffer[:len(returns)] = returns
+        self.count = len(returns)
+        self.head = self.count % self.window
+        # The saved sums, not a fresh sum of the window, so the float
+        # rounding continues exactly as in an unsplit run
+        self.total = state.get('total', sum(returns))
+        self.total_sq = state.get('total_sq', sum(r * r for r in returns))
+
+
+class KellySizer:
+    """Fractional Kelly sizing from the last `window` trades of each slot."""
+
+    def __init__(self, window=20, scale=0.5, min_trades=None, min_fraction=0.01,
+                 max_fraction=1.0, n_slots=1):
+        """
+        Parameters:
+        - window: number of past trades in the estimate
+        - scale: multiplier on the full Kelly fraction (0.5 = half Kelly)
+        - min_trades: trades needed before sizing starts (default: window)
+        - min_fraction, max_fraction: bounds on the fraction of capital
+        - n_slots: independent trade histories (one per grid combination)
+        """
+        if min_fraction <= 0:
+            raise ValueError("min_fraction must be positive")
+        self.window = int(window)
+        self.scale = scale
+        self.min_trades = self.window if min_trades is None else min(int(min_trades), self.window)
+        self.min_fraction = min_fraction
+        self.max_fraction = max_fraction
+        self.reset(n_slots)
+
+    def reset(self, n_slots):
+        """Forget every trade."""
+        self.buffer = np.zeros((n_slots, self.window))
+        self.count = np.zeros(n_slots, dtype=np.int64)
+        self.head = np.zeros(n_slots, dtype=np.int64)
+        self.win_count = np.zeros(n_slots, dtype=np.int64)
+        self.win_sum = np.zeros(n_slots)
+        self.loss_sum = np.zeros(n_slots)
+
+    def begin(self, prices, bar_fractions=None):
+        """Kelly sizing depends only on closed trades."""
+
+    def fraction(self, i, slots):
+        """Fraction of capital for the given slots; NaN where fewer than min_trades closed."""
+        count = self.count[slots]
+        wins = self.win_count[slots]
+        losses = count - wins
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = wins / count
+            # b = average win / average loss; no losses means an unbounded edge
+            b = (self.win_sum[slots] / wins) / (self.loss_sum[slots] / losses)
+            kelly = np.where(losses > 0, p - (1 - p) / b, np.inf)
+            kelly = np.where(wins > 0, kelly, 0.0)
+        fractions = np.clip(self.scale * kelly, self.min_fraction, self.max_fraction)
+        return np.where(count >= self.min_trades, fractions, np.nan)
+
+    def record(self, slots, returns):
+        """Add closed-trade returns (fractions, not %) for the given distinct slots."""
+        slots = np.atleast_1d(slots)
+        returns = np.broadcast_to(np.asarray(returns, dtype=np.float64), slots.shape)
+        head = self.head[slots]
+
+        full = self.count[slots] >= self.window
+        self._accumulate(slots[full], self.buffer[slots[full], head[full]], -1)
+        self._accumulate(slots, returns, 1)
+
+        self.buffer[slots, head] = returns
+        self.head[slots] = (head + 1) % self.window
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.window)
+
+    def _accumulate(self, slots, returns, sign):
+        win = returns > 0
+        self.win_count[slots] += sign * win
+        self.win_sum[slots] += sign * np.where(win, returns, 0.0)
+        self.loss_sum[slots] -= sign * np.where(returns < 0, returns, 0.0)
+
+    def get_state(self):
+        """Trade returns of every slot, oldest first."""
+        returns = []
+        for slot in range(len(self.count)):
+            order = (self.head[slot] - self.count[slot] + np.arange(self.count[slot])) % self.window
+            returns.append(self.buffer[slot, order].tolist())
+        return {'returns': returns}
+
+    def set_state(self, state):
+        returns = state['returns']
+        self.reset(len(returns))
+        for slot, values in enumerate(returns):
+            for value in values:
+                self.record(slot, value)
+
+
+SIZERS = {
+    'volatility': VolatilitySizer,
+    'kelly': KellySizer
+}
+
+
+def make_sizer(spec, n_slots=1, state=None):
+    """Build the sizer for a spec dict (see module docstring), optionally restoring its state."""
+    params = dict(spec)
+    method = params.pop('method')
+    if method not in SIZERS:
+        raise ValueError(f"Unknown sizing method: {method}")
+    if method == 'kelly':
+        params['n_slots'] = n_slots
+
+    sizer = SIZERS[method](**params)
+    if state is not None:
+        sizer.set_state(state)
+    return sizer
+
+
+def entry_fraction(sizer, i, slots, position_size):
+    """Fraction of capital to invest on bar i, falling back to position_size while warming up."""
+    fraction = sizer.fraction(i, slots)
+    return np.where(np.isnan(fraction), position_size, fraction)
@@ -0,0 +1,271 @@
+"""
+Append-only Parquet store for price, return and correlation tables
+
+Each dataset (e.g. 'improved_data_prices') is a directory of Hive
+partitions, one per column (asset) and calendar month:
+
+    <root>/<dataset>/asset=BTC/year=2024/month=5/part-<ns>-<id>.parquet
+
+Every file holds (date, value) rows. append() only writes rows after the
+last stored date of each column, as a small file per touched month, so a
+daily refresh writes kilobytes instead of the whole history; rows at or
+before that watermark are never rewritten. Trailing NaNs of a column are
+held back, so a value not yet published when the frame is saved (gold
+or SPX for a date BTC already has) is written when it arrives instead of
+being frozen as NaN behind the watermark. compact() merges the small files
+of each partition into one, and compact_in_background() runs it on a
+worker thread. Appends, reads and the compaction of each partition take a
+process-wide lock, so a background compaction never removes files from
+under them; a reader in another process that loses that race re-lists the
+files once.
+
+read_frame() rebuilds the wide DataFrame that used to be saved with
+to_parquet, loading only the requested columns and date range: the filter
+is pushed down to pyarrow, which skips other partitions entirely and row
+groups outside the range by their statistics. import_parquet() loads one of
+those single-file tables into a dataset.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# Serializes file removal (compaction) with appends and reads in this process
+_LOCK = threading.RLock()
+
+
+class PriceStore:
+    """Partitioned, append-only Parquet tables of dated columns."""
+
+    META_FILE = '_columns.json'
+
+    def __init__(self, root='data/store'):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._executor = None
+
+    def _dataset_dir(self, dataset):
+        return self.root / dataset
+
+    def _partition_dir(self, dataset, asset, year, month):
+        return self._dataset_dir(dataset) / f'asset={asset}' / f'year={year}' / f'month={month}'
+
+    def datasets(self):
+        return sorted(p.name for p in self.root.iterdir()
+                      if p.is_dir() and not p.name.startswith(('.', '_')))
+
+    def columns(self, dataset):
+        """Column order, index name and version of a dataset."""
+        meta_path = self._dataset_dir(dataset) / self.META_FILE
+        if not meta_path.exists():
+            return {'columns': [], 'index_name': None, 'version': 0}
+        return json.loads(meta_path.read_text())
+
+    def version(self, dataset):
+        """Counter bumped by every append that wrote rows (compaction keeps it)."""
+        return self.columns(dataset).get('version', 0)
+
+    def _write_meta(self, dataset, meta):
+        meta_path = self._dataset_dir(dataset) / self.META_FILE
+        tmp_path = meta_path.with_name(f'.{meta_path.name}.{uuid.uuid4().hex}')
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, meta_path)
+
+    def watermark(self, dataset, asset):
+        """Last stored date of a column (None if it has no rows yet)."""
+        asset_dir = self._dataset_dir(dataset) / f'asset={asset}'
+        months = sorted(
+            ((int(y.name[5:]), int(m.name[6:]), m) for y in asset_dir.glob('year=*')
+             for m in y.glob('month=*')),
+            reverse=True
+        )
+        # The newest non-empty month holds the watermark
+        for _, _, month_dir in months:
+            files = self._part_files(month_dir)
+            if files:
+                dates = pa.concat_arrays([pq.read_table(f, columns=['date'])['date'].combine_chunks()
+                                          for f in files])
+                return pd.Timestamp(pc.max(dates).as_py())
+        return None
+
+    def _part_files(self, partition_dir):
+        return sorted(p for p in partition_dir.glob('*.parquet') if not p.name.startswith(('.', '_')))
+
+    def _write_part(self, partition_dir, table):
+        """Write a part file atomically: readers never see a partial file."""
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        name = f'part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet'
+        tmp_path = partition_dir / f'.{name}'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, partition_dir / name)
+
+    def append(self, dataset, frame):
+        """
+        Append the rows of a wide DataFrame (DatetimeIndex, one column per asset).
+
+        For every column only rows after its watermark are written, one file
+        per calendar month touched. NaN values followed by a later value are
+        stored, so read_frame returns the same rows and columns; a column's
+        trailing NaNs are left for a later append (until then read_frame has
+        NaN there, or no row if every column is NaN). Returns the number of
+        rows written.
+        """
+        written = 0
+        with _LOCK:
+            meta = self.columns(dataset)
+            if not meta['columns']:
+                meta['index_name'] = frame.index.name
+            meta['columns'] = meta['columns'] + [str(c) for c in frame.columns
+                                                 if str(c) not in meta['columns']]
+            self._dataset_dir(dataset).mkdir(parents=True, exist_ok=True)
+
+            for column in frame.columns:
+                written += self._append_column(dataset, str(column), frame[column])
+            if written:
+                meta['version'] = meta.get('version', 0) + 1
+            self._write_meta(dataset, meta)
+        return written
+
+    def import_parquet(self, dataset, path):
+        """
+        Append a wide table saved with DataFrame.to_parquet (the layout before
+        this store). Rows already stored are skipped as in append(), so
+        importing the same file twice writes nothing. Returns the number of
+        rows written.
+        """
+        return self.append(dataset, pd.read_parquet(path))
+
+    def _append_column(self, dataset, asset, series):
+        last = self.watermark(dataset, asset)
+        if last is not None:
+            series = series[series.index > last]
+        # Hold back trailing NaNs: the watermark must not pass values that
+        # have not been published yet
+        valid = np.flatnonzero(series.notna().to_numpy())
+        series = series.iloc[:valid[-1] + 1] if len(valid) else series.iloc[:0]
+
+        dates = pd.DatetimeIndex(series.index)
+        for (year, month), chunk in series.groupby([dates.year, dates.month]):
+            table = pa.table({
+                'date': pa.array(pd.DatetimeIndex(chunk.index).values),
+                'value': pa.array(chunk.to_numpy(dtype='float64'))
+            })
+            self._write_part(self._partition_dir(dataset, asset, year, month), table)
+        return len(series)
+
+    def read_frame(self, dataset, columns=None, start=None, end=None):
+        """
+        Wide DataFrame of a dataset, limited to columns and [start, end].
+
+        Partitions of other columns and months are not opened; within the
+        remaining files, row groups outside the date range are skipped.
+        """
+        meta = self.columns(dataset)
+        columns = meta['columns'] if columns is None else [str(c) for c in columns]
+        path = self._dataset_dir(dataset)
+        if not columns or not path.exists():
+            raise FileNotFoundError(f"No stored columns for dataset {dataset!r} in {self.root}")
+
+        condition = ds.field('asset').isin(columns)
+        if start is not None:
+            start = pd.Timestamp(start)
+            condition &= (ds.field('year') > start.year) | (
+                (ds.field('year') == start.year) & (ds.field('month') >= start.month))
+            condition &= ds.field('date') >= pa.scalar(start.as_unit('ns'), pa.timestamp('ns'))
+        if end is not None:
+            end = pd.Timestamp(end)
+            condition &= (ds.field('year') < end.year) | (
+                (ds.field('year') == end.year) & (ds.field('month') <= end.month))
+            condition &= ds.field('date') <= pa.scalar(end.as_unit('ns'), pa.timestamp('ns'))
+
+        with _LOCK:
+            for attempt in range(2):
+                try:
+                    data = ds.dataset(path, format='parquet', partitioning='hive')
+                    table = data.to_table(columns=['date', 'value', 'asset'], filter=condition)
+                    break
+                except FileNotFoundError:
+                    # Another process compacted a partition after it was listed
+                    if attempt:
+                        raise
+        long = table.to_pandas()
+        # A compaction in progress can briefly expose a row twice
+        long = long.drop_duplicates(['asset', 'date'], keep='last')
+        frame = long.pivot(index='date', columns='asset', values='value')
+        # Columns with nothing stored yet (all NaN so far) read as NaN
+        frame = frame.reindex(columns=columns)
+        frame.columns.name = None
+        frame.index.name = meta['index_name']
+        return frame
+
+    def compact(self, dataset=None, min_files=2):
+        """Merge the part files of every partition that has at least min_files of them."""
+        datasets = self.datasets() if dataset is None else [dataset]
+        merged = 0
+        for name in datasets:
+            for partition_dir in self._dataset_dir(name).glob('asset=*/year=*/month=*'):
+                with _LOCK:
+                    files = self._part_files(partition_dir)
+                    if len(files) < min_files:
+                        continue
+                    table = pa.concat_tables([pq.read_table(f, columns=['date', 'value'])
+                                              for f in files])
+                    # Write the merged file before removing its inputs
+                    self._write_part(partition_dir, table.sort_by('date'))
+                    for f in files:
+                        f.unlink()
+                    merged += len(files)
+        return merged
+
+    def compact_in_background(self, dataset=None, min_files=2):
+        """Run compact() on a worker thread; returns its Future."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor.submit(self.compact, dataset, min_files)
+
+
+if __name__ == "__main__":
+    # Offline check: appends, a late value behind trailing NaNs, compaction
+    # and a pushed-down read
+    import tempfile
+
+    index = pd.date_range('2024-01-01', periods=120, freq='D', name='Date')
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({'BTC': rng.normal(size=120), 'Gold': rng.normal(size=120)}, index=index)
+    frame.loc[frame.index.dayofweek >= 5, 'Gold'] = np.nan
+
+    with tempfile.TemporaryDirectory() as root:
+        store = PriceStore(root)
+        # Gold for the last two days is not published yet on the first save
+        first = frame.iloc[:100].copy()
+        first.iloc[-2:, 1] = np.nan
+        store.append('prices', first)
+        assert store.watermark('prices', 'BTC') == index[99]
+
+        store.append('prices', frame)
+        pd.testing.assert_frame_equal(store.read_frame('prices'), frame, check_freq=False)
+
+        store.compact_in_background().result()
+        part = store.read_frame('prices', columns=['Gold'], start='2024-02-10', end='2024-03-05')
+        pd.testing.assert_frame_equal(part, frame.loc['2024-02-10':'2024-03-05', ['Gold']],
+                                      check_freq=False)
+
+        # A table saved with to_parquet before the store existed
+        legacy = Path(root) / 'legacy.parquet'
+        frame.to_parquet(legacy)
+        assert store.import_parquet('legacy', legacy) > 0
+        assert store.import_parquet('legacy', legacy) == 0
+        pd.testing.assert_frame_equal(store.read_frame('legacy'), frame, check_freq=False)
+    print("Late values filled in; compacted and imported tables read back unchanged")
@@ -0,0 +1,257 @@
+"""
+Chart rendering off the critical path
+
+Long series are decimated before drawing: min/max decimation keeps the
+lowest and highest point of every bucket, so spikes and drawdowns survive,
+and LTTB (largest triangle three buckets) is available for smoother lines.
+A minute-bar backtest is drawn from a few thousand points instead of
+millions.
+
+BackgroundRenderer runs render functions in a process pool with the
+headless Agg backend, so PNGs are written while the analysis continues.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# Points per line after decimation (about two per horizontal pixel at 300 dpi)
+MAX_POINTS = 4000
+
+# A fixed legend corner: matplotlib's 'best' placement scans every plotted
+# vertex and was the slowest step of rendering long backtests
+LEGEND_LOC = 'upper left'
+
+
+def minmax_indices(values, n_buckets):
+    """Sorted indices of the minimum and maximum of each of n_buckets equal buckets, plus both ends."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(n_buckets, size)
+
+    # NaN (gaps and padding) never wins a bucket unless the bucket is all NaN
+    lows = np.where(np.isnan(padded), np.inf, padded).argmin(axis=1)
+    highs = np.where(np.isnan(padded), -np.inf, padded).argmax(axis=1)
+    offsets = np.arange(n_buckets) * size
+    indices = np.concatenate([[0, n - 1], offsets + lows, offsets + highs])
+    return np.unique(indices[indices < n])
+
+
+def lttb_indices(x, y, n_out):
+    """Indices kept by largest-triangle-three-buckets downsampling to n_out points."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for b in range(n_out - 2):
+        start, stop = edges[b], edges[b + 1]
+        next_stop = edges[b + 2] if b + 2 < len(edges) else n
+        # Average of the next bucket is the third triangle vertex
+        avg_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        avg_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+        area = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[b + 1] = previous
+    return selected
+
+
+def downsample(data, columns, max_points=MAX_POINTS, method='minmax', keep=None):
+    """
+    Rows of data needed to draw columns with about max_points points each.
+
+    The union of the rows chosen for every column is returned, plus the rows
+    where the boolean mask keep is set (e.g. trade markers). Frames already
+    short enough are returned unchanged.
+    """
+    if len(data) <= max_points:
+        return data
+
+    if method == 'minmax':
+        chosen = [minmax_indices(data[c].to_numpy(), max(1, max_points // 2)) for c in columns]
+    elif method == 'lttb':
+        x = data.index.asi8 if hasattr(data.index, 'asi8') else np.arange(len(data))
+        chosen = [lttb_indices(x, data[c].to_numpy(), max_points) for c in columns]
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    if keep is not None:
+        chosen.append(np.flatnonzero(np.asarray(keep)))
+    return data.iloc[np.unique(np.concatenate(chosen))]
+
+
+def render_backtest_results(data, trades_df, initial_capital, path='backtest_results.png',
+                            dpi=300, max_points=MAX_POINTS):
+    """Draw the backtest chart of plot_backtest_results from decimated series and save it."""
+    import matplotlib.pyplot as plt
+
+    # Entries and exits are drawn as markers, so their rows are always kept
+    markers = data['signal'] != 0 if 'signal' in data.columns else None
+    plot_data = downsample(data, ['portfolio_value', 'BTC_Close', '40d_correlation'],
+                           max_points, keep=markers)
+
+    fig, axes = plt.subplots(4, 1, figsize=(15, 12))
+
+    # Plot 1: Portfolio value over time
+    axes[0].plot(plot_data.index, plot_data['portfolio_value'], label='Portfolio Value', linewidth=2)
+    axes[0].axhline(y=initial_capital, color='gray', linestyle='--', alpha=0.5)
+    axes[0].set_ylabel('Portfolio Value ($)')
+    axes[0].set_title('Backtest Results: BTC-Gold Correlation Trading Strategy', fontweight='bold')
+    axes[0].legend(loc=LEGEND_LOC)
+    axes[0].grid(True, alpha=0.3)
+
+    # Mark entry and exit points
+    entries = plot_data[plot_data['signal'] == 1]
+    exits = plot_data[plot_data['signal'] == -1]
+
+    # Plot 2: BTC price with trade signals
+    axes[1].plot(plot_data.index, plot_data['BTC_Close'], label='BTC Price', color='orange', linewidth=1)
+    axes[1].scatter(entries.index, entries['BTC_Close'], color='green', marker='^', s=100, label='Buy')
+    axes[1].scatter(exits.index, exits['BTC_Close'], color='red', marker='v', s=100, label='Sell')
+    axes[1].set_ylabel('BTC Price ($)')
+    axes[1].legend(loc=LEGEND_LOC)
+    axes[1].grid(True, alpha=0.3)
+    axes[1].set_yscale('log')
+
+    # Plot 3: 40-day correlation
+    axes[2].plot(plot_data.index, plot_data['40d_correlation'], label='40-day Correlation', linewidth=1)
+    axes[2].axhline(y=0, color='black', linestyle='-', linewidth=0.5)
+    axes[2].axhline(y=-0.1, color='red', linestyle='--', alpha=0.5, label='Entry Threshold')
+    axes[2].fill_between(plot_data.index, plot_data['40d_correlation'], 0,
+                         where=(plot_data['40d_correlation'] < 0), color='red', alpha=0.2)
+    axes[2].set_ylabel('Correlation')
+    axes[2].legend(loc=LEGEND_LOC)
+    axes[2].grid(True, alpha=0.3)
+
+    # Plot 4: Cumulative PnL of trades
+    if len(trades_df) > 0:
+        trades_df = trades_df.sort_values('exit_date')
+        cumulative_pnl = trades_df['pnl'].cumsum()
+        trade_number = np.arange(len(trades_df))
+        if len(trades_df) <= max_points:
+            axes[3].bar(trade_number, trades_df['pnl'],
+                        color=['green' if x > 0 else 'red' for x in trades_df['pnl']])
+        kept = minmax_indices(cumulative_pnl.to_numpy(), max(1, max_points // 2))
+        axes[3].plot(trade_number[kept], cumulative_pnl.to_numpy()[kept], 'b-', linewidth=2,
+                     label='Cumulative PnL')
+        axes[3].axhline(y=0, color='black', linestyle='-', linewidth=0.5)
+        axes[3].set_xlabel('Trade Number')
+        axes[3].set_ylabel('PnL ($)')
+        axes[3].legend(loc=LEGEND_LOC)
+        axes[3].grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    return fig
+
+
+def render_correlation_analysis(correlation_data, path='btc_gold_correlation_analysis.png',
+                                dpi=300, max_points=MAX_POINTS):
+    """Draw the chart of BTCGoldCorrelationAnalyzer.plot_analysis from decimated series and save it."""
+    import matplotlib.pyplot as plt
+
+    data = correlation_data.copy()
+    data['BTC_Return_30d_MA'] = data['BTC_Return'].rolling(30).mean() * 100
+    turns = data['turns_negative'].fillna(False).astype(bool)
+    plot_data = downsample(data, ['BTC_Close', 'Gold_Close', '40d_correlation', 'BTC_Return_30d_MA'],
+                           max_points, keep=turns)
+
+    fig, axes = plt.subplots(4, 1, figsize=(15, 12), sharex=True)
+
+    # Plot 1: BTC Price
+    axes[0].plot(plot_data.index, plot_data['BTC_Close'], color='orange', linewidth=1)
+    axes[0].set_ylabel('BTC Price (USD)', fontsize=10)
+    axes[0].set_title('BTC-Gold Correlation Analysis', fontsize=14, fontweight='bold')
+    axes[0].grid(True, alpha=0.3)
+    axes[0].set_yscale('log')
+
+    # Mark negative correlation periods
+    negative_turns = data[turns]
+    for date in negative_turns.index:
+        axes[0].axvline(x=date, color='red', linestyle='--', alpha=0.5)
+        axes[0].annotate('Neg Corr', xy=(date, data.loc[date, 'BTC_Close']),
+                         xytext=(10, 20), textcoords='offset points',
+                         fontsize=8, color='red', alpha=0.7)
+
+    # Plot 2: Gold Price
+    axes[1].plot(plot_data.index, plot_data['Gold_Close'], color='gold', linewidth=1)
+    axes[1].set_ylabel('Gold Price (USD)', fontsize=10)
+    axes[1].grid(True, alpha=0.3)
+
+    # Plot 3: 40-day Correlation
+    axes[2].plot(plot_data.index, plot_data['40d_correlation'], color='blue', linewidth=1)
+    axes[2].axhline(y=0, color='black', linestyle='-', linewidth=0.5)
+    axes[2].fill_between(plot_data.index, plot_data['40d_correlation'], 0,
+                         where=(plot_data['40d_correlation'] < 0), color='red', alpha=0.3)
+    axes[2].set_ylabel('40-day Correlation', fontsize=10)
+    axes[2].set_ylim(-1, 1)
+    axes[2].grid(True, alpha=0.3)
+
+    # Plot 4: BTC Returns
+    axes[3].plot(plot_data.index, plot_data['BTC_Return_30d_MA'],
+                 color='green', linewidth=1, label='30d MA Return')
+    axes[3].set_ylabel('BTC Return (%)', fontsize=10)
+    axes[3].set_xlabel('Date', fontsize=10)
+    axes[3].grid(True, alpha=0.3)
+    axes[3].legend(loc=LEGEND_LOC)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    return fig
+
+
+def _init_render_worker():
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render(func, args, kwargs):
+    import matplotlib.pyplot as plt
+
+    fig = func(*args, **kwargs)
+    plt.close(fig)
+    return kwargs.get('path')
+
+
+class BackgroundRenderer:
+    """Process pool that renders charts headlessly while the caller keeps working."""
+
+    def __init__(self, n_workers=1):
+        self.executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_render_worker)
+        self.futures = []
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs), which must save its figure and return it."""
+        future = self.executor.submit(_render, func, args, kwargs)
+        self.futures.append(future)
+        return future
+
+    def wait(self):
+        """Block until every queued chart is written; re-raises rendering errors."""
+        try:
+            return [future.result() for future in self.futures]
+        finally:
+            self.futures = []
+            self.executor.shutdown()
+
+    def cancel(self):
+        """Drop queued charts that have not started and release the pool."""
+        self.futures = []
+        self.executor.shutdown(cancel_futures=True)
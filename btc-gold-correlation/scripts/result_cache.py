@@ -0,0 +1,108 @@
+"""
+On-disk cache for backtest and grid-search results
+
+Entries are pickles named by a SHA-256 key built from a content hash of the
+input frame, the kind of result, its full parameter set and the strategy
+version, so any change to the data, the parameters or the strategy code
+(bump STRATEGY_VERSION in trading_strategy.py) misses the cache. Reads touch
+the file's modification time and writes evict the least recently used
+entries once the directory grows past max_bytes.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+
+class ResultCache:
+    """Size-bounded, content-addressed pickle store."""
+
+    SUFFIX = '.pkl'
+
+    def __init__(self, directory='.backtest_cache', max_bytes=512 * 1024 ** 2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(data):
+        """Content hash of a DataFrame: index, column names and values."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([str(c) for c in data.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(fingerprint, kind, params, version):
+        """Cache key for one result; params must be json-serializable."""
+        payload = json.dumps({'data': fingerprint, 'kind': kind, 'params': params,
+                              'version': version}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key, default=None):
+        """Load an entry, or return default if it is missing or unreadable."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception:
+            # Truncated or stale pickles (e.g. classes that have since moved)
+            # raise almost anything; drop the entry and count a miss
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return default
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        """Store an entry atomically, then evict old entries if over max_bytes."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the store fits in max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and name == keep + self.SUFFIX:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def size(self):
+        """Total bytes held by cache entries."""
+        return sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory) if name.endswith(self.SUFFIX))
@@ -9,111 +9,179 @@ import numpy as np
 import yfinance as yf
 from pandas_datareader import data as pdr
 import time
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import warnings
 warnings.filterwarnings('ignore')
 
+from ohlcv_backfill import backfill_ohlcv
+from price_store import PriceStore
 
-def fetch_btc_combined(start_date='2015-01-01'):
-    """
-    组合获取BTC数据
-    - yfinance: 2015-至今 (历史全覆盖)
-    - Binance: 2017-至今 (交叉验证)
-    """
-    print("📈 获取BTC数据...")
 
-    # 首先尝试yfinance（覆盖2015-至今）
-    try:
-        print("  - yfinance BTC-USD...")
-        btc_yf = yf.download('BTC-USD', start=start_date, progress=False)
+def _yfinance_close(ticker, name, start_date):
+    """yfinance收盘价序列，失败或为空时抛出异常"""
+    # threads=False: 各数据源已在抓取阶段并发，不再让yfinance另开线程
+    data = yf.download(ticker, start=start_date, progress=False, threads=False)
+    if data is None or len(data) == 0:
+        raise ValueError(f"{ticker} 无数据")
 
-        if isinstance(btc_yf.columns, pd.MultiIndex):
-            close_col = [col for col in btc_yf.columns if col[0] == 'Close'][0]
-            btc = btc_yf[close_col].rename('BTC')
-        else:
-            btc = btc_yf['Close'].rename('BTC')
+    # 处理多级列索引
+    if isinstance(data.columns, pd.MultiIndex):
+        close_col = [col for col in data.columns if col[0] == 'Close'][0]
+        return data[close_col].rename(name)
+    return data['Close'].rename(name)
 
-        print(f"  ✅ yfinance: {len(btc)} 条 ({btc.index[0].date()} - {btc.index[-1].date()})")
-        return btc
 
-    except Exception as e:
-        print(f"  ❌ yfinance失败: {e}")
+def fetch_btc_yfinance(start_date='2015-01-01'):
+    """yfinance BTC-USD（覆盖2015-至今）"""
+    return _yfinance_close('BTC-USD', 'BTC', start_date)
 
-    # 备用方案：Binance（仅2017年后）
-    try:
-        print("  - Binance (仅2017年后)...")
-        exchange = ccxt.binance({'enableRateLimit': True})
-        since = int(datetime.strptime('2017-08-01', '%Y-%m-%d').timestamp() * 1000)
 
-        all_data = []
-        limit = 1000
+def fetch_btc_binance(start_date='2015-01-01'):
+    """Binance BTC/USDT日线（仅2017-08后），按时间窗口并发回填"""
+    # 限速由backfill_ohlcv的令牌桶统一控制
+    exchange = ccxt.binance({'enableRateLimit': False})
+    start = max(pd.Timestamp(start_date), pd.Timestamp('2017-08-01'))
 
-        while True:
-            ohlcv = exchange.fetch_ohlcv('BTC/USDT', '1d', since=since, limit=limit)
-            if not ohlcv or len(ohlcv) == 0:
-                break
+    df = backfill_ohlcv(exchange, 'BTC/USDT', '1d', since=start)
+    if len(df) == 0:
+        raise ValueError("Binance 无数据")
+    return df['close'].rename('BTC')
 
-            all_data.extend(ohlcv)
-            since = ohlcv[-1][0] + 86400000
 
-            if len(ohlcv) < limit:
-                break
+def fetch_gold_gld(start_date='2015-01-01'):
+    """yfinance GLD（黄金ETF）"""
+    return _yfinance_close('GLD', 'Gold', start_date)
 
-            time.sleep(0.5)
 
-        df = pd.DataFrame(all_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
-        btc = df.set_index('date')['close'].rename('BTC')
+def fetch_dxy_fred(start_date='2015-01-01'):
+    """FRED DTWEXBGS（广义美元指数）"""
+    return pdr.DataReader('DTWEXBGS', 'fred', start_date)['DTWEXBGS'].rename('DXY')
 
-        print(f"  ✅ Binance: {len(btc)} 条")
-        return btc
 
-    except Exception as e:
-        print(f"  ❌ Binance也失败: {e}")
-        return None
+def fetch_spx_fred(start_date='2015-01-01'):
+    """FRED SP500"""
+    return pdr.DataReader('SP500', 'fred', start_date)['SP500'].rename('SPX')
 
 
-def fetch_gold_yfinance(start_date='2015-01-01'):
-    """从yfinance获取GLD（黄金ETF）"""
-    print("🥇 获取黄金数据 (GLD ETF)...")
+# 每个序列的数据源链: (名称, 函数, 超时秒数)，前一个失败或超时后才尝试下一个
+FETCH_SOURCES = {
+    'BTC': [('yfinance BTC-USD', fetch_btc_yfinance, 60),
+            ('Binance BTC/USDT', fetch_btc_binance, 180)],
+    'Gold': [('yfinance GLD', fetch_gold_gld, 60)],
+    'DXY': [('FRED DTWEXBGS', fetch_dxy_fred, 60)],
+    'SPX': [('FRED SP500', fetch_spx_fred, 60)]
+}
 
-    try:
-        gld = yf.download('GLD', start=start_date, progress=False)
 
-        # 处理多级列索引
-        if isinstance(gld.columns, pd.MultiIndex):
-            # 提取Close列
-            close_col = [col for col in gld.columns if col[0] == 'Close'][0]
-            gold = gld[close_col].rename('Gold')
-        else:
-            gold = gld['Close'].rename('Gold')
+def _fetch_chain(chain, start_date):
+    """按顺序尝试数据源链，返回第一个成功的序列（全部失败返回None）"""
+    for label, fetch, _ in chain:
+        try:
+            print(f"  - {label}...")
+            series = fetch(start_date)
+            print(f"  ✅ {label}: {len(series)} 条 ({series.index[0].date()} - {series.index[-1].date()})")
+            return series
+        except Exception as e:
+            print(f"  ❌ {label}失败: {e}")
+    return None
 
-        print(f"✅ Gold: {len(gold)} 条记录")
-        return gold
 
-    except Exception as e:
-        print(f"❌ 黄金数据失败: {e}")
-        return None
+def fetch_all(start_date='2015-01-01', sources=None, max_workers=None):
+    """
+    并发抓取所有数据源
 
+    每个序列的数据源链（FETCH_SOURCES）在有界线程池中同时运行：
+    某个源出错或超过自己的超时时间后，立即提交链中的下一个源。
+    所有序列都成功、失败或超时后才返回，总耗时约等于最慢的单个数据源。
 
-def fetch_indices(start_date='2015-01-01'):
-    """从FRED获取DXY和SPX"""
-    print("📊 获取宏观指标 (FRED)...")
+    Parameters:
+    - start_date: 起始日期
+    - sources: {序列名: [(名称, 函数, 超时秒数), ...]}，默认FETCH_SOURCES
+    - max_workers: 线程数，默认等于所有数据源总数（超时的线程无法中止，
+      仍会占用一个线程直到网络调用返回，因此不让后备源排队）
 
-    try:
-        dxy = pdr.DataReader('DTWEXBGS', 'fred', start_date)['DTWEXBGS'].rename('DXY')
-        print(f"✅ DXY: {len(dxy)} 条记录")
-    except:
-        dxy = None
-        print("⚠️  DXY获取失败")
+    Returns {序列名: Series 或 None}
+    """
+    sources = FETCH_SOURCES if sources is None else sources
+    max_workers = max_workers or sum(len(chain) for chain in sources.values())
+    print(f"🌐 并发获取 {len(sources)} 个序列...")
+
+    results = dict.fromkeys(sources)
+    running = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    started = time.monotonic()
+
+    def launch(name, attempt):
+        chain = sources[name]
+        if attempt >= len(chain):
+            print(f"  ❌ {name}: 所有数据源均失败")
+            return
+        label, fetch, timeout = chain[attempt]
+        if attempt > 0:
+            print(f"  ↪️  {name}: 改用 {label}")
+        future = executor.submit(fetch, start_date)
+        running[future] = (name, attempt, label, time.monotonic() + timeout)
+
+    for name in sources:
+        launch(name, 0)
 
     try:
-        spx = pdr.DataReader('SP500', 'fred', start_date)['SP500'].rename('SPX')
-        print(f"✅ SPX: {len(spx)} 条记录")
-    except:
-        spx = None
-        print("⚠️  SPX获取失败")
+        while running:
+            next_deadline = min(deadline for _, _, _, deadline in running.values())
+            done, _ = wait(list(running), timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name, attempt, label, _ = running.pop(future)
+                try:
+                    series = future.result()
+                    if series is None or len(series) == 0:
+                        raise ValueError("无数据")
+                except Exception as e:
+                    print(f"  ❌ {label}失败: {e}")
+                    launch(name, attempt + 1)
+                    continue
+                results[name] = series
+                print(f"  ✅ {label}: {len(series)} 条 "
+                      f"({series.index[0].date()} - {series.index[-1].date()}, "
+                      f"{time.monotonic() - started:.1f}s)")
+
+            now = time.monotonic()
+            for future, (name, attempt, label, deadline) in list(running.items()):
+                if now >= deadline:
+                    del running[future]
+                    future.cancel()
+                    print(f"  ⏱️  {label}超时")
+                    launch(name, attempt + 1)
+    finally:
+        # 不等待超时的线程，其结果会被丢弃
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"✅ 抓取阶段完成: {time.monotonic() - started:.1f}s")
+    return results
+
+
+def fetch_btc_combined(start_date='2015-01-01'):
+    """
+    组合获取BTC数据
+    - yfinance: 2015-至今 (历史全覆盖)
+    - Binance: 2017-至今 (交叉验证)
+    """
+    print("📈 获取BTC数据...")
+    return _fetch_chain(FETCH_SOURCES['BTC'], start_date)
 
+
+def fetch_gold_yfinance(start_date='2015-01-01'):
+    """从yfinance获取GLD（黄金ETF）"""
+    print("🥇 获取黄金数据 (GLD ETF)...")
+    return _fetch_chain(FETCH_SOURCES['Gold'], start_date)
+
+
+def fetch_indices(start_date='2015-01-01'):
+    """从FRED获取DXY和SPX"""
+    print("📊 获取宏观指标 (FRED)...")
+    dxy = _fetch_chain(FETCH_SOURCES['DXY'], start_date)
+    spx = _fetch_chain(FETCH_SOURCES['SPX'], start_date)
     return dxy, spx
 
 
@@ -172,18 +240,21 @@ def calculate_all(df, window=40):
     return returns, corr, valid_pairs
 
 
-def save_all(df, returns, corr, valid_pairs):
-    """保存数据"""
+def save_all(df, returns, corr, valid_pairs, store=None):
+    """保存数据（追加到分区存储，只写入上次保存之后的新日期）"""
     print("\n💾 保存数据...")
+    store = store or PriceStore()
 
-    df.to_parquet('improved_data_prices.parquet')
-    returns.to_parquet('improved_data_returns.parquet')
+    written = store.append('improved_data_prices', df)
+    written += store.append('improved_data_returns', returns)
 
     if corr is not None:
         corr_df = pd.DataFrame({'correlation': corr, 'valid_pairs': valid_pairs})
-        corr_df.to_parquet('improved_data_correlation.parquet')
+        written += store.append('improved_data_correlation', corr_df)
 
-    print("✅ 已保存到Parquet文件")
+    # 合并小文件在后台进行，进程退出前会等待其完成
+    store.compact_in_background()
+    print(f"✅ 已追加 {written} 个数据点到 {store.root}")
 
 
 def main():
@@ -191,13 +262,11 @@ def main():
     print("🚀 简化数据收集脚本 v2")
     print("="*60 + "\n")
 
-    # 获取数据
-    btc = fetch_btc_combined('2015-01-01')
-    gold = fetch_gold_yfinance('2015-01-01')
-    dxy, spx = fetch_indices('2015-01-01')
+    # 获取数据（各数据源并发）
+    series = fetch_all('2015-01-01')
 
     # 合并
-    df = combine_data(btc, gold, dxy, spx)
+    df = combine_data(series['BTC'], series['Gold'], series['DXY'], series['SPX'])
 
     # 计算
     returns, corr, valid_pairs = calculate_all(df)
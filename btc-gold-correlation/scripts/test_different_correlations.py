@@ -15,6 +15,8 @@ from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from data_access import load_frame
+
 
 def test_alternative_correlations():
     """测试可能的替代相关性组合"""
@@ -24,7 +26,7 @@ def test_alternative_correlations():
     print("="*80)
 
     # 加载已有数据
-    returns = pd.read_parquet('data/processed/log_returns.parquet')
+    returns = load_frame('log_returns')
 
     # 测试其他可能的黄金相关资产
     test_tickers = {
@@ -9,18 +9,44 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import Dict, List, Tuple
 import warnings
+import copy
+
+from backtest_kernel import (CrossingCache, TradeBuffer, index_to_ns, trade_metrics,
+                             simple_strategy_kernel, dynamic_strategy_kernel,
+                             grid_simple_kernel, grid_chunk_size, batch_metrics)
+from bootstrap import bootstrap_metrics
+from halving_search import run_halving_search
+from intraday_engine import intraday_simple_backtest, intraday_dynamic_backtest
+from online_metrics import PerformanceAccumulator
+from overfitting import (concat_moments, deflated_sharpe_ratio, probability_of_overfitting,
+                         return_moments)
+from parallel_grid import run_grid_parallel
+from portfolio_engine import portfolio_backtest
+from position_book import multi_lot_backtest
+from position_sizing import make_sizer
+from rendering import MAX_POINTS, downsample, render_backtest_results
+from result_cache import ResultCache
+from walk_forward import run_walk_forward
 warnings.filterwarnings('ignore')
 
+# Part of every result cache key: bump when a change alters backtest results
+STRATEGY_VERSION = 2
+
 
 class CorrelationTradingStrategy:
     """Implement and backtest trading strategies based on BTC-Gold correlation signals."""
 
-    def __init__(self, initial_capital=100000, fee_rate=0.001):
+    def __init__(self, initial_capital=100000, fee_rate=0.001, result_cache=None):
         self.initial_capital = initial_capital
         self.fee_rate = fee_rate
+        self.result_cache = result_cache
         self.positions = []
         self.trades = []
+        self.trade_buffer = TradeBuffer()
+        self.live_metrics = None
         self.portfolio_value = []
+        self.state = None
+        self.crossing_cache = CrossingCache()
 
     def backtest_simple_strategy(self, data, correlation_col='40d_correlation',
                                 entry_threshold=-0.1, holding_days=60,
@@ -39,7 +65,7 @@ class CorrelationTradingStrategy:
         """
         capital = self.initial_capital
         position = None
-        trades = []
+        trades = TradeBuffer()
 
         # Add signal column
         data['signal'] = 0
@@ -63,6 +89,7 @@ class CorrelationTradingStrategy:
                         remaining_capital = capital - position_value
 
                         position = {
+                            'entry_idx': i,
                             'entry_date': current_date,
                             'entry_price': current_price,
                             'btc_amount': btc_amount,
@@ -106,17 +133,18 @@ class CorrelationTradingStrategy:
                     trade_pnl = exit_value - position['position_value']
                     trade_pnl_pct = trade_pnl / position['position_value'] * 100
 
-                    trades.append({
-                        'entry_date': position['entry_date'],
-                        'exit_date': current_date,
-                        'entry_price': position['entry_price'],
-                        'exit_price': current_price,
-                        'entry_correlation': position['entry_correlation'],
-                        'holding_days': (current_date - position['entry_date']).days,
-                        'pnl': trade_pnl,
-                        'pnl_pct': trade_pnl_pct,
-                        'exit_reason': exit_reason
-                    })
+                    trades.append(
+                        entry_idx=position['entry_idx'],
+                        exit_idx=i,
+                        entry_ts=position['entry_date'].value,
+                        exit_ts=current_date.value,
+                        entry_price=position['entry_price'],
+                        exit_price=current_price,
+                        entry_correlation=position['entry_correlation'],
+                        pnl=trade_pnl,
+                        pnl_pct=trade_pnl_pct,
+                        exit_reason=exit_reason
+                    )
 
                     # Update capital
                     capital = remaining_capital + exit_value
@@ -130,9 +158,322 @@ class CorrelationTradingStrategy:
             else:
                 data.loc[current_date, 'portfolio_value'] = capital
 
-        self.trades = pd.DataFrame(trades)
+        self._set_trades(trades, data.index, dynamic=False)
+        return data
+
+    def backtest_simple_strategy_fast(self, data, correlation_col='40d_correlation',
+                                     entry_threshold=-0.1, holding_days=60,
+                                     position_size=1.0, stop_loss=None, take_profit=None,
+                                     entry_indices=None, sizing=None):
+        """
+        Array-native version of backtest_simple_strategy.
+
+        Runs the same state machine over NumPy arrays (see backtest_kernel.py)
+        and writes the signal/position/portfolio_value columns once at the end.
+        Trades and equity curve are identical to the pandas loop. The final
+        state is kept so that advance() can continue with new bars.
+
+        entry_indices optionally supplies the entry crossings (as returned by
+        CrossingCache.indices); by default they come from self.crossing_cache.
+
+        sizing optionally replaces the constant position_size with
+        volatility-targeted or rolling-Kelly sizing, e.g.
+        {'method': 'volatility', 'target_vol': 0.5, 'window': 30} or
+        {'method': 'kelly', 'window': 20, 'scale': 0.5} (see
+        position_sizing.py); position_size is used until the sizer has a
+        full window. Sized runs have no pandas-loop equivalent.
+        """
+        params = {
+            'entry_threshold': entry_threshold,
+            'holding_days': holding_days,
+            'position_size': position_size,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit,
+            'sizing': sizing
+        }
+        return self._run_fast_backtest('simple', data, correlation_col, params, entry_indices)
+
+    def backtest_dynamic_strategy_fast(self, data, correlation_col='40d_correlation',
+                                      entry_threshold=-0.1, exit_correlation=0.2,
+                                      position_size=1.0, max_holding_days=120,
+                                      use_trailing_stop=False, trailing_stop_pct=0.15,
+                                      entry_indices=None, sizing=None):
+        """
+        Array-native version of backtest_dynamic_strategy.
+
+        Same trades and equity curve as the pandas loop; the final state is
+        kept so that advance() can continue with new bars. entry_indices and
+        sizing are as in backtest_simple_strategy_fast.
+        """
+        params = {
+            'entry_threshold': entry_threshold,
+            'exit_correlation': exit_correlation,
+            'position_size': position_size,
+            'max_holding_days': max_holding_days,
+            'use_trailing_stop': use_trailing_stop,
+            'trailing_stop_pct': trailing_stop_pct,
+            'sizing': sizing
+        }
+        return self._run_fast_backtest('dynamic', data, correlation_col, params, entry_indices)
+
+    def backtest_multi_lot_strategy(self, data, correlation_col='40d_correlation',
+                                    entry_threshold=-0.1, holding_days=60,
+                                    position_size=1.0, stop_loss=None, take_profit=None,
+                                    max_lots=5, max_exposure=1.0):
+        """
+        Simple strategy that opens a new lot on every crossing (see position_book.py).
+
+        Parameters:
+        - max_lots: Maximum number of concurrent lots
+        - max_exposure: Cap on the market value of open lots as a fraction of equity
+        - remaining parameters: as in backtest_simple_strategy; position_size
+          is the fraction of free cash put into each new lot
+
+        The 'position' column holds the number of open lots. With max_lots=1
+        the result equals backtest_simple_strategy.
+        """
+        result = multi_lot_backtest(
+            index_to_ns(data.index),
+            data['BTC_Close'].to_numpy(dtype=np.float64),
+            data[correlation_col].to_numpy(dtype=np.float64),
+            self.initial_capital, self.fee_rate,
+            entry_threshold=entry_threshold, holding_days=holding_days,
+            position_size=position_size, stop_loss=stop_loss, take_profit=take_profit,
+            max_lots=max_lots, max_exposure=max_exposure
+        )
+
+        data['signal'] = result['signal']
+        data['position'] = result['position']
+        data['portfolio_value'] = result['portfolio_value']
+
+        self.state = None
+        self._set_trades(result['trades'], data.index, dynamic=False)
+        self.portfolio_value = result['portfolio_value'].tolist()
+        return data
+
+    def backtest_portfolio(self, prices, signals, entry_threshold=-0.1, holding_days=60,
+                           stop_loss=None, take_profit=None, exit_correlation=None,
+                           weights=None, position_size=1.0, rebalance_days=None):
+        """
+        Trade a basket with shared capital (see portfolio_engine.py).
+
+        Parameters:
+        - prices, signals: aligned DataFrames with one column per asset (or
+          asset/reference pair, see correlation_signals), e.g. closes and 40-day
+          correlations
+        - exit_correlation: optional correlation-reversal exit level
+        - weights: target weight per column (default: equal weights)
+        - rebalance_days: rebalance open positions to target weight every so
+          many days (None = never)
+        - remaining parameters: as in backtest_simple_strategy, as scalars or
+          one value per column
+
+        Returns a DataFrame with the market value held in each column plus
+        'cash' and 'portfolio_value'; self.trades gets an 'asset' column.
+        """
+        signals = signals.reindex(index=prices.index, columns=prices.columns)
+        result = portfolio_backtest(
+            index_to_ns(prices.index),
+            prices.to_numpy(dtype=np.float64),
+            signals.to_numpy(dtype=np.float64),
+            self.initial_capital, self.fee_rate,
+            entry_threshold=entry_threshold, holding_days=holding_days,
+            stop_loss=stop_loss, take_profit=take_profit, exit_correlation=exit_correlation,
+            weights=weights, position_size=position_size, rebalance_days=rebalance_days
+        )
+
+        data = pd.DataFrame(result['holdings'], index=prices.index, columns=prices.columns)
+        data['cash'] = result['cash']
+        data['portfolio_value'] = result['portfolio_value']
+
+        self.state = None
+        self._set_trades(result['trades'], prices.index, dynamic=exit_correlation is not None)
+        if len(self.trades) > 0:
+            self.trades.insert(0, 'asset', prices.columns[result['trades']['combo']])
+        self.portfolio_value = result['portfolio_value'].tolist()
+        return data
+
+    def backtest_intraday(self, timestamps, prices, corr, strategy='simple', **params):
+        """
+        Backtest hourly or minute bars from arrays (see intraday_engine.py).
+
+        Parameters:
+        - timestamps: int64 epoch nanoseconds
+        - prices, corr: float32 or float64 arrays
+        - strategy: 'simple' or 'dynamic'
+        - params: strategy parameters; holding periods are given in bars
+          (holding_bars / max_holding_bars) or as durations
+          (holding_period / max_holding_period)
+
+        Sets self.trade_buffer and self.trades; the per-bar arrays are only
+        returned, not copied into self.portfolio_value.
+        """
+        engine = intraday_simple_backtest if strategy == 'simple' else intraday_dynamic_backtest
+        result = engine(timestamps, prices, corr, self.initial_capital, self.fee_rate, **params)
+
+        trades = result['trades']
+        self.trade_buffer = trades
+        self.trades = self._trades_frame(trades, pd.to_datetime(trades['entry_ts']),
+                                         pd.to_datetime(trades['exit_ts']),
+                                         dynamic=strategy == 'dynamic')
+        return result
+
+    def advance(self, new_bars):
+        """
+        Continue the last fast backtest with bars appended after it.
+
+        Only new_bars is processed: the open position, capital, trailing-stop
+        high and last correlation come from the saved state. The trade log
+        and self.portfolio_value are extended, and new_bars is returned with
+        signal/position/portfolio_value columns, exactly as a full rerun
+        would have produced them for these rows.
+        """
+        if self.state is None:
+            raise ValueError("No backtest state: run a *_fast backtest or set_state() first")
+
+        timestamps = index_to_ns(new_bars.index)
+        last_timestamp = self.state['kernel']['last_timestamp']
+        if len(timestamps) > 0 and last_timestamp is not None and timestamps[0] <= last_timestamp:
+            raise ValueError("new_bars must start after the last processed bar")
+
+        result = self._run_kernel(new_bars, timestamps, self.state['kernel'])
+        trades = result['trades']
+        new_trades = self._trades_frame(
+            trades,
+            self._dates_from_ns(trades['entry_ts'], new_bars.index),
+            self._dates_from_ns(trades['exit_ts'], new_bars.index),
+            dynamic=self.state['strategy'] == 'dynamic'
+        )
+
+        new_bars['signal'] = result['signal']
+        new_bars['position'] = result['position']
+        new_bars['portfolio_value'] = result['portfolio_value']
+
+        if len(new_trades) > 0:
+            if len(self.trades) > 0:
+                self.trades = pd.concat([self.trades, new_trades], ignore_index=True)
+            else:
+                self.trades = new_trades
+            self.trade_buffer.extend(**trades.columns())
+        self.portfolio_value.extend(result['portfolio_value'].tolist())
+        if self.live_metrics is not None:
+            self.live_metrics.extend(result['portfolio_value'].tolist())
+            self.live_metrics.record_trades(trades)
+        self.state['kernel'] = result['state']
+        return new_bars
+
+    def get_state(self):
+        """Serializable (json-compatible) copy of the incremental backtest state."""
+        return copy.deepcopy(self.state)
+
+    def set_state(self, state):
+        """Restore a state saved with get_state() before calling advance()."""
+        self.state = copy.deepcopy(state)
+
+    def _run_fast_backtest(self, strategy_type, data, correlation_col, params, entry_indices=None):
+        self.state = {
+            'strategy': strategy_type,
+            'correlation_col': correlation_col,
+            'params': params,
+            'kernel': None
+        }
+
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self._cache_key(f'{strategy_type}_backtest',
+                                        data[['BTC_Close', correlation_col]], params)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return self._restore_backtest(data, cached)
+
+        timestamps = index_to_ns(data.index)
+        if entry_indices is None:
+            entry_indices = self.crossing_cache.indices(data, correlation_col,
+                                                        params['entry_threshold'])
+        result = self._run_kernel(data, timestamps, None, entry_indices)
+
+        data['signal'] = result['signal']
+        data['position'] = result['position']
+        data['portfolio_value'] = result['portfolio_value']
+
+        self._set_trades(result['trades'], data.index, dynamic=strategy_type == 'dynamic')
+        self.portfolio_value = result['portfolio_value'].tolist()
+        self.state['kernel'] = result['state']
+
+        if cache_key is not None:
+            self.result_cache.put(cache_key, {
+                'signal': result['signal'],
+                'position': result['position'],
+                'portfolio_value': result['portfolio_value'],
+                'trades': result['trades'],
+                'state': self.state
+            })
+        return data
+
+    def _restore_backtest(self, data, cached):
+        """Apply a cached _run_fast_backtest result to data and self."""
+        for column in ('signal', 'position', 'portfolio_value'):
+            data[column] = cached[column]
+        self.state = copy.deepcopy(cached['state'])
+        self._set_trades(cached['trades'], data.index,
+                         dynamic=self.state['strategy'] == 'dynamic')
+        self.portfolio_value = cached['portfolio_value'].tolist()
         return data
 
+    def _cache_key(self, kind, inputs, params):
+        """Result cache key for inputs (the DataFrame columns read) and params."""
+        params = dict(params, initial_capital=self.initial_capital, fee_rate=self.fee_rate)
+        return ResultCache.make_key(ResultCache.fingerprint(inputs), kind, params,
+                                    STRATEGY_VERSION)
+
+    def _run_kernel(self, data, timestamps, kernel_state, entry_indices=None):
+        kernel = (simple_strategy_kernel if self.state['strategy'] == 'simple'
+                  else dynamic_strategy_kernel)
+        return kernel(
+            timestamps,
+            data['BTC_Close'].to_numpy(dtype=np.float64),
+            data[self.state['correlation_col']].to_numpy(dtype=np.float64),
+            self.initial_capital, self.fee_rate,
+            state=kernel_state,
+            entry_indices=entry_indices,
+            **self.state['params']
+        )
+
+    def _dates_from_ns(self, timestamps, index):
+        """Epoch nanoseconds -> dates in the timezone of index."""
+        dates = pd.DatetimeIndex(np.asarray(timestamps, dtype=np.int64).view('datetime64[ns]'))
+        if index.tz is not None:
+            dates = dates.tz_localize('UTC').tz_convert(index.tz)
+        return dates
+
+    def _set_trades(self, trades, index, dynamic):
+        """Keep the TradeBuffer of a full backtest and its DataFrame view in self.trades."""
+        self.trade_buffer = trades
+        self.trades = self._trades_frame(trades, index[trades['entry_idx']],
+                                         index[trades['exit_idx']], dynamic)
+
+    def _trades_frame(self, trades, entry_dates, exit_dates, dynamic):
+        """Build the trade log DataFrame from a TradeBuffer."""
+        if len(trades) == 0:
+            return pd.DataFrame([])
+
+        frame = {
+            'entry_date': entry_dates,
+            'exit_date': exit_dates,
+            'entry_price': trades['entry_price'],
+            'exit_price': trades['exit_price'],
+            'entry_correlation': trades['entry_correlation'],
+        }
+        if dynamic:
+            frame['exit_correlation'] = trades['exit_correlation']
+        frame.update({
+            'holding_days': trades.holding_days(),
+            'pnl': trades['pnl'],
+            'pnl_pct': trades['pnl_pct'],
+            'exit_reason': trades.exit_reasons()
+        })
+        return pd.DataFrame(frame)
+
     def backtest_dynamic_strategy(self, data, correlation_col='40d_correlation',
                                  entry_threshold=-0.1, exit_correlation=0.2,
                                  position_size=1.0, max_holding_days=120,
@@ -148,7 +489,7 @@ class CorrelationTradingStrategy:
         """
         capital = self.initial_capital
         position = None
-        trades = []
+        trades = TradeBuffer()
         highest_value = 0
 
         # Add signal columns
@@ -172,6 +513,7 @@ class CorrelationTradingStrategy:
                         remaining_capital = capital - position_value
 
                         position = {
+                            'entry_idx': i,
                             'entry_date': current_date,
                             'entry_price': current_price,
                             'btc_amount': btc_amount,
@@ -217,18 +559,19 @@ class CorrelationTradingStrategy:
                     trade_pnl = exit_value - position['position_value']
                     trade_pnl_pct = trade_pnl / position['position_value'] * 100
 
-                    trades.append({
-                        'entry_date': position['entry_date'],
-                        'exit_date': current_date,
-                        'entry_price': position['entry_price'],
-                        'exit_price': current_price,
-                        'entry_correlation': position['entry_correlation'],
-                        'exit_correlation': current_corr,
-                        'holding_days': (current_date - position['entry_date']).days,
-                        'pnl': trade_pnl,
-                        'pnl_pct': trade_pnl_pct,
-                        'exit_reason': exit_reason
-                    })
+                    trades.append(
+                        entry_idx=position['entry_idx'],
+                        exit_idx=i,
+                        entry_ts=position['entry_date'].value,
+                        exit_ts=current_date.value,
+                        entry_price=position['entry_price'],
+                        exit_price=current_price,
+                        entry_correlation=position['entry_correlation'],
+                        exit_correlation=current_corr,
+                        pnl=trade_pnl,
+                        pnl_pct=trade_pnl_pct,
+                        exit_reason=exit_reason
+                    )
 
                     capital = remaining_capital + exit_value
                     position = None
@@ -240,62 +583,99 @@ class CorrelationTradingStrategy:
             else:
                 data.loc[current_date, 'portfolio_value'] = capital
 
-        self.trades = pd.DataFrame(trades)
+        self._set_trades(trades, data.index, dynamic=True)
         return data
 
     def calculate_performance_metrics(self, data, trades_df=None):
         """Calculate comprehensive performance metrics."""
         if trades_df is None:
-            trades_df = self.trades
+            trade_stats = self.trade_buffer.metrics()
+        elif len(trades_df) > 0:
+            trade_stats = trade_metrics(trades_df['pnl'].to_numpy(dtype=np.float64),
+                                        trades_df['pnl_pct'].to_numpy(dtype=np.float64),
+                                        trades_df['holding_days'].to_numpy())
+        else:
+            trade_stats = {'total_trades': 0}
 
-        if len(trades_df) == 0:
+        if trade_stats['total_trades'] == 0:
             return {"error": "No trades to analyze"}
 
-        # Basic metrics
-        total_trades = len(trades_df)
-        winning_trades = len(trades_df[trades_df['pnl'] > 0])
-        losing_trades = len(trades_df[trades_df['pnl'] < 0])
-        win_rate = winning_trades / total_trades if total_trades > 0 else 0
-
-        # PnL metrics
-        total_pnl = trades_df['pnl'].sum()
-        avg_pnl = trades_df['pnl'].mean()
-        avg_win = trades_df[trades_df['pnl'] > 0]['pnl'].mean() if winning_trades > 0 else 0
-        avg_loss = trades_df[trades_df['pnl'] < 0]['pnl'].mean() if losing_trades > 0 else 0
-
         # Return metrics
         total_return = (data['portfolio_value'].iloc[-1] / self.initial_capital - 1) * 100
-        avg_return_per_trade = trades_df['pnl_pct'].mean()
 
         # Risk metrics
         returns = data['portfolio_value'].pct_change().dropna()
         sharpe_ratio = self._calculate_sharpe_ratio(returns)
         max_drawdown = self._calculate_max_drawdown(data['portfolio_value'])
 
-        # Calculate profit factor
-        gross_profit = trades_df[trades_df['pnl'] > 0]['pnl'].sum() if winning_trades > 0 else 0
-        gross_loss = abs(trades_df[trades_df['pnl'] < 0]['pnl'].sum()) if losing_trades > 0 else 0
-        profit_factor = gross_profit / gross_loss if gross_loss > 0 else np.inf
-
-        metrics = {
-            'total_trades': total_trades,
-            'winning_trades': winning_trades,
-            'losing_trades': losing_trades,
-            'win_rate': win_rate * 100,
-            'total_pnl': total_pnl,
-            'avg_pnl': avg_pnl,
-            'avg_win': avg_win,
-            'avg_loss': avg_loss,
-            'profit_factor': profit_factor,
+        metrics = {key: trade_stats[key] for key in (
+            'total_trades', 'winning_trades', 'losing_trades', 'win_rate', 'total_pnl',
+            'avg_pnl', 'avg_win', 'avg_loss', 'profit_factor'
+        )}
+        metrics.update({
             'total_return_pct': total_return,
-            'avg_return_per_trade': avg_return_per_trade,
+            'avg_return_per_trade': trade_stats['avg_return_per_trade'],
             'sharpe_ratio': sharpe_ratio,
             'max_drawdown_pct': max_drawdown * 100,
-            'avg_holding_days': trades_df['holding_days'].mean()
-        }
+            'avg_holding_days': trade_stats['avg_holding_days']
+        })
 
         return metrics
 
+    def track_live_metrics(self, risk_free_rate=0.02):
+        """
+        Start streaming metrics for the current backtest.
+
+        The accumulator is seeded once with self.portfolio_value and the
+        trade log; after that advance() updates it in O(1) per bar, and
+        self.live_metrics.metrics() reports the same values as
+        calculate_performance_metrics on the full history.
+        """
+        self.live_metrics = PerformanceAccumulator(self.initial_capital, risk_free_rate)
+        self.live_metrics.extend(self.portfolio_value)
+        self.live_metrics.record_trades(self.trade_buffer)
+        return self.live_metrics
+
+    def bootstrap_performance_metrics(self, data, trades_df=None, n_samples=10000, mean_block=20,
+                                      method='stationary', confidence=0.95, n_workers=None,
+                                      seed=None):
+        """
+        Bootstrap confidence intervals for the metrics of a backtest (see bootstrap.py).
+
+        Parameters:
+        - data: backtest result with a portfolio_value column
+        - trades_df: trade log (default: self.trades)
+        - n_samples: number of resamples
+        - mean_block: mean block length in days for the stationary bootstrap
+        - method: 'stationary' or 'block'
+        - confidence: interval coverage
+        - n_workers: processes used for the resamples
+        - seed: makes the intervals reproducible for any n_workers
+        """
+        if trades_df is None:
+            trades_df = self.trades
+        returns = data['portfolio_value'].pct_change().dropna().to_numpy()
+        has_trades = len(trades_df) > 0
+        return bootstrap_metrics(
+            returns,
+            trades_df['pnl'].to_numpy() if has_trades else [],
+            trades_df['pnl_pct'].to_numpy() if has_trades else [],
+            n_samples=n_samples, mean_block=mean_block, method=method,
+            confidence=confidence, n_workers=n_workers, seed=seed
+        )
+
+    def calculate_batch_metrics(self, equity, trades, risk_free_rate=0.02):
+        """
+        Performance metrics for many equity curves in one vectorized call.
+
+        Parameters:
+        - equity: (combinations, bars) array of portfolio values
+        - trades: TradeBuffer whose 'combo' column indexes the rows of equity
+
+        Returns a dict of per-curve arrays with the keys of calculate_performance_metrics.
+        """
+        return batch_metrics(equity, trades, self.initial_capital, risk_free_rate)
+
     def _calculate_sharpe_ratio(self, returns, risk_free_rate=0.02):
         """Calculate Sharpe ratio."""
         excess_returns = returns - risk_free_rate / 252  # Daily risk-free rate
@@ -309,59 +689,36 @@ class CorrelationTradingStrategy:
         drawdown = (portfolio_values - cummax) / cummax
         return drawdown.min()
 
-    def plot_backtest_results(self, data, trades_df=None):
-        """Create comprehensive visualization of backtest results."""
+    def plot_backtest_results(self, data, trades_df=None, renderer=None, path='backtest_results.png',
+                              max_points=MAX_POINTS):
+        """
+        Create comprehensive visualization of backtest results.
+
+        Long series are decimated to about max_points points per line (min/max
+        per bucket, trade markers always kept) before drawing.
+
+        Parameters:
+        - renderer: optional BackgroundRenderer; the chart is then drawn
+          headlessly in its process pool and a future is returned instead of
+          the figure
+        - path: output PNG
+        """
         if trades_df is None:
             trades_df = self.trades
 
-        fig, axes = plt.subplots(4, 1, figsize=(15, 12))
-
-        # Plot 1: Portfolio value over time
-        axes[0].plot(data.index, data['portfolio_value'], label='Portfolio Value', linewidth=2)
-        axes[0].axhline(y=self.initial_capital, color='gray', linestyle='--', alpha=0.5)
-        axes[0].set_ylabel('Portfolio Value ($)')
-        axes[0].set_title('Backtest Results: BTC-Gold Correlation Trading Strategy', fontweight='bold')
-        axes[0].legend()
-        axes[0].grid(True, alpha=0.3)
-
-        # Mark entry and exit points
-        entries = data[data['signal'] == 1]
-        exits = data[data['signal'] == -1]
-
-        # Plot 2: BTC price with trade signals
-        axes[1].plot(data.index, data['BTC_Close'], label='BTC Price', color='orange', linewidth=1)
-        axes[1].scatter(entries.index, entries['BTC_Close'], color='green', marker='^', s=100, label='Buy')
-        axes[1].scatter(exits.index, exits['BTC_Close'], color='red', marker='v', s=100, label='Sell')
-        axes[1].set_ylabel('BTC Price ($)')
-        axes[1].legend()
-        axes[1].grid(True, alpha=0.3)
-        axes[1].set_yscale('log')
-
-        # Plot 3: 40-day correlation
-        axes[2].plot(data.index, data['40d_correlation'], label='40-day Correlation', linewidth=1)
-        axes[2].axhline(y=0, color='black', linestyle='-', linewidth=0.5)
-        axes[2].axhline(y=-0.1, color='red', linestyle='--', alpha=0.5, label='Entry Threshold')
-        axes[2].fill_between(data.index, data['40d_correlation'], 0,
-                            where=(data['40d_correlation'] < 0), color='red', alpha=0.2)
-        axes[2].set_ylabel('Correlation')
-        axes[2].legend()
-        axes[2].grid(True, alpha=0.3)
-
-        # Plot 4: Cumulative PnL of trades
-        if len(trades_df) > 0:
-            trades_df = trades_df.sort_values('exit_date')
-            cumulative_pnl = trades_df['pnl'].cumsum()
-            axes[3].bar(range(len(trades_df)), trades_df['pnl'],
-                       color=['green' if x > 0 else 'red' for x in trades_df['pnl']])
-            axes[3].plot(range(len(trades_df)), cumulative_pnl, 'b-', linewidth=2, label='Cumulative PnL')
-            axes[3].axhline(y=0, color='black', linestyle='-', linewidth=0.5)
-            axes[3].set_xlabel('Trade Number')
-            axes[3].set_ylabel('PnL ($)')
-            axes[3].legend()
-            axes[3].grid(True, alpha=0.3)
-
-        plt.tight_layout()
-        plt.savefig('backtest_results.png', dpi=300, bbox_inches='tight')
+        if renderer is not None:
+            # Decimate here so only the plotted rows are sent to the worker
+            markers = data['signal'] != 0
+            plot_data = downsample(data[['portfolio_value', 'BTC_Close', '40d_correlation', 'signal']],
+                                   ['portfolio_value', 'BTC_Close', '40d_correlation'],
+                                   max_points, keep=markers)
+            if len(trades_df) > 0:
+                trades_df = trades_df[['exit_date', 'pnl']]
+            return renderer.submit(render_backtest_results, plot_data, trades_df,
+                                   self.initial_capital, path=path, max_points=max_points)
+
+        fig = render_backtest_results(data, trades_df, self.initial_capital, path=path,
+                                      max_points=max_points)
         plt.show()
 
         return fig
@@ -375,8 +732,13 @@ class CorrelationTradingStrategy:
         - param_grid: Dictionary of parameters to test
         """
         results = []
+        crossing_cache = self.crossing_cache
+        result_cache = self.result_cache
 
         for entry_threshold in param_grid.get('entry_threshold', [-0.1]):
+            # Entry bars only depend on the threshold: compute them once
+            entry_indices = crossing_cache.indices(data, '40d_correlation', entry_threshold)
+
             for holding_days in param_grid.get('holding_days', [60]):
                 for stop_loss in param_grid.get('stop_loss', [None]):
                     for take_profit in param_grid.get('take_profit', [None]):
@@ -385,12 +747,13 @@ class CorrelationTradingStrategy:
 
                         # Run backtest
                         test_data = data.copy()
-                        self.backtest_simple_strategy(
+                        self.backtest_simple_strategy_fast(
                             test_data,
                             entry_threshold=entry_threshold,
                             holding_days=holding_days,
                             stop_loss=stop_loss,
-                            take_profit=take_profit
+                            take_profit=take_profit,
+                            entry_indices=entry_indices
                         )
 
                         # Calculate metrics
@@ -404,22 +767,286 @@ class CorrelationTradingStrategy:
                             })
                             results.append(metrics)
 
+        self.crossing_cache = crossing_cache
+        self.result_cache = result_cache
         return pd.DataFrame(results).sort_values('sharpe_ratio', ascending=False)
 
+    def optimize_parameters_batched(self, data, param_grid, chunk_size=None,
+                                    cost_models=None, volume_col='BTC_Volume',
+                                    deflate=False, n_blocks=16, sizing=None):
+        """
+        Batched grid search, equivalent to optimize_parameters.
+
+        All combinations are backtested together by grid_simple_kernel over
+        shared read-only price/correlation arrays, without copying the
+        DataFrame or re-running the pandas loop per combination. Combinations
+        are processed in chunks whose (chunk, bars) equity matrix stays
+        within GRID_CELL_BUDGET cells (see grid_chunk_size), so long hourly
+        histories get proportionally smaller chunks; chunk_size lowers the
+        cap further.
+
+        With self.result_cache set, metrics are stored per combination for
+        this dataset and a rerun only backtests combinations not seen before.
+
+        cost_models optionally maps names to CostModel objects (cost_model.py)
+        that replace the flat fee_rate. Every combination is then run under
+        every model in the same kernel pass, and a 'cost_model' column names
+        the model of each row; bar volumes for slippage come from volume_col
+        when data has it. Cost-model runs are not cached.
+
+        With deflate=True the table gets a 'deflated_sharpe' column and
+        results.attrs['pbo'] holds the probability of backtest overfitting
+        from CSCV over n_blocks blocks (see overfitting.py); every
+        combination tested, with or without trades, counts as a trial. These
+        runs are not cached either.
+
+        sizing is a position sizing spec applied to every combination, as in
+        backtest_simple_strategy_fast.
+
+        Returns the same ranked metrics table as optimize_parameters.
+        """
+        combos = self._grid_combinations(param_grid)
+
+        if cost_models is not None or deflate:
+            volumes = (data[volume_col].to_numpy(dtype=np.float64)
+                       if cost_models is not None and volume_col in data.columns else None)
+            moments = [] if deflate else None
+            results = self._grid_rows(data, combos, chunk_size, cost_models, volumes,
+                                      moments, n_blocks, sizing)
+            if deflate:
+                return self._deflate_results(results, concat_moments(moments))
+        elif self.result_cache is None:
+            results = self._grid_rows(data, combos, chunk_size, sizing=sizing)
+        else:
+            results = self._cached_grid_rows(
+                data, combos, lambda missing: self._grid_rows(data, missing, chunk_size,
+                                                              sizing=sizing), sizing)
+
+        return pd.DataFrame(results).sort_values('sharpe_ratio', ascending=False)
 
-def run_strategy_backtest(correlation_data):
-    """Run comprehensive strategy backtest."""
+    def _cached_grid_rows(self, data, combos, run, sizing=None):
+        """
+        Metrics rows of combos, backtesting only those missing from self.result_cache.
+
+        One entry per dataset (and sizing spec) maps every evaluated
+        combination to its metrics row (None: no trades); run(missing)
+        returns the rows of the combinations not seen before.
+        """
+        cache_key = self._cache_key('grid', data[['BTC_Close', '40d_correlation']],
+                                    {} if sizing is None else {'sizing': sizing})
+        known = self.result_cache.get(cache_key, {})
+        missing = list(dict.fromkeys(c for c in combos if c not in known))
+        if missing:
+            known.update(dict.fromkeys(missing))
+            for row in run(missing):
+                known[(row['entry_threshold'], row['holding_days'],
+                       row['stop_loss'], row['take_profit'])] = row
+            self.result_cache.put(cache_key, known)
+        return [dict(known[c]) for c in combos if known[c] is not None]
+
+    def _deflate_results(self, rows, moments):
+        """Ranked table with deflated Sharpe ratios and the PBO of the whole sweep."""
+        dsr, _, _ = deflated_sharpe_ratio(moments)
+        for row in rows:
+            row['deflated_sharpe'] = dsr[row.pop('trial')]
+
+        results = pd.DataFrame(rows)
+        if len(results) > 0:
+            results = results.sort_values('sharpe_ratio', ascending=False)
+        results.attrs['pbo'], _ = probability_of_overfitting(moments)
+        return results
+
+    def _grid_rows(self, data, combos, chunk_size=None, cost_models=None, volumes=None,
+                   moments=None, n_blocks=16, sizing=None):
+        """
+        Metric rows of the combinations with trades, computed with the batched kernel.
+
+        With cost_models (name -> CostModel), each chunk is tiled once per
+        model so that one kernel pass covers every (combination, model) pair.
+        With a moments list, return_moments of every equity row (traded or
+        not) are appended to it chunk by chunk and each row gets a 'trial'
+        column with its position among them.
+        """
+        timestamps = index_to_ns(data.index)
+        prices = data['BTC_Close'].to_numpy(dtype=np.float64)
+        corr = data['40d_correlation'].to_numpy(dtype=np.float64)
+        chunk_size = grid_chunk_size(len(prices), chunk_size)
+        # Volatility fractions depend only on prices: once for every chunk
+        bar_fractions = None if sizing is None else make_sizer(sizing).begin(prices)
+        if cost_models is not None:
+            cost_names = list(cost_models)
+            chunk_size = max(1, chunk_size // len(cost_names))
+
+        results = []
+        trials = 0
+        for start in range(0, len(combos), chunk_size):
+            chunk = combos[start:start + chunk_size]
+            cost_kwargs = {}
+            extra_columns = {}
+            if cost_models is not None:
+                extra_columns['cost_model'] = np.repeat(cost_names, len(chunk)).tolist()
+                chunk = chunk * len(cost_names)
+                cost_kwargs = {
+                    'cost_models': [cost_models[name] for name in cost_names],
+                    'cost_ids': np.repeat(np.arange(len(cost_names)), len(chunk) // len(cost_names)),
+                    'volumes': volumes
+                }
+            entry_thresholds, holding_days, stop_losses, take_profits = zip(*chunk)
+            crossings = self.crossing_cache.matrix(data, '40d_correlation',
+                                                   np.unique(np.asarray(entry_thresholds, dtype=np.float64)))
+            equity, trades = grid_simple_kernel(
+                timestamps, prices, corr, self.initial_capital, self.fee_rate,
+                entry_thresholds, holding_days,
+                [np.nan if x is None else x for x in stop_losses],
+                [np.nan if x is None else x for x in take_profits],
+                crossings=crossings, sizing=sizing, bar_fractions=bar_fractions, **cost_kwargs
+            )
+            if moments is not None:
+                moments.append(return_moments(equity, n_blocks))
+                extra_columns['trial'] = range(trials, trials + len(chunk))
+                trials += len(chunk)
+            results.extend(self._grid_metrics_rows(chunk, equity, trades, extra_columns))
+        return results
+
+    def optimize_parameters_parallel(self, data, param_grid, n_workers=None, chunk_size=None):
+        """
+        Grid search fanned out over a process pool.
+
+        Market data is published once through shared memory (parallel_grid.py)
+        and each worker runs the batched kernel on chunks of combinations.
+        The ranked table matches optimize_parameters_batched for any
+        n_workers; with self.result_cache set, both share the cached rows and
+        only combinations not seen before are sent to the pool.
+        """
+        def run(combos):
+            return run_grid_parallel(
+                type(self)(self.initial_capital, self.fee_rate),
+                index_to_ns(data.index),
+                data['BTC_Close'].to_numpy(dtype=np.float64),
+                data['40d_correlation'].to_numpy(dtype=np.float64),
+                combos,
+                n_workers=n_workers,
+                chunk_size=chunk_size
+            )
+
+        combos = self._grid_combinations(param_grid)
+        rows = run(combos) if self.result_cache is None else self._cached_grid_rows(data, combos, run)
+        return pd.DataFrame(rows).sort_values('sharpe_ratio', ascending=False)
+
+    def optimize_parameters_halving(self, data, param_space, n_candidates=None, min_bars=None,
+                                    eta=3, mode='halving', seed=None):
+        """
+        Successive-halving / hyperband alternative to optimize_parameters.
+
+        Candidates are ranked by Sharpe on a short prefix of the history and
+        only the best 1/eta are re-run on a prefix eta times longer, so most
+        combinations never get a full-history backtest; see halving_search.py.
+
+        Parameters:
+        - data: Historical price and correlation data
+        - param_space: Dictionary of parameter lists, or (low, high) tuples for continuous ranges
+        - n_candidates: Number of sampled combinations (default: the full grid if param_space is discrete)
+        - min_bars: Rows in the first rung (default: len(data) // eta**3)
+        - eta: Reduction factor between rungs
+        - mode: 'halving' for one bracket, 'hyperband' for several
+        - seed: Seed for sampling candidates
+
+        Returns the ranked metrics table of the final survivors, scored on the full history.
+        """
+        arrays = {
+            'timestamps': index_to_ns(data.index),
+            'prices': data['BTC_Close'].to_numpy(dtype=np.float64),
+            'corr': data['40d_correlation'].to_numpy(dtype=np.float64)
+        }
+        return run_halving_search(self, arrays, param_space, n_candidates=n_candidates,
+                                  min_bars=min_bars, eta=eta, mode=mode, seed=seed)
+
+    def walk_forward_optimize(self, data, param_grid, train_bars=730, test_bars=180,
+                              anchored=False, n_workers=1):
+        """
+        Walk-forward optimization (out-of-sample counterpart of optimize_parameters).
+
+        Each train window is grid-searched and the best-Sharpe parameters are
+        scored on the next test window; see walk_forward.py.
+
+        Parameters:
+        - data: Historical price and correlation data
+        - param_grid: Dictionary of parameters to test
+        - train_bars, test_bars: window lengths in rows (default ~2 years / ~6 months of daily bars)
+        - anchored: Use an expanding train window starting at the first bar
+        - n_workers: Processes used to run folds in parallel
+
+        Returns (oos_equity, folds_df): the stitched out-of-sample portfolio
+        value and one row of chosen parameters and scores per fold.
+        """
+        return run_walk_forward(
+            type(self)(self.initial_capital, self.fee_rate), data,
+            self._grid_combinations(param_grid), train_bars, test_bars,
+            anchored=anchored, n_workers=n_workers
+        )
+
+    def _grid_combinations(self, param_grid):
+        """Expand param_grid in the same nesting order as optimize_parameters."""
+        return [
+            (entry_threshold, holding_days, stop_loss, take_profit)
+            for entry_threshold in param_grid.get('entry_threshold', [-0.1])
+            for holding_days in param_grid.get('holding_days', [60])
+            for stop_loss in param_grid.get('stop_loss', [None])
+            for take_profit in param_grid.get('take_profit', [None])
+        ]
+
+    def _grid_metrics_rows(self, combos, equity, trades, extra_columns=None):
+        """
+        Metric dicts (as calculate_performance_metrics) for each combination with trades.
+
+        extra_columns optionally maps column names to sequences aligned with
+        the rows of equity (e.g. the cost model of each row).
+        """
+        metrics = self.calculate_batch_metrics(equity, trades)
+        traded = np.flatnonzero(metrics['total_trades'])
+
+        columns = {key: values[traded].tolist() for key, values in metrics.items()}
+        rows = []
+        for position, k in enumerate(traded):
+            entry_threshold, holding, stop_loss, take_profit = combos[k]
+            row = {key: values[position] for key, values in columns.items()}
+            row.update({
+                'entry_threshold': entry_threshold,
+                'holding_days': holding,
+                'stop_loss': stop_loss,
+                'take_profit': take_profit
+            })
+            for name, values in (extra_columns or {}).items():
+                row[name] = values[k]
+            rows.append(row)
+
+        return rows
+
+
+def run_strategy_backtest(correlation_data, n_workers=1, cache_dir=None, plots=True):
+    """
+    Run comprehensive strategy backtest.
+
+    Parameters:
+    - correlation_data: DataFrame with BTC_Close and 40d_correlation
+    - n_workers: processes for the parameter sweep (1 = serial batched kernel)
+    - cache_dir: directory of a ResultCache reused across runs (None = no caching)
+    - plots: render backtest_results.png (False skips plotting entirely)
+    """
     print("\n" + "=" * 60)
     print("Trading Strategy Backtest")
     print("=" * 60)
 
+    result_cache = ResultCache(cache_dir) if cache_dir else None
+
     # Initialize strategy
-    strategy = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001)
+    strategy = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001,
+                                          result_cache=result_cache)
 
     # Test 1: Simple fixed holding period strategy
     print("\n1. Testing Simple Strategy (60-day holding period)...")
     data_simple = correlation_data.copy()
-    data_simple = strategy.backtest_simple_strategy(
+    data_simple = strategy.backtest_simple_strategy_fast(
         data_simple,
         entry_threshold=-0.1,
         holding_days=60,
@@ -443,9 +1070,10 @@ def run_strategy_backtest(correlation_data):
 
     # Test 2: Dynamic correlation-based strategy
     print("\n2. Testing Dynamic Strategy (correlation-based exit)...")
-    strategy2 = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001)
+    strategy2 = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001,
+                                           result_cache=result_cache)
     data_dynamic = correlation_data.copy()
-    data_dynamic = strategy2.backtest_dynamic_strategy(
+    data_dynamic = strategy2.backtest_dynamic_strategy_fast(
         data_dynamic,
         entry_threshold=-0.15,
         exit_correlation=0.1,
@@ -468,7 +1096,8 @@ def run_strategy_backtest(correlation_data):
 
     # Test 3: Parameter optimization
     print("\n3. Running parameter optimization...")
-    strategy3 = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001)
+    strategy3 = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001,
+                                           result_cache=result_cache)
 
     param_grid = {
         'entry_threshold': [-0.05, -0.10, -0.15, -0.20],
@@ -477,7 +1106,11 @@ def run_strategy_backtest(correlation_data):
         'take_profit': [None, 0.20, 0.30, 0.50]
     }
 
-    optimization_results = strategy3.optimize_parameters(correlation_data, param_grid)
+    if n_workers == 1:
+        optimization_results = strategy3.optimize_parameters_batched(correlation_data, param_grid)
+    else:
+        optimization_results = strategy3.optimize_parameters_parallel(
+            correlation_data, param_grid, n_workers=n_workers)
 
     if len(optimization_results) > 0:
         print("\nTop 5 Parameter Combinations (by Sharpe Ratio):")
@@ -486,8 +1119,9 @@ def run_strategy_backtest(correlation_data):
         optimization_results.to_csv('parameter_optimization_results.csv')
 
     # Create visualizations
-    print("\n4. Creating visualizations...")
-    strategy.plot_backtest_results(data_simple)
+    if plots:
+        print("\n4. Creating visualizations...")
+        strategy.plot_backtest_results(data_simple)
 
     return strategy, strategy2, data_simple, data_dynamic
 
@@ -11,13 +11,15 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from data_access import load_frame
+
 
 def verify_historical_cases():
     """验证5个历史案例"""
 
     # 加载数据
-    prices = pd.read_parquet('data/processed/aligned_prices.parquet')
-    correlation = pd.read_parquet('data/processed/btc_gold_correlation_40d.parquet')
+    prices = load_frame('aligned_prices')
+    correlation = load_frame('btc_gold_correlation_40d')
 
     # 定义案例（从research_plan.md）
     cases = [
@@ -14,13 +14,15 @@ import numpy as np
 import matplotlib.pyplot as plt
 from datetime import timedelta
 
+from data_access import load_frame
+
 
 def analyze_gold_btc_sequence():
     """分析黄金-BTC的时间序列关系"""
 
-    prices = pd.read_parquet('data/processed/aligned_prices.parquet')
-    returns = pd.read_parquet('data/processed/log_returns.parquet')
-    correlation = pd.read_parquet('data/processed/btc_gold_correlation_40d.parquet')
+    prices = load_frame('aligned_prices')
+    returns = load_frame('log_returns')
+    correlation = load_frame('btc_gold_correlation_40d')
 
     print("="*80)
     print("重新验证：黄金先涨 → 相关性转负 → BTC爆发")
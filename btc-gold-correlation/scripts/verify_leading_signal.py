@@ -17,12 +17,14 @@ import numpy as np
 from datetime import timedelta
 from scipy import stats
 
+from data_access import load_frame
+
 
 def identify_correlation_weakening_signals():
     """识别相关性转弱的信号"""
 
-    prices = pd.read_parquet('data/processed/aligned_prices.parquet')
-    correlation = pd.read_parquet('data/processed/btc_gold_correlation_40d.parquet')['correlation'].dropna()
+    prices = load_frame('aligned_prices')
+    correlation = load_frame('btc_gold_correlation_40d')['correlation'].dropna()
 
     print("="*90)
     print("验证：相关性转弱是否为BTC上涨的领先信号")
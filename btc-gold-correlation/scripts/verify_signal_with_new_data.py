@@ -3,8 +3,8 @@
 对比新旧数据的验证结果
 
 数据源：
-- 新数据: improved_data_*.parquet (不使用forward fill)
-- 旧数据: data/processed/*.parquet (使用forward fill)
+- 新数据: 存储中的 improved_data_* 数据集 (不使用forward fill)
+- 旧数据: 存储中的 aligned_prices 等数据集 (使用forward fill)
 """
 
 import pandas as pd
@@ -13,11 +13,13 @@ from scipy import stats
 import warnings
 warnings.filterwarnings('ignore')
 
+from data_access import load_frame
+
 
 def load_new_data():
     """加载新数据（正确处理的）"""
-    prices = pd.read_parquet('improved_data_prices.parquet')
-    correlation = pd.read_parquet('improved_data_correlation.parquet')['correlation'].dropna()
+    prices = load_frame('improved_data_prices')
+    correlation = load_frame('improved_data_correlation')['correlation'].dropna()
 
     return prices, correlation
 
@@ -25,8 +27,8 @@ def load_new_data():
 def load_old_data():
     """加载旧数据（可能被forward fill污染的）"""
     try:
-        prices = pd.read_parquet('data/processed/aligned_prices.parquet')
-        correlation = pd.read_parquet('data/processed/btc_gold_correlation_40d.parquet')['correlation'].dropna()
+        prices = load_frame('aligned_prices')
+        correlation = load_frame('btc_gold_correlation_40d')['correlation'].dropna()
         return prices, correlation
     except:
         return None, None
@@ -0,0 +1,218 @@
+"""
+Walk-forward optimization for CorrelationTradingStrategy
+
+Slides train/test windows over the history: each train window is searched
+with the batched grid kernel, and the best parameters (by Sharpe) are scored
+on the following test window. Entry crossings for every threshold in the
+grid are computed once over the full history and sliced per fold, so
+overlapping train windows never recompute signals. Folds are independent and
+can run in a process pool over shared-memory arrays.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from backtest_kernel import (combo_columns, entry_crossings, equity_curve_metrics,
+                             grid_simple_kernel, index_to_ns)
+from parallel_grid import attach_arrays, publish_arrays
+
+
+# Per-worker state, set by _init_worker
+_worker_arrays = {}
+_worker_segments = []
+_worker_context = None
+
+
+def make_folds(n_bars, train_bars, test_bars, anchored=False):
+    """
+    Row ranges for walk-forward folds.
+
+    Test windows are consecutive and non-overlapping; the last one may be
+    shorter. With anchored=True every train window starts at bar 0
+    (expanding window) instead of sliding.
+
+    Returns a list of (train_start, train_end, test_start, test_end), ends exclusive.
+    """
+    folds = []
+    test_start = train_bars
+    while test_start < n_bars:
+        train_start = 0 if anchored else test_start - train_bars
+        test_end = min(test_start + test_bars, n_bars)
+        folds.append((train_start, test_start, test_start, test_end))
+        test_start = test_end
+    return folds
+
+
+def evaluate_fold(arrays, strategy, combos, fold):
+    """
+    Optimize on the train rows of one fold and score the winner on its test rows.
+
+    arrays holds 'timestamps', 'prices', 'corr' and 'crossings' for the full
+    history; crossings columns follow np.unique of the grid thresholds.
+
+    Returns (record, test_equity): the per-fold summary dict and the test
+    window equity curve, which starts from strategy.initial_capital.
+    """
+    train_start, train_end, test_start, test_end = fold
+    timestamps = arrays['timestamps']
+    prices = arrays['prices']
+    corr = arrays['corr']
+    crossings = arrays['crossings']
+    train = slice(train_start, train_end)
+    test = slice(test_start, test_end)
+
+    equity, trades = grid_simple_kernel(
+        timestamps[train], prices[train], corr[train],
+        strategy.initial_capital, strategy.fee_rate,
+        *combo_columns(combos), crossings=crossings[train]
+    )
+    rows = strategy._grid_metrics_rows(combos, equity, trades)
+
+    record = {
+        'train_start': train_start, 'train_end': train_end,
+        'test_start': test_start, 'test_end': test_end,
+        'entry_threshold': np.nan, 'holding_days': np.nan,
+        'stop_loss': None, 'take_profit': None,
+        'train_sharpe': np.nan, 'test_sharpe': 0.0,
+        'test_return_pct': 0.0, 'test_trades': 0
+    }
+
+    if not rows:
+        # No trades in the train window: stay flat through the test window
+        return record, np.full(test_end - test_start, float(strategy.initial_capital))
+
+    # Take the winner from its row dict, not a DataFrame row: a row Series
+    # upcasts holding_days to float and holds NumPy scalars
+    ranked = pd.DataFrame(rows).sort_values('sharpe_ratio', ascending=False)
+    best = rows[ranked.index[0]]
+    choice = tuple(x.item() if isinstance(x, np.generic) else x
+                   for x in (best['entry_threshold'], best['holding_days'],
+                             best['stop_loss'], best['take_profit']))
+    choice = tuple(None if isinstance(x, float) and np.isnan(x) else x for x in choice)
+
+    thresholds = np.unique(np.asarray([c[0] for c in combos], dtype=np.float64))
+    column = np.searchsorted(thresholds, choice[0])
+    test_equity, test_trades = grid_simple_kernel(
+        timestamps[test], prices[test], corr[test],
+        strategy.initial_capital, strategy.fee_rate,
+        *combo_columns([choice]), crossings=crossings[test, column:column + 1]
+    )
+    test_sharpe, _ = equity_curve_metrics(test_equity)
+
+    record.update({
+        'entry_threshold': choice[0], 'holding_days': choice[1],
+        'stop_loss': choice[2], 'take_profit': choice[3],
+        'train_sharpe': best['sharpe_ratio'],
+        'test_sharpe': test_sharpe[0],
+        'test_return_pct': (test_equity[0, -1] / strategy.initial_capital - 1) * 100,
+        'test_trades': len(test_trades['pnl'])
+    })
+    return record, test_equity[0]
+
+
+def _init_worker(spec, strategy, combos):
+    global _worker_segments, _worker_arrays, _worker_context
+    _worker_segments, _worker_arrays = attach_arrays(spec)
+    _worker_context = (strategy, combos)
+
+
+def _evaluate_fold_worker(fold):
+    strategy, combos = _worker_context
+    return evaluate_fold(_worker_arrays, strategy, combos, fold)
+
+
+def run_walk_forward(strategy, data, combos, train_bars, test_bars,
+                     anchored=False, n_workers=1):
+    """
+    Walk-forward optimization over data.
+
+    Parameters:
+    - strategy: CorrelationTradingStrategy providing capital, fees and metrics
+    - data: DataFrame with BTC_Close and 40d_correlation
+    - combos: list of (entry_threshold, holding_days, stop_loss, take_profit)
+    - train_bars, test_bars: window lengths in rows
+    - anchored: expanding instead of sliding train window
+    - n_workers: processes for running folds (1 = in-process)
+
+    Returns (oos_equity, folds_df). The out-of-sample equity curve chains the
+    test windows: each one is scaled by the growth of all earlier ones, which
+    is exact because the strategy sizes positions as a fraction of capital.
+    A position still open at the end of a test window is marked to market
+    and the next window starts flat.
+    """
+    timestamps = index_to_ns(data.index)
+    prices = data['BTC_Close'].to_numpy(dtype=np.float64)
+    corr = data['40d_correlation'].to_numpy(dtype=np.float64)
+    thresholds = np.unique(np.asarray([c[0] for c in combos], dtype=np.float64))
+
+    arrays = {
+        'timestamps': timestamps,
+        'prices': prices,
+        'corr': corr,
+        'crossings': entry_crossings(corr, thresholds)
+    }
+    folds = make_folds(len(data), train_bars, test_bars, anchored=anchored)
+
+    if n_workers == 1 or len(folds) <= 1:
+        results = [evaluate_fold(arrays, strategy, combos, fold) for fold in folds]
+    else:
+        segments, spec = publish_arrays(arrays)
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count(),
+                                     initializer=_init_worker,
+                                     initargs=(spec, strategy, combos)) as executor:
+                results = list(executor.map(_evaluate_fold_worker, folds))
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+
+    records = []
+    segments_equity = []
+    growth = 1.0
+    for number, (record, test_equity) in enumerate(results):
+        segments_equity.append(test_equity * growth)
+        growth *= test_equity[-1] / strategy.initial_capital
+
+        record = dict(record)
+        record['fold'] = number
+        for key in ('train_start', 'test_start'):
+            record[key] = data.index[record[key]]
+        for key in ('train_end', 'test_end'):
+            record[key] = data.index[record[key] - 1]
+        records.append(record)
+
+    if not results:
+        return pd.Series(dtype=np.float64, name='portfolio_value'), pd.DataFrame(records)
+
+    oos_start = folds[0][2]
+    oos_equity = pd.Series(np.concatenate(segments_equity),
+                           index=data.index[oos_start:folds[-1][3]],
+                           name='portfolio_value')
+    folds_df = pd.DataFrame(records).set_index('fold')
+    return oos_equity, folds_df
+
+
+if __name__ == "__main__":
+    # Offline check: a grid without stop_loss/take_profit runs every fold and
+    # reports the chosen parameters as plain Python values
+    from trading_strategy import CorrelationTradingStrategy
+
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=1200, freq='D')
+    data = pd.DataFrame({
+        'BTC_Close': 10000 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index)))),
+        '40d_correlation': np.clip(np.cumsum(rng.normal(0, 0.05, len(index))) % 2 - 1, -1, 1)
+    }, index=index)
+
+    strategy = CorrelationTradingStrategy(initial_capital=100000, fee_rate=0.001)
+    equity, folds = strategy.walk_forward_optimize(
+        data, {'entry_threshold': [-0.1, -0.2], 'holding_days': [30, 60]},
+        train_bars=365, test_bars=180)
+    traded = folds.dropna(subset=['train_sharpe'])
+    assert len(traded) > 0
+    assert all(type(x) is int for x in traded['holding_days'].astype(object))
+    assert traded['stop_loss'].isna().all() and traded['take_profit'].isna().all()
+    print(f"{len(folds)} folds, holding_days {sorted(set(traded['holding_days']))}")